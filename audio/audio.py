@@ -1,8 +1,14 @@
 import pyaudio
 import wave
 import numpy as np
+import os
+import sys
 #import whisper
 
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
+
 def record_audio(filename = "audio.wav"):
     
 
@@ -15,14 +21,14 @@ def record_audio(filename = "audio.wav"):
     # Each second the microphone captures 44100 samples (44.1 kHz).
     # The stereo modality means that the microphone captures two channels (left and right), it means 44100 samples for each channel. 
     p = pyaudio.PyAudio() # Create a PyAudio object
-    chunk = 1024 # Buffer size (how many samples PyAudio process read at once)
+    chunk = settings.audio.chunk # Buffer size (how many samples PyAudio process read at once)
     format_type = pyaudio.paInt16 # Audio format (each sample is a 16-bit integer)
-    channels = 2 # Number of audio channels (1 for mono, 2 for stereo)
-    rate = 44100 # Sample rate (samples per second) it means 44.1 kHz
+    channels = settings.audio.channels # Number of audio channels (1 for mono, 2 for stereo)
+    rate = settings.audio.rate # Sample rate (samples per second) it means 44.1 kHz
     
     # Thresholds for silence detection
-    threshold_silent_chunks = 100 # Number of silent chunks before stopping the recording
-    threshold_volume = 100 # Volume threshold to consider the audio as silent
+    threshold_silent_chunks = settings.audio.silence_chunks # Number of silent chunks before stopping the recording
+    threshold_volume = settings.audio.silence_volume # Volume threshold to consider the audio as silent
 
     # Open the audio stream
     stream = p.open(format=format_type, 
@@ -1,6 +1,15 @@
+import os
+import sys
 import requests
 import time
 
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
+
+# same base URL of llm/llm_api.py (a local stand-in API for the offline tests, see llm/fake_llm_server.py)
+LLM_API_BASE_URL = settings.llm.api_base_url.rstrip("/")
+
 def audio_groq_api(api_key, model_name, audio_path):
 
     # This function sends a audio to a Groq-hosted API waiting for the response (using Whisper model)
@@ -9,7 +18,7 @@ def audio_groq_api(api_key, model_name, audio_path):
     #       - audio_path: the path to the audio.wav file
     # Output: - transcription: <str> the transcribed text returned by the Whisper model, or None if an error occurred
 
-    url = "https://api.groq.com/openai/v1/audio/transcriptions"  # this is the url of the Groq API (same structure of OpenAI message!)
+    url = LLM_API_BASE_URL + "/audio/transcriptions"  # this is the url of the Groq API (same structure of OpenAI message!)
 
     # The header of the message contain the "Content-Type" (it say that the message structure will be json, a dict) and the "Authorization"
     # It is a string "Bearer gsk...." with the api_key in a Bearer Token type (Bearer means that the authorization is give with the api_key directly after)
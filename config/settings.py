@@ -0,0 +1,245 @@
+import os
+import time
+import threading
+
+import yaml
+
+"""
+Configuration of the whole project, parsed once and validated: the files of this folder are read the first time a
+setting is used and every module takes its values from here (no module opens the YAML files or the API key itself).
+
+    app_config.yaml   models, LLM API, sensing, audio and server knobs (SCHEMA below: section -> key -> type, default)
+    db_config.yaml    section 'database': Neo4j connection, pool, cache and preference summary (the same keys in upper
+                      case, NEO4J_URI, ..., the file keeps the credentials out of app_config.yaml)
+    llm_config.yaml   prompts, reloaded when the file changes (settings.prompts()), so the new sessions use the new
+                      prompts without restarting the server
+
+Overrides, in order of priority: the command line ('-set section.key=value' of server/server.py, settings.override),
+the environment (ADAM_<SECTION>_<KEY>, e.g. ADAM_SENSING_GAZE_HZ=5) and app_config.yaml. Usage:
+    from settings import settings
+    settings.models.therapist, settings.sensing.gaze_hz
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # root of the repository (no path depends on the OS)
+CONFIG_DIR = os.path.join(ROOT, "config")
+
+SCHEMA = {
+    "models": {
+        "therapist": (str, "llama-3.3-70b-versatile"),
+        "gesture": (str, "deepseek-r1-distill-llama-70b"),
+        "database": (str, "gemma2-9b-it"),  # from 8 October 2025 SHOULD CHANGE TO 'llama-3.1-8b-instant'
+        "child": (str, "gemma2-9b-it"),
+        "whisper": (str, "whisper-large-v3"),
+    },
+    "llm": {
+        "api_base_url": (str, "https://api.groq.com/openai/v1"),  # a local stand-in for the offline tests (llm/fake_llm_server.py)
+        "api_key_path": (str, "llm/api_key.txt"),  # relative to the root of the repository
+        "retry_wait_s": (float, 30.0),  # wait after a 429/500 answer
+        "prompts_check_s": (float, 1.0),  # how often the prompt file is checked for changes
+    },
+    "sensing": {
+        "gaze_hz": (float, 10.0),
+        "emotion_hz": (float, 1.0),
+        "max_width": (int, 640),
+        "head_threshold_x": (float, 14.0),  # degrees of the head pose over which the gaze is 'not centered'
+        "head_threshold_y": (float, 12.0),
+    },
+    "audio": {
+        "chunk": (int, 1024),
+        "channels": (int, 2),
+        "rate": (int, 44100),
+        "silence_chunks": (int, 100),  # silent chunks before stopping the recording
+        "silence_volume": (float, 100.0),  # RMS under which a chunk is silent
+    },
+    "server": {
+        "port": (int, 5000),
+        "jobs_db": (str, "server/jobs.sqlite"),
+        "session_token_budget": (int, 0),
+        "session_cost_budget": (float, 0.0),
+    },
+    "database": {  # None: no default (optional, or required only by the Neo4j backend)
+        "neo4j_uri": (str, None),
+        "neo4j_username": (str, None),
+        "neo4j_password": (str, None),
+        "neo4j_database": (str, "neo4j"),
+        "aura_instanceid": (str, None),
+        "aura_instancename": (str, None),
+        "graph_backend": (str, "neo4j"),
+        "graph_snapshot_path": (str, None),
+        "neo4j_max_connection_pool_size": (int, 50),
+        "neo4j_connection_acquisition_timeout": (float, 10.0),  # seconds
+        "neo4j_max_transaction_retry_time": (float, 15.0),  # seconds
+        "profile_cache_size": (int, 1024),  # entries
+        "profile_cache_ttl": (float, 300.0),  # seconds
+        "preference_top_k": (int, 3),
+        "preference_half_life_days": (float, 90.0),
+        "preference_materialize": (bool, False),
+    },
+}
+
+# allowed values of some settings
+CHOICES = {("database", "graph_backend"): ("neo4j", "memory")}
+
+# file of the sections not in app_config.yaml (their keys are written in upper case there)
+SECTION_FILES = {"database": "db_config.yaml"}
+
+# variables of the first versions, still honored
+LEGACY_ENV = {"LLM_API_BASE_URL": ("llm", "api_base_url"), "GRAPH_BACKEND": ("database", "graph_backend")}
+
+
+def parse_value(kind, value):
+    # value of the YAML / environment / command line converted to the type of the schema
+    if kind is bool and isinstance(value, str):
+        if value.strip().lower() in ("1", "true", "yes", "on"):
+            return True
+        if value.strip().lower() in ("0", "false", "no", "off", ""):
+            return False
+        raise ValueError(f"'{value}' is not a boolean")
+    return kind(value)
+
+
+class Section:
+    # settings of a section as attributes (settings.sensing.gaze_hz)
+    def __init__(self, name, values):
+        self._name = name
+        self.__dict__.update(values)
+
+    def as_dict(self):
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def __repr__(self):
+        return f"Section({self._name}, {self.as_dict()})"
+
+
+class Settings:
+    def __init__(self, config_dir=CONFIG_DIR, environ=None):
+        self.config_dir = config_dir
+        self.environ = os.environ if environ is None else environ
+        self._overrides = {}
+        self._sections = None
+        self._lock = threading.RLock()
+        self._prompts = None
+        self._prompts_mtime = None
+        self._prompts_checked = 0.0
+        self._api_key = None
+
+    def _read_yaml(self, name):
+        path = os.path.join(self.config_dir, name)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+
+    def load(self):
+        """Reads app_config.yaml and db_config.yaml and applies the environment and command line overrides; every
+        value is checked against SCHEMA and all the errors are reported together (ValueError)."""
+
+        data = self._read_yaml("app_config.yaml")
+        errors, sections = [], {}
+        for key in data:
+            if key not in SCHEMA or key in SECTION_FILES:
+                errors.append(f"unknown section '{key}' in app_config.yaml")
+        for section, keys in SCHEMA.items():
+            values = {}
+            file_name = SECTION_FILES.get(section, "app_config.yaml")
+            if section in SECTION_FILES:
+                file_values = {str(key).lower(): value for key, value in self._read_yaml(file_name).items()}
+            else:
+                file_values = data.get(section) or {}
+            for key in file_values:
+                if key not in keys:
+                    errors.append(f"unknown setting '{section}.{key}' in {file_name}")
+            for key, (kind, default) in keys.items():
+                value, source = default, "default"
+                if file_values.get(key) is not None:
+                    value, source = file_values[key], file_name
+                for variable, target in LEGACY_ENV.items():
+                    if target == (section, key) and self.environ.get(variable):
+                        value, source = self.environ[variable], variable
+                variable = f"ADAM_{section}_{key}".upper()
+                if self.environ.get(variable) is not None:
+                    value, source = self.environ[variable], variable
+                if (section, key) in self._overrides:
+                    value, source = self._overrides[(section, key)], "command line"
+                try:
+                    values[key] = None if value is None else parse_value(kind, value)
+                except (TypeError, ValueError):
+                    errors.append(f"{section}.{key} = {value!r} ({source}) is not a {kind.__name__}")
+                    continue
+                if (section, key) in CHOICES and values[key] not in CHOICES[(section, key)]:
+                    errors.append(f"{section}.{key} = {value!r} ({source}) is not one of {', '.join(CHOICES[(section, key)])}")
+            sections[section] = Section(section, values)
+        if errors:
+            raise ValueError("Invalid configuration:\n  " + "\n  ".join(errors))
+        self._sections = sections
+        return self
+
+    def override(self, assignments):
+        # command line overrides, a list of 'section.key=value' (they win over the environment and the files)
+        for assignment in assignments or []:
+            name, sep, value = assignment.partition("=")
+            section, _, key = name.strip().partition(".")
+            if not sep or section not in SCHEMA or key not in SCHEMA[section]:
+                raise ValueError(f"Invalid override '{assignment}': use section.key=value with a setting of config/settings.py SCHEMA")
+            self._overrides[(section, key)] = value.strip()
+        return self.load()
+
+    def __getattr__(self, name):
+        if name in SCHEMA:
+            if self._sections is None:
+                with self._lock:
+                    if self._sections is None:
+                        self.load()
+            return self._sections[name]
+        raise AttributeError(name)
+
+    def as_dict(self):
+        settings = {section: getattr(self, section).as_dict() for section in SCHEMA}
+        settings["database"]["neo4j_password"] = "***" if settings["database"]["neo4j_password"] else None
+        return settings
+
+    def path(self, relative):
+        # path of a setting relative to the root of the repository
+        return relative if os.path.isabs(relative) else os.path.join(ROOT, relative)
+
+    def api_key(self):
+        # Groq API key (read once), with a local stand-in API no key is needed
+        if self._api_key is None:
+            try:
+                with open(self.path(self.llm.api_key_path), "r") as file:
+                    self._api_key = file.read().strip()
+            except FileNotFoundError:
+                self._api_key = ''
+            if not self._api_key and not self.llm.api_base_url.startswith("https://api.groq.com"):
+                self._api_key = 'offline'
+        return self._api_key
+
+    def prompts(self):
+        """Prompts of llm_config.yaml, read again when the file changes (checked at most every llm.prompts_check_s).
+        A file with a YAML error is reported and the previous prompts are kept."""
+
+        now = time.monotonic()
+        if self._prompts is not None and now - self._prompts_checked < self.llm.prompts_check_s:
+            return self._prompts
+        with self._lock:
+            self._prompts_checked = now
+            path = os.path.join(self.config_dir, "llm_config.yaml")
+            mtime = os.path.getmtime(path)
+            if self._prompts is None or mtime != self._prompts_mtime:
+                try:
+                    prompts = self._read_yaml("llm_config.yaml")
+                    if "system_prompts" not in prompts or "user_prompt_templates" not in prompts:
+                        raise ValueError("'system_prompts' and 'user_prompt_templates' are required")
+                except (yaml.YAMLError, ValueError) as e:
+                    if self._prompts is None:
+                        raise
+                    print(f"llm_config.yaml not reloaded, the previous prompts are kept: {e}")
+                else:
+                    if self._prompts is not None:
+                        print("llm_config.yaml changed: prompts reloaded")
+                    self._prompts = prompts
+                self._prompts_mtime = mtime
+            return self._prompts
+
+
+settings = Settings()
@@ -1,152 +1,217 @@
-import pandas as pd
-from scipy.stats import ttest_rel
-
-
-def select_data(file_path):
+import argparse
+from itertools import combinations
 
+import numpy as np
+import pandas as pd
+import yaml
+from scipy.stats import t as t_dist
+
+"""
+Statistics of the HRI questionnaires. The study is described by a schema (conditions, question groups and the columns
+of the CSV) instead of column positions, so the same code runs on the questionnaires of other sites or experiment
+variants: every user answers the questionnaire once per condition, the score of a question group is the sum of its
+questions, and for every group all the pairs of conditions are compared with a paired t-test (matched by user ID),
+the effect size (Cohen's dz) and a bootstrap confidence interval of the mean difference.
+
+All the (group, pair of conditions) tests of a site are computed together as columns of one NumPy matrix, so a CSV of
+100k responses takes a few seconds. Example (from the root of the repository):
+    python evaluation/hri_evaluation/stats.py
+    python evaluation/hri_evaluation/stats.py -data other_site.csv -schema other_study.yaml -out other_stats.csv
+"""
+
+# Schema of our study ('hri-questionnaire.csv'), a YAML file with the same keys can be passed with '-schema'
+SCHEMA = {
+    'id_column': 'ID',
+    'condition_column': '(Sperimentatore) Esperimento:',
+    'site_column': None,  # optional column with the site / experiment variant, the statistics are computed per site
+    'conditions': ['Minimal', 'Full'],
+    # Define a dictionary to rename long column names to shorter ones (q1 means question 1, etc.)
+    'questions': {
+        # Start of User Perception questions
+        'q1': 'Il robot dialoga come un reale terapista umano',
+        'q2': 'Il robot sembra esprimere emozioni come noi umani',
+        'q3': 'Il robot ha atteggiamenti che mi aspetterei da un reale terapista umano',
+        'q4': 'Il robot assume comportamenti credibili, naturali e poco artificiali',
+        'q5': 'Il robot risponde in maniera intelligente',
+        # Start of User Satisfaction questions
+        'q6': 'Adam mi ha fatto sentire sempre a mio agio',
+        'q7': 'Dialogare con Adam è molto intuitivo e semplice ',
+        'q8': "Interagire con un Robot terapista è stata un' esperienza piacevole",
+        'q9': "L'interazione con Adam mi ha dato un livello soddisfacente di supporto, paragonabile a un terapista umano",
+        'q10': 'Raccomanderei Adam ad un amico come supporto ad un terapeuta umano o in contesti dove non fosse possibile avere un terapista umano',
+        # Start of User Engagement questions
+        'q11': 'Adam è stato sempre interessante durante la conversazione',
+        'q12': 'Mi sono sentito completamente immerso durante la conversazione con Adam',
+        'q13': 'Dialogherei di nuovo con Adam in futuro',
+        'q14': 'Mi sono sentito molto connesso con il robot durante la conversazione',
+        'q15': 'Sono stato attento durante tutta la conversazione con Adam',
+    },
+    'groups': {
+        'User Perception': ['q1', 'q2', 'q3', 'q4', 'q5'],
+        'User Satisfaction': ['q6', 'q7', 'q8', 'q9', 'q10'],
+        'User Engagement': ['q11', 'q12', 'q13', 'q14', 'q15'],
+    },
+}
+
+
+def load_schema(path=None):
+    # schema of the study: the default one or a YAML file (the missing keys are taken from the default)
+    schema = dict(SCHEMA)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            schema.update(yaml.safe_load(f))
+    return schema
+
+
+def select_data(file_path, schema):
     '''
-    This function reads the CSV file containing the questionnaire results and separates the data into 'perc_data' (User Perception Data), 
-    'sati_data' (User Satisfaction Data), and 'eng_data' (User Engagement Data) DataFrames of both Experiment 'Minimal' and 'Full'.
+    This function reads the CSV file containing the questionnaire results (only the columns of the schema) and computes
+    the score of every question group as the sum of the scores of its questions.
     Args:
         file_path (str): The path to the CSV file containing the questionnaire results.
+        schema (dict): The schema of the study (see SCHEMA).
     Returns:
-        perc_minimal (pd.DataFrame): DataFrame containing User Perception Data of Experiment Minimal.
-        sati_minimal (pd.DataFrame): DataFrame containing User Satisfaction Data of Experiment Minimal.
-        eng_minimal (pd.DataFrame): DataFrame containing User Engagement Data of Experiment Minimal.
-        perc_full (pd.DataFrame): DataFrame containing User Perception Data of Experiment Full.
-        sati_full (pd.DataFrame): DataFrame containing User Satisfaction Data of Experiment Full.
-        eng_full (pd.DataFrame): DataFrame containing User Engagement Data of Experiment Full.
+        scores (pd.DataFrame): one row per (site, user) and one column per (group, condition), NaN if the user did not
+                               answer in that condition (a user answering twice in a condition gets the mean).
     '''
 
-    # Define a dictionary to rename long column names to shorter ones (q1 means question 1, etc.)
-    abbreviations = {
-    # Start of User Perception questions
-    'Il robot dialoga come un reale terapista umano': 'q1',
-    'Il robot sembra esprimere emozioni come noi umani': 'q2',
-    'Il robot ha atteggiamenti che mi aspetterei da un reale terapista umano': 'q3',
-    'Il robot assume comportamenti credibili, naturali e poco artificiali': 'q4',
-    'Il robot risponde in maniera intelligente': 'q5',
-     # Start of User Satisfaction questions    
-    'Adam mi ha fatto sentire sempre a mio agio': 'q6',
-    'Dialogare con Adam è molto intuitivo e semplice ': 'q7',
-    "Interagire con un Robot terapista è stata un' esperienza piacevole": 'q8',
-    "L'interazione con Adam mi ha dato un livello soddisfacente di supporto, paragonabile a un terapista umano": 'q9',
-    'Raccomanderei Adam ad un amico come supporto ad un terapeuta umano o in contesti dove non fosse possibile avere un terapista umano': 'q10',
-    # Start of User Engagement questions
-    'Adam è stato sempre interessante durante la conversazione': 'q11',
-    'Mi sono sentito completamente immerso durante la conversazione con Adam': 'q12',
-    'Dialogherei di nuovo con Adam in futuro': 'q13',
-    'Mi sono sentito molto connesso con il robot durante la conversazione': 'q14',
-    'Sono stato attento durante tutta la conversazione con Adam': 'q15'  
-    }
-
-    
-    # Read the CSV file
-    df = pd.read_csv(file_path)
-
-    # Separate data in Full and Minimal experiments
-    full_data = df[df.iloc[:,2] == 'Full']
-    minimal_data = df[df.iloc[:,2] == 'Minimal']
-
-    # Then I select only the columns with ID (column 1) and the scores (from 3 to 17)
-    full_data = full_data.iloc[:, [1] + list(range(3, 18))]
-    minimal_data = minimal_data.iloc[:, [1] + list(range(3, 18))]
-
-    # Rename the columns using the abbreviations dictionary
-    full_data = full_data.rename(columns=abbreviations)
-    minimal_data = minimal_data.rename(columns=abbreviations)
-
-    # Separate the data into three DataFrames based on the type of questions (for both Full and Minimal)
-    perc_full = full_data[['ID', 'q1', 'q2', 'q3', 'q4', 'q5']]
-    sati_full = full_data[['ID', 'q6', 'q7', 'q8', 'q9', 'q10']]
-    eng_full = full_data[['ID', 'q11', 'q12', 'q13', 'q14', 'q15']]
-
-    perc_minimal = minimal_data[['ID', 'q1', 'q2', 'q3', 'q4', 'q5']]
-    sati_minimal = minimal_data[['ID', 'q6', 'q7', 'q8', 'q9', 'q10']]
-    eng_minimal = minimal_data[['ID', 'q11', 'q12', 'q13', 'q14', 'q15']]
-
-    return perc_minimal, sati_minimal, eng_minimal, perc_full, sati_full, eng_full
-
-def questionnaire_stats(data1, data2):
-    '''
-    This function computes importants Questionnaire stastistics such as means, standard deviations and p-value 
-    using a paired t-test between two sets of data. Firstly it computes the sum of each row (user) points for both dataframes.
-    In particular in a set of data = [x1, x2, ..., xn] each xi is the sum of the scores of a user (row) for all the questions (columns), it
-    return the mean and standard deviation of the sums and the p-value of the paired t-test between the two.
+    questions = schema['questions']  # short name -> column of the CSV
+    keys = [schema['id_column'], schema['condition_column']] + ([schema['site_column']] if schema.get('site_column') else [])
+    df = pd.read_csv(file_path, usecols=keys + list(questions.values()))
+    df = df.rename(columns={column: short for short, column in questions.items()})
+    df = df[df[schema['condition_column']].isin(schema['conditions'])]
 
-    Args:
-        data1 (pd.DataFrame): The first set of data: a DataFrame where each row is a user and each column is a question score 
-        data2 (pd.DataFrame): The second set of data: a DataFrame where each row is a user and each column is a question score 
-    Returns:
-        mean1 (float): The mean of the sums of first set of data.
-        mean2 (float): The mean of the second set of data.
-        std1 (float): The standard deviation of the first set of data.
-        std2 (float): The standard deviation of the second set of data.
-        p_value (float): The computed p-value from the paired t-test.
-    '''
+    site = df[schema['site_column']] if schema.get('site_column') else pd.Series('all', index=df.index)
+    # Score of each group: sum of the scores of its questions for each row (user, condition)
+    group_scores = pd.DataFrame({group: df[group_questions].sum(axis=1, min_count=len(group_questions))
+                                 for group, group_questions in schema['groups'].items()})
+    group_scores['site'] = site.values
+    group_scores['id'] = df[schema['id_column']].values
+    group_scores['condition'] = df[schema['condition_column']].values
 
-    #print("Data1:\n", data1)
+    scores = group_scores.groupby(['site', 'id', 'condition']).mean().unstack('condition')
+    return scores.reindex(columns=pd.MultiIndex.from_product([list(schema['groups']), schema['conditions']]))
 
-    # Firstly we compute the sum of each row (user) points for both dataframes
-    # :1 means that we want to select all the rows and all the columns except the first one (ID column)
-    sum_df1 = data1.iloc[:, 1:].sum(axis=1)  
-    sum_df2 = data2.iloc[:, 1:].sum(axis=1)  
 
-    # Then we compute the mean of the sums
-    mean1 = sum_df1.iloc[:].sum()/ (sum_df1.shape[0])  # Divide by the number of users (rows)
-    mean2 = sum_df2.iloc[:].sum()/ (sum_df2.shape[0])
+def bootstrap_mean(diffs, resamples=2000, seed=0, max_cells=2e7):
+    '''
+    Bootstrap distribution of the mean of every column of 'diffs' (NaN are missing pairs and are ignored). Every resample
+    is a row of counts (how many times each user is drawn), so the means of all the resamples and all the columns are
+    one matrix product, in blocks of resamples that keep the count matrix under 'max_cells' values.
+    Returns:
+        means (np.ndarray): (resamples, columns) bootstrap means.
+    '''
 
-    # Compute the standard deviation of the sums
-    std1 = sum_df1.std()
-    std2 = sum_df2.std()
+    rng = np.random.default_rng(seed)
+    n = diffs.shape[0]
+    valid = ~np.isnan(diffs)
+    values = np.where(valid, diffs, 0.0)
+    block = max(1, int(max_cells // max(1, n)))
+    means = []
+    for start in range(0, resamples, block):
+        size = min(block, resamples - start)
+        index = rng.integers(0, n, size=(size, n)) + n * np.arange(size)[:, None]
+        counts = np.bincount(index.ravel(), minlength=size * n).reshape(size, n).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means.append((counts @ values) / (counts @ valid))
+    return np.concatenate(means)
+
+
+def paired_tests(scores, conditions, resamples=2000, confidence=0.95, seed=0):
+    '''
+    This function computes, for all the groups and all the pairs of conditions, the means and standard deviations of the
+    two conditions and the paired t-test, Cohen's dz and the bootstrap confidence interval of the mean difference
+    (condition_a - condition_b). Every (group, pair) is a column of the difference matrix, so all the tests are
+    computed together.
+    Args:
+        scores (pd.DataFrame): group scores of select_data (rows of one site).
+        conditions (list): the conditions of the study.
+    Returns:
+        results (pd.DataFrame): one row per (group, pair of conditions).
+    '''
 
-    # Perform a paired t-test (to perform that we pass the two arrays of sums)
-    t_stat, p_value = ttest_rel(sum_df1, sum_df2)  
+    groups = scores.columns.get_level_values(0).unique()
+    tests = [(group, a, b) for group in groups for a, b in combinations(conditions, 2)]
+    a_scores = np.column_stack([scores[(group, a)].to_numpy(dtype=float) for group, a, _ in tests])
+    b_scores = np.column_stack([scores[(group, b)].to_numpy(dtype=float) for group, _, b in tests])
+    # only the users that answered in both conditions are paired
+    paired = ~np.isnan(a_scores) & ~np.isnan(b_scores)
+    a_scores = np.where(paired, a_scores, np.nan)
+    b_scores = np.where(paired, b_scores, np.nan)
+    diffs = a_scores - b_scores
+
+    n = paired.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_diff = np.nanmean(diffs, axis=0)
+        std_diff = np.nanstd(diffs, axis=0, ddof=1)
+        t_stat = mean_diff / (std_diff / np.sqrt(n))
+        p_value = 2 * t_dist.sf(np.abs(t_stat), n - 1)
+        cohen_dz = mean_diff / std_diff
+
+        alpha = (1 - confidence) / 2
+        boot = bootstrap_mean(diffs, resamples=resamples, seed=seed)
+        ci_low, ci_high = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+
+        results = pd.DataFrame({
+            'group': [group for group, _, _ in tests], 'condition_a': [a for _, a, _ in tests],
+            'condition_b': [b for _, _, b in tests], 'n': n,
+            'mean_a': np.nanmean(a_scores, axis=0), 'mean_b': np.nanmean(b_scores, axis=0),
+            'std_a': np.nanstd(a_scores, axis=0, ddof=1), 'std_b': np.nanstd(b_scores, axis=0, ddof=1),
+            'mean_diff': mean_diff, 'ci_low': ci_low, 'ci_high': ci_high,
+            't_stat': t_stat, 'p_value': p_value, 'cohen_dz': cohen_dz,
+        })
+    results['p_holm'] = holm(results['p_value'].to_numpy())
+    return results
+
+
+def holm(p_values):
+    # Holm-Bonferroni correction of the p-values of the tests of a site (many pairs of conditions are compared)
+    p = np.asarray(p_values, dtype=float)
+    order = np.argsort(np.where(np.isnan(p), np.inf, p))
+    m = int((~np.isnan(p)).sum())
+    adjusted = np.full_like(p, np.nan)
+    ranked = p[order][:m] * (m - np.arange(m))
+    adjusted[order[:m]] = np.minimum(np.maximum.accumulate(ranked), 1.0)
+    return adjusted
+
+
+def questionnaire_stats(file_path, schema=None, resamples=2000, confidence=0.95, seed=0):
+    '''
+    Statistics of all the sites of the CSV file.
+    Returns:
+        results (pd.DataFrame): one row per (site, group, pair of conditions), see paired_tests.
+    '''
 
-    return mean1, mean2, std1, std2, p_value
+    schema = schema or SCHEMA
+    scores = select_data(file_path, schema)
+    results = []
+    for site, site_scores in scores.groupby(level='site'):
+        site_results = paired_tests(site_scores, schema['conditions'], resamples=resamples, confidence=confidence, seed=seed)
+        site_results.insert(0, 'site', site)
+        results.append(site_results)
+    return pd.concat(results, ignore_index=True)
 
 
 if __name__ == "__main__":
-    file_path = 'evaluation/hri_evaluation/hri-questionnaire.csv'
-    perc_minimal, sati_minimal, eng_minimal, perc_full, sati_full, eng_full = select_data(file_path)
-
-    #print("User Perception Data Minimal:\n", perc_minimal)
-    #print("\nUser Satisfaction Data Minimal:\n", sati_minimal)
-    #print("\nUser Engagement Data Minimal:\n", eng_minimal)
-
-    #print("\nUser Perception Data Full:\n", perc_full)
-    #print("\nUser Satisfaction Data Full:\n", sati_full)
-    #print("\nUser Engagement Data Full:\n", eng_full)
-    
-    # Initialize a dict to store the p-values
-    stats_dict = {'User Perception': {'Mean Minimal': [], 'Mean Full': [], 'Std Minimal': [], 'Std Full': [], 'P Value': []}, 'User Satisfaction': {'Mean Minimal': [], 'Mean Full': [], 'Std Minimal': [], 'Std Full': [], 'P Value': []}, 'User Engagement': {'Mean Minimal': [], 'Mean Full': [], 'Std Minimal': [], 'Std Full': [], 'P Value': []}}
-
-    # Perform paired t-tests
-    for name, data_minimal, data_full in zip(
-        ["User Perception", "User Satisfaction", "User Engagement"],
-        [perc_minimal, sati_minimal, eng_minimal],
-        [perc_full, sati_full, eng_full]
-    ):
-        # Compute statistics
-        mean1, mean2, std1, std2, p = questionnaire_stats(data_minimal, data_full)
-
-        # Append the stats to the dictionary
-        stats_dict[name]['Mean Minimal'].append(mean1)
-        stats_dict[name]['Mean Full'].append(mean2)
-        stats_dict[name]['Std Minimal'].append(std1)
-        stats_dict[name]['Std Full'].append(std2)
-        stats_dict[name]['P Value'].append(p)
-
-        # Print the results
-        print(f"\n{name} Statistics:")
-        print(f"Mean Minimal: {mean1:.2f}, Mean Full: {mean2:.2f}")
-        print(f"Std Minimal: {std1:.2f}, Std Full: {std2:.2f}")
-        print(f"P-value: {p:.4f}")
-
-    # Save the p-values in a CSV file
-    stats_df = pd.DataFrame(stats_dict)
-    stats_df.to_csv('evaluation/hri_evaluation/stats.csv', index=False)
-    print("\nStats saved to 'evaluation/hri_evaluation/stats.csv'")
-  
-    
-    
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Paired statistics of the HRI questionnaires.")
+    parser.add_argument('-data', type=str, default='evaluation/hri_evaluation/hri-questionnaire.csv', help='CSV file of the questionnaires.')
+    parser.add_argument('-schema', type=str, default=None, help='YAML schema of the study (default: the one of our study).')
+    parser.add_argument('-resamples', type=int, default=2000, help='Bootstrap resamples.')
+    parser.add_argument('-confidence', type=float, default=0.95, help='Level of the bootstrap confidence intervals.')
+    parser.add_argument('-seed', type=int, default=0, help='Seed of the bootstrap.')
+    parser.add_argument('-out', type=str, default='evaluation/hri_evaluation/stats.csv', help='Output CSV file.')
+    args = parser.parse_args()
+
+    results = questionnaire_stats(args.data, load_schema(args.schema), resamples=args.resamples,
+                                  confidence=args.confidence, seed=args.seed)
+
+    # Print the results
+    for row in results.itertuples():
+        print(f"\n[{row.site}] {row.group}: {row.condition_a} vs {row.condition_b} ({row.n} users)")
+        print(f"Mean {row.condition_a}: {row.mean_a:.2f}, Mean {row.condition_b}: {row.mean_b:.2f}")
+        print(f"Std {row.condition_a}: {row.std_a:.2f}, Std {row.condition_b}: {row.std_b:.2f}")
+        print(f"Difference: {row.mean_diff:.2f} [{row.ci_low:.2f}, {row.ci_high:.2f}], Cohen's dz: {row.cohen_dz:.2f}")
+        print(f"P-value: {row.p_value:.4f} (Holm: {row.p_holm:.4f})")
+
+    results.to_csv(args.out, index=False)
+    print(f"\nStats saved to '{args.out}'")
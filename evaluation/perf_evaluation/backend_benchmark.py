@@ -0,0 +1,79 @@
+import sys
+sys.path.insert(0, './neo4j_db')
+
+import time
+import random
+import argparse
+
+from database import make_knowledge_graph
+from kg_benchmark import GENRES, time_calls, print_latencies
+
+
+def seed_children(kg, num_children, activities_per_child=5, seed=0):
+    """Create 'num_children' synthetic children with their activities through the backend API (GraphUnitOfWork).
+    Outputs:
+        keys (list[tuple]): (name, surname, birth) of the created children.
+    """
+
+    rng = random.Random(seed)
+    keys = []
+    with kg.unit_of_work() as uow:
+        for i in range(num_children):
+            key = (f"BenchChild{i}", f"Surname{i % 997}", f"{rng.randint(2010, 2022)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            keys.append(key)
+            uow.add_child_node({"Name": key[0], "Surname": key[1], "Birth": key[2], "Gender": 'Male', "Synthetic": True})
+            for j in range(activities_per_child):
+                uow.add_activity(name=key[0], surname=key[1], birthdate=key[2], genre=rng.choice(GENRES),
+                                 summary=f"synthetic backend activity {i}-{j}", score=rng.random(),
+                                 activityClass=rng.choice(kg.activities))
+    return keys
+
+
+def clear_children(kg):
+    # removes only the synthetic nodes created by seed_children (Neo4j backend)
+    if hasattr(kg, "run_query"):
+        kg.run_query("MATCH (c:Child) WHERE c.Synthetic = true DETACH DELETE c")
+        kg.run_query("MATCH (ad:ActivityDetail) WHERE ad.Summary STARTS WITH 'synthetic backend activity' DETACH DELETE ad")
+
+
+def benchmark_backend(name, kg, num_children, lookups):
+    print(f"\n{name}: seeding {num_children} children ...")
+    start = time.perf_counter()
+    keys = seed_children(kg, num_children)
+    print(f"  done in {time.perf_counter() - start:.2f}s")
+
+    sample = random.Random(1).sample(keys, min(lookups, len(keys)))
+    rng = random.Random(2)
+    print_latencies("get_child (no cache)", time_calls(lambda n, s, b: kg.get_child(name=n, surname=s, birth_date=b, use_cache=False), sample))
+    print_latencies("get_child_preferences", time_calls(lambda n, s, b: kg.get_child_preferences(name=n, surname=s, birth_date=b), sample))
+    print_latencies("get_preference_summary (no cache)", time_calls(lambda n, s, b: kg.get_preference_summary(name=n, surname=s, birth_date=b, use_cache=False), sample))
+    print_latencies("get_last_activity", time_calls(lambda n, s, b: kg.get_last_activity(name=n, surname=s, birth_date=b), sample))
+
+    def add_activity(n, s, b):
+        # same write of kg.add_activity, without its log line
+        with kg.unit_of_work() as uow:
+            uow.add_activity(name=n, surname=s, birthdate=b, genre=rng.choice(GENRES), summary=f"synthetic backend activity {n}-new",
+                             score=rng.random(), activityClass=kg.activities[0])
+    print_latencies("add_activity", time_calls(add_activity, sample))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-operation latency of the knowledge graph backends (neo4j_db/backend.py).")
+    parser.add_argument('-backends', type=str, default='memory', help="Comma separated backends to compare: 'memory' and/or 'neo4j' (local/test database!).")
+    parser.add_argument('-uri', type=str, default='bolt://localhost:7687', help='Neo4j URI of the test database.')
+    parser.add_argument('-user', type=str, default='neo4j', help='Neo4j user.')
+    parser.add_argument('-password', type=str, default='password', help='Neo4j password.')
+    parser.add_argument('-children', type=int, default=1000, help='Number of synthetic children.')
+    parser.add_argument('-lookups', type=int, default=200, help='Number of timed calls per operation.')
+    args = parser.parse_args()
+
+    for backend in args.backends.split(','):
+        if backend == 'neo4j':
+            kg = make_knowledge_graph(backend, uri=args.uri, user=args.user, password=args.password)
+        else:
+            kg = make_knowledge_graph(backend, snapshot_path='')  # never touch the configured snapshot
+        try:
+            benchmark_backend(backend, kg, args.children, args.lookups)
+        finally:
+            clear_children(kg)
+            kg.close()
@@ -0,0 +1,160 @@
+import sys
+sys.path.insert(0, './neo4j_db')
+
+import time
+import random
+import argparse
+import statistics
+
+from database import KnowledgeGraph
+from config import SCHEMA
+
+
+GENRES = ["Fantasy", "Adventure", "Horror", "Romantic", "Comedy", "Pop", "Rock", "Cartoon"]
+
+
+def seed_synthetic_graph(kg, num_children, activities_per_child=5, batch_size=1000, seed=0):
+    """Create 'num_children' synthetic children (marked with Synthetic: true) with LIKES/DISLIKES activities.
+    Outputs:
+        keys (list[tuple]): (name, surname, birth) of the created children.
+    """
+
+    rng = random.Random(seed)
+    kg.build_all_activities()
+    keys = []
+    for start in range(0, num_children, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, num_children)):
+            key = (f"Child{i}", f"Surname{i % 997}", f"{rng.randint(2010, 2022)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+            keys.append(key)
+            rows.append({
+                "name": key[0], "surname": key[1], "birth": key[2],
+                "activities": [{"genre": rng.choice(GENRES), "summary": f"synthetic activity {i}-{j}",
+                                "score": rng.random(), "class_id": rng.randrange(len(kg.activities)),
+                                "days_ago": rng.randint(0, 365)} for j in range(activities_per_child)]
+            })
+        kg.run_query("""
+        UNWIND $rows AS row
+        CREATE (c:Child {Name: row.name, Surname: row.surname, Birth: row.birth, Gender: 'Male', Synthetic: true})
+        WITH c, row
+        UNWIND row.activities AS act
+        CREATE (ad:ActivityDetail {Genre: act.genre, Summary: act.summary, Synthetic: true})
+        WITH c, ad, act
+        MATCH (a:Activity {Id: act.class_id})
+        CREATE (ad)-[:SUBCLASS_OF]->(a)
+        FOREACH (_ IN CASE WHEN act.score > 0.5 THEN [1] ELSE [] END |
+            CREATE (c)-[:LIKES {score: act.score, date: datetime() - duration({days: act.days_ago})}]->(ad))
+        FOREACH (_ IN CASE WHEN act.score <= 0.5 THEN [1] ELSE [] END |
+            CREATE (c)-[:DISLIKES {score: act.score, date: datetime() - duration({days: act.days_ago})}]->(ad))
+        """, {"rows": rows})
+    return keys
+
+
+def clear_synthetic_graph(kg):
+    # removes only the synthetic nodes created by seed_synthetic_graph
+    kg.run_query("MATCH (n) WHERE n.Synthetic = true DETACH DELETE n")
+
+
+def drop_schema(kg):
+    # removes the indexes/constraints of config.py SCHEMA and the recorded schema version (test database only!)
+    for kind, name, _ in SCHEMA:
+        kg.run_query(f"DROP {kind} {name} IF EXISTS")
+    kg.run_query("MATCH (m:SchemaMigration) DELETE m")
+
+
+def scaling_benchmark(kg, sizes, lookups):
+    """Child lookup latency for growing graphs, without and with the schema indexes."""
+    print(f"\nScaling of get_child(name, surname, birth) ({lookups} lookups per size):")
+    keys = []
+    for size in sorted(sizes):
+        # the graph grows incrementally up to 'size' children
+        new_keys = seed_synthetic_graph(kg, size - len(keys), seed=size)
+        keys += [(f"{name}_{size}", surname, birth) for name, surname, birth in new_keys]
+        kg.run_query("MATCH (c:Child) WHERE c.Synthetic = true AND NOT c.Name CONTAINS '_' SET c.Name = c.Name + '_' + $size",
+                     {"size": str(size)})
+        sample = random.Random(size).sample(keys, min(lookups, len(keys)))
+        drop_schema(kg)
+        no_index = time_calls(lambda n, s, b: kg.get_child(name=n, surname=s, birth_date=b), sample)
+        kg.migrate_schema()
+        kg.run_query("CALL db.awaitIndexes(300)")
+        with_index = time_calls(lambda n, s, b: kg.get_child(name=n, surname=s, birth_date=b), sample)
+        print(f"  {size:>7} children: label scan {statistics.mean(no_index):8.2f} ms   indexed {statistics.mean(with_index):8.2f} ms")
+
+
+def legacy_get_child(kg, name=None, surname=None, birth_date=None):
+    """Previous N+1 implementation of KnowledgeGraph.get_child (1 + 2N round-trips), kept as the baseline."""
+    results = kg.run_query("""
+        MATCH (c:Child)
+        WHERE ($name IS NULL OR c.Name = $name)
+          AND ($surname IS NULL OR c.Surname = $surname)
+          AND ($birth_date IS NULL OR c.Birth = $birth_date)
+        RETURN properties(c) AS child
+        """, {"name": name, "surname": surname, "birth_date": birth_date})
+    child_info = []
+    for record in results:
+        child = record["child"]
+        child.update(kg.get_child_preferences(name=child["Name"], surname=child["Surname"], birth_date=child["Birth"]))
+        last_activity = kg.get_last_activity(name=child["Name"], surname=child["Surname"], birth_date=child["Birth"])
+        if last_activity:
+            child.update(last_activity)
+        child_info.append(child)
+    return child_info
+
+
+def time_calls(fn, calls):
+    # returns the latencies in milliseconds of fn(*args) for each args in calls
+    latencies = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def print_latencies(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"  {name:<40} mean {statistics.mean(latencies):8.2f} ms   p50 {statistics.median(latencies):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KnowledgeGraph benchmark on a synthetic graph (use a local/test database!).")
+    parser.add_argument('-uri', type=str, default='bolt://localhost:7687', help='Neo4j URI of the test database.')
+    parser.add_argument('-user', type=str, default='neo4j', help='Neo4j user.')
+    parser.add_argument('-password', type=str, default='password', help='Neo4j password.')
+    parser.add_argument('-children', type=int, default=10000, help='Number of synthetic children.')
+    parser.add_argument('-lookups', type=int, default=200, help='Number of child lookups.')
+    parser.add_argument('-full_scan', action='store_true', help='Also time get_child() without filters (slow with the legacy code).')
+    parser.add_argument('-keep', action='store_true', help='Do not delete the synthetic graph at the end.')
+    parser.add_argument('-scaling', type=str, default=None, help='Comma separated graph sizes for the index scaling benchmark (e.g. 1000,10000,50000).')
+    args = parser.parse_args()
+
+    kg = KnowledgeGraph(uri=args.uri, user=args.user, password=args.password)
+
+    if args.scaling:
+        try:
+            scaling_benchmark(kg, [int(size) for size in args.scaling.split(',')], args.lookups)
+        finally:
+            if not args.keep:
+                clear_synthetic_graph(kg)
+            kg.close()
+        sys.exit(0)
+    print(f"Seeding {args.children} synthetic children ...")
+    start = time.perf_counter()
+    keys = seed_synthetic_graph(kg, args.children)
+    print(f"  done in {time.perf_counter() - start:.1f}s")
+
+    try:
+        sample = [(name, surname) for name, surname, _ in random.Random(1).sample(keys, min(args.lookups, len(keys)))]
+        print(f"\nget_child(name, surname) over {len(sample)} lookups:")
+        print_latencies("legacy (1 + 2N queries)", time_calls(lambda n, s: legacy_get_child(kg, name=n, surname=s), sample))
+        print_latencies("single query", time_calls(lambda n, s: kg.get_child(name=n, surname=s), sample))
+
+        if args.full_scan:
+            print(f"\nget_child() over all the {args.children} children:")
+            print_latencies("legacy (1 + 2N queries)", time_calls(lambda: legacy_get_child(kg), [()]))
+            print_latencies("single query", time_calls(kg.get_child, [()]))
+    finally:
+        if not args.keep:
+            clear_synthetic_graph(kg)
+        kg.close()
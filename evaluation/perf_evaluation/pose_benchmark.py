@@ -0,0 +1,75 @@
+import sys
+sys.path.insert(0, './face')
+
+import time
+import argparse
+from types import SimpleNamespace
+import numpy as np
+import cv2
+
+from face import face_pose_estimator, head_pose_estimator, irid_pose_estimator
+
+
+def make_fake_landmarks(rng):
+    """Build a fake mediapipe face landmarks object (478 points) with plausible normalized coordinates.
+    Args:
+        rng (np.random.Generator): random generator.
+    Outputs:
+        face_lm (obj): object with a 'landmark' list of points having x, y, z attributes.
+    """
+
+    points = rng.uniform(0.3, 0.7, size=(478, 3))
+    points[:, 2] = rng.uniform(-0.05, 0.05, size=478)
+    return SimpleNamespace(landmark=[SimpleNamespace(x=float(x), y=float(y), z=float(z)) for x, y, z in points])
+
+
+def legacy_pose(face_lm, w, h):
+    """Reference implementation of the previous per-estimator code path (list comprehensions over the landmarks,
+    camera matrix rebuilt at each call), kept here only as the baseline of the benchmark.
+    """
+
+    poses = []
+    for landmarks_idx in ([1, 33, 263, 61, 291, 199], [468, 469, 470, 471, 472, 473, 474, 475, 476, 477]):
+        pts_2d = [(int(face_lm.landmark[idx].x*w), int(face_lm.landmark[idx].y*h)) for idx in landmarks_idx]
+        pts_3d = [(int(face_lm.landmark[idx].x*w), int(face_lm.landmark[idx].y*h), face_lm.landmark[idx].z) for idx in landmarks_idx]
+        camera_matrix = np.array([[1.0*w, 0, w/2], [0, 1.0*w, h/2], [0, 0, 1]])
+        dist_coeffs = np.zeros((4, 1))
+        success, rot_vec, _ = cv2.solvePnP(np.array(pts_3d, dtype=np.float32), np.array(pts_2d, dtype=np.float32), camera_matrix, dist_coeffs)
+        R, _ = cv2.Rodrigues(rot_vec)
+        angles, _, _, _, _, _ = cv2.RQDecomp3x3(R)
+        poses.append((pts_2d, (angles[0]*360, angles[1]*360, angles[2]*360)))
+    return poses
+
+
+def time_per_frame(fn, frames, w, h, repeat):
+    # returns the best mean time per frame (in microseconds) over 'repeat' runs
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for face_lm in frames:
+            fn(face_lm, w, h)
+        best = min(best, (time.perf_counter() - start) / len(frames))
+    return best * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the per-frame pose estimation cost.")
+    parser.add_argument('-frames', type=int, default=500, help='Number of synthetic frames.')
+    parser.add_argument('-repeat', type=int, default=5, help='Number of repetitions (the best one is reported).')
+    parser.add_argument('-width', type=int, default=640, help='Frame width.')
+    parser.add_argument('-height', type=int, default=480, help='Frame height.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [make_fake_landmarks(rng) for _ in range(args.frames)]
+    w, h = args.width, args.height
+
+    candidates = {
+        'legacy (list comprehensions)': legacy_pose,
+        'head_pose_estimator + irid_pose_estimator': lambda lm, w, h: (head_pose_estimator(lm, w, h), irid_pose_estimator(lm, w, h)),
+        'face_pose_estimator (fused)': face_pose_estimator,
+    }
+
+    print(f"Pose estimation cost per frame ({args.frames} frames, {w}x{h}):")
+    for name, fn in candidates.items():
+        print(f"  {name:<45} {time_per_frame(fn, frames, w, h, args.repeat):8.1f} us/frame")
@@ -0,0 +1,149 @@
+import sys
+sys.path.insert(0, './server')
+
+import io
+import os
+import json
+import time
+import wave
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from latency import percentiles
+
+# /send_data is not in the sweep: it is the poll of the one robot (chat 'test'), not of the browser sessions of -multi_session
+ENDPOINTS = ["/submit", "/chat/start", "/chat/send_message", "/chat/send_audio", "/chat/exit"]
+MESSAGES = ["Ciao, mi chiamo Luca", "Mi piacciono i draghi", "Facciamo una storia?", "Il drago vola sul mare", "Basta così"]
+
+
+def silent_wav(seconds=1.0, rate=16000):
+    # audio sent to /chat/send_audio (the content does not matter to the local ASR stand-in)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+def run_session(url, index, turns, audio_turns, audio):
+    """One synthetic session of a new child through the server endpoints, as the browser and the robot client do.
+    Outputs:
+        samples (list[tuple]): (endpoint, seconds, ok) of every request.
+    """
+
+    client = requests.Session()
+    samples = []
+
+    def call(endpoint, method="get", **kwargs):
+        start = time.perf_counter()
+        try:
+            response = getattr(client, method)(url + endpoint, timeout=120, **kwargs)
+            ok = response.status_code < 400
+        except requests.exceptions.RequestException:
+            ok = False
+        samples.append((endpoint, time.perf_counter() - start, ok))
+
+    call("/submit", "post", data={"name": f"Bench{index}", "surname": "Benchmark", "sex": "M", "birth": "2015-01-01"})
+    call("/chat/start")
+    for turn in range(turns):
+        call("/chat/send_message", "post", json={"message": MESSAGES[turn % len(MESSAGES)]})
+    for _ in range(audio_turns):
+        call("/chat/send_audio", "post", files={"audio": ("audio.wav", audio, "audio/wav")})
+    call("/chat/exit", "post")
+    return samples
+
+
+def run_level(url, concurrency, sessions, turns, audio_turns):
+    # 'sessions' sessions, 'concurrency' at a time, then the stage latencies measured by the server
+    requests.get(url + "/metrics", params={"reset": 1}, timeout=30)
+    audio = silent_wav()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda i: run_session(url, f"{concurrency}_{i}", turns, audio_turns, audio), range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    samples = [sample for session in results for sample in session]
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        latencies = [seconds for name, seconds, ok in samples if name == endpoint and ok]
+        errors = sum(1 for name, _, ok in samples if name == endpoint and not ok)
+        if latencies or errors:
+            endpoints[endpoint] = dict(percentiles(latencies), errors=errors)
+    server_metrics = requests.get(url + "/metrics", params={"reset": 1}, timeout=30).json()
+    return {"concurrency": concurrency, "sessions": sessions, "seconds": round(elapsed, 2),
+            "sessions_per_min": round(sessions / elapsed * 60, 2), "endpoints": endpoints,
+            "stages": server_metrics.get("stages", {}), "jobs": server_metrics.get("jobs", {})}
+
+
+def print_level(level):
+    print(f"\nconcurrency {level['concurrency']}: {level['sessions']} sessions in {level['seconds']}s ({level['sessions_per_min']} sessions/min)")
+    for kind in ("endpoints", "stages"):
+        for name, stats in level[kind].items():
+            if not stats.get("count"):
+                print(f"  {name:<22} no successful request, {stats.get('errors', 0)} errors")
+                continue
+            print(f"  {name:<22} p50 {stats['p50_ms']:9.1f} ms   p95 {stats['p95_ms']:9.1f} ms   p99 {stats['p99_ms']:9.1f} ms"
+                  + (f"   errors {stats['errors']}" if stats.get("errors") else ""))
+
+
+def launch_stubs(args):
+    """Start the local LLM/ASR stand-in (llm/fake_llm_server.py) and the server with no camera, offline text to speech,
+    one chat per browser session and the in-memory graph. Returns the processes to stop at the end."""
+    env = dict(os.environ, LLM_API_BASE_URL=f"http://localhost:{args.llm_port}/openai/v1", GRAPH_BACKEND="memory")
+    fake = subprocess.Popen([sys.executable, "llm/fake_llm_server.py", "-port", str(args.llm_port), "-profile", args.profile])
+    server = subprocess.Popen([sys.executable, "server/server.py", "-experiment", "full", "-sensing", "off", "-tts", "offline",
+                               "-multi_session", "-jobs_db", args.jobs_db], env=env)
+    for _ in range(120):
+        try:
+            requests.get(args.url + "/metrics", timeout=1)
+            return [server, fake]
+        except requests.exceptions.RequestException:
+            time.sleep(0.5)
+    for proc in (server, fake):
+        proc.terminate()
+    raise RuntimeError("the server did not start, see its output above")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end turn latency of server/server.py with synthetic sessions.")
+    parser.add_argument('-url', type=str, default='http://localhost:5000', help='URL of the server.')
+    parser.add_argument('-launch', action='store_true', help='Start the server and the local LLM/ASR stand-in (no network, no camera).')
+    parser.add_argument('-profile', type=str, default='groq', help='Latency profile of the LLM stand-in (with -launch).')
+    parser.add_argument('-llm_port', type=int, default=8000, help='Port of the LLM stand-in (with -launch).')
+    parser.add_argument('-jobs_db', type=str, default='server/jobs_benchmark.sqlite', help='Job queue file of the launched server.')
+    parser.add_argument('-concurrency', type=str, default='1,2,4,8', help='Comma separated concurrent sessions of the sweep.')
+    parser.add_argument('-sessions', type=int, default=8, help='Sessions per concurrency level.')
+    parser.add_argument('-turns', type=int, default=4, help='Text turns per session.')
+    parser.add_argument('-audio_turns', type=int, default=1, help='Audio turns per session.')
+    parser.add_argument('-out', type=str, default='evaluation/perf_evaluation/server_benchmark.json', help='Machine readable results.')
+    args = parser.parse_args()
+
+    processes = launch_stubs(args) if args.launch else []
+    try:
+        levels = []
+        for concurrency in [int(c) for c in args.concurrency.split(',')]:
+            level = run_level(args.url, concurrency, max(args.sessions, concurrency), args.turns, args.audio_turns)
+            print_level(level)
+            levels.append(level)
+    finally:
+        for proc in processes:
+            proc.terminate()
+
+    # the latencies of failed requests are not comparable: no results with errors
+    errors = {f"{level['concurrency']} {endpoint}": stats["errors"] for level in levels
+              for endpoint, stats in level["endpoints"].items() if stats.get("errors")}
+    if errors:
+        print(f"\nRequests with errors (concurrency endpoint: errors): {errors}, results not saved")
+        sys.exit(1)
+
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "url": args.url, "launched": args.launch,
+               "profile": args.profile if args.launch else None, "turns": args.turns, "audio_turns": args.audio_turns,
+               "levels": levels}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved in {args.out}")
@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import requests
+
+"""
+Cold start of the server: how long the imports of its modules take ('python -X importtime' in a new interpreter, the
+slowest imports made by each module) and how long server/server.py takes to answer its first request for some
+startup configurations (in-memory graph and the local LLM stand-in, so no database or network is needed). Example
+(from the root of the repository):
+    python evaluation/perf_evaluation/startup_benchmark.py -repeat 3 -out startup.json
+"""
+
+# modules of the server, in the paths of server/server.py
+IMPORT_PATHS = ['./audio', './neo4j_db', './llm', './server', './face']
+MODULES = ["flask", "TherapistLLM", "DatabaseLLM", "database", "memory_graph", "audio_api", "pydub", "gtts", "face_main"]
+CONFIGS = {
+    "minimal": ["-experiment", "minimal", "-sensing", "off"],
+    "full_no_camera": ["-experiment", "full", "-sensing", "off", "-tts", "offline"],
+    "full": ["-experiment", "full", "-sensing", "thread"],
+}
+
+
+def import_profile(module, top=10):
+    """Import time of 'module' in a new interpreter.
+    Outputs:
+        profile (dict): wall time of the import and the 'top' slowest imports made by the module (cumulative time of -X importtime)
+    """
+
+    code = f"import sys; sys.path[:0] = {IMPORT_PATHS!r}; import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    env = dict(os.environ, LLM_API_BASE_URL=os.environ.get("LLM_API_BASE_URL", "http://localhost:8000/openai/v1"))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        return {"module": module, "error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"}
+    packages, children = [], []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package (indented by 2 spaces per level of nesting)
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            # the imports made directly by the module are printed just before it
+            if name.strip() == module:
+                packages = children
+            children = []
+    packages.sort(reverse=True)
+    return {"module": module, "seconds": round(float(result.stdout.strip().splitlines()[-1]), 3),
+            "slowest": [{"package": name, "ms": round(us / 1000, 1)} for us, name in packages[:top]]}
+
+
+def time_to_ready(config, url, llm_port, timeout=300):
+    # seconds from the start of the server process to its first answer
+    env = dict(os.environ, LLM_API_BASE_URL=f"http://localhost:{llm_port}/openai/v1", GRAPH_BACKEND="memory")
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "server/server.py", "-jobs_db", "server/jobs_benchmark.sqlite"] + CONFIGS[config],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                return None  # the server stopped (e.g. a missing dependency of this configuration)
+            try:
+                requests.get(url + "/metrics", timeout=1)
+                return round(time.perf_counter() - start, 3)
+            except requests.exceptions.RequestException:
+                time.sleep(0.05)
+        return None
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time profile and cold start time of the server.")
+    parser.add_argument('-modules', type=str, default=",".join(MODULES), help='Comma separated modules to profile.')
+    parser.add_argument('-configs', type=str, default=",".join(CONFIGS), help=f"Comma separated startup configurations: {', '.join(CONFIGS)}.")
+    parser.add_argument('-repeat', type=int, default=3, help='Server starts per configuration.')
+    parser.add_argument('-top', type=int, default=10, help='Slowest imports reported per module.')
+    parser.add_argument('-url', type=str, default='http://localhost:5000', help='URL of the server.')
+    parser.add_argument('-llm_port', type=int, default=8000, help='Port of the local LLM stand-in started by the benchmark.')
+    parser.add_argument('-out', type=str, default=None, help='JSON file of the results.')
+    args = parser.parse_args()
+
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "imports": [], "startup": {}}
+    print("Import time (new interpreter):")
+    for module in args.modules.split(','):
+        profile = import_profile(module, args.top)
+        results["imports"].append(profile)
+        if "error" in profile:
+            print(f"  {module:<16} not importable: {profile['error']}")
+            continue
+        slowest = ", ".join(f"{p['package']} {p['ms']} ms" for p in profile["slowest"][:3])
+        print(f"  {module:<16} {profile['seconds']:7.3f} s   ({slowest})")
+
+    fake = subprocess.Popen([sys.executable, "llm/fake_llm_server.py", "-port", str(args.llm_port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        print("Server time to first answer:")
+        for config in args.configs.split(','):
+            times = [time_to_ready(config, args.url, args.llm_port) for _ in range(args.repeat)]
+            ok = [t for t in times if t is not None]
+            results["startup"][config] = {"runs_s": times, "best_s": min(ok) if ok else None,
+                                          "mean_s": round(sum(ok) / len(ok), 3) if ok else None}
+            print(f"  {config:<16} " + (f"best {min(ok):.2f} s, mean {sum(ok) / len(ok):.2f} s" if ok else "did not start"))
+    finally:
+        fake.terminate()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved in {args.out}")
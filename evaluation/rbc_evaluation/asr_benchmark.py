@@ -0,0 +1,172 @@
+import sys
+sys.path.insert(0, './audio')
+sys.path.insert(0, './llm')
+
+import os
+import re
+import csv
+import json
+import glob
+import time
+import wave
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+"""
+Offline evaluation of the speech to text on the samples recorded by 'benchmark.py -audio'
+('audio_sample_<i>.wav' with the sentence read by the tester in 'reference_<i>.txt').
+
+Every backend transcribes the whole set with '-workers' concurrent requests; for each backend it reports the word error
+rate (WER) against the references, the real time factor (processing time / audio duration), the throughput and the
+latency distribution, and writes the per-sample table and the summary to '-out'. Example:
+    python evaluation/rbc_evaluation/asr_benchmark.py -backends groq:whisper-large-v3,groq:whisper-large-v3-turbo -workers 8
+"""
+
+
+def normalize(text):
+    # lowercase words without punctuation (the WER does not count the case and the punctuation)
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def word_errors(reference, hypothesis):
+    """Levenshtein distance between the word sequences (substitutions + deletions + insertions), one row of the
+    dynamic programming table at a time as a NumPy vector.
+    Outputs:
+        errors (int), reference length (int)
+    """
+
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    if not ref:
+        return len(hyp), 0
+    previous = np.arange(len(hyp) + 1)
+    hyp_words = np.array(hyp, dtype=object)
+    for i, word in enumerate(ref, start=1):
+        substitution = previous[:-1] + (hyp_words != word)
+        current = np.empty_like(previous)
+        current[0] = i
+        current[1:] = np.minimum(substitution, previous[1:] + 1)  # substitution / match or deletion
+        # insertions depend on the left cell of the same row: running minimum of (cell - column) + column
+        columns = np.arange(len(hyp) + 1)
+        current = np.minimum.accumulate(current - columns) + columns
+        previous = current
+    return int(previous[-1]), len(ref)
+
+
+def audio_duration(path):
+    with wave.open(path, "rb") as f:
+        return f.getnframes() / float(f.getframerate())
+
+
+def make_backend(spec, api_key):
+    """ASR backend from its spec, 'groq:<model>' (the Groq API, or the local stand-in set by LLM_API_BASE_URL)
+    or 'whisper:<model>' (local openai-whisper, if installed).
+    Outputs:
+        transcribe (callable): path -> text
+    """
+
+    kind, _, model = spec.partition(":")
+    if kind == "groq":
+        from audio_api import audio_groq_api
+        return lambda path: audio_groq_api(api_key=api_key, model_name=model or 'whisper-large-v3', audio_path=path)
+    if kind == "whisper":
+        import whisper  # optional dependency, only for the local backend
+        asr_model = whisper.load_model(model or "base")
+        return lambda path: asr_model.transcribe(path, language="it")["text"]
+    raise ValueError(f"Unknown ASR backend '{spec}': use 'groq:<model>' or 'whisper:<model>'")
+
+
+def load_samples(path):
+    # (index, wav path, reference text or None) of the recorded samples, in recording order
+    samples = []
+    for wav_path in glob.glob(os.path.join(path, "audio_sample_*.wav")):
+        index = int(re.search(r"audio_sample_(\d+)\.wav$", wav_path).group(1))
+        reference_path = os.path.join(path, f"reference_{index}.txt")
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                reference = f.read().strip()
+        samples.append((index, wav_path, reference))
+    return sorted(samples)
+
+
+def evaluate_backend(name, transcribe, samples, workers):
+    """Transcribe all the samples with 'workers' concurrent requests.
+    Outputs:
+        rows (list[dict]): per sample results, summary (dict): WER, real time factor, throughput and latencies.
+    """
+
+    def run(sample):
+        index, wav_path, reference = sample
+        start = time.perf_counter()
+        try:
+            text, error = transcribe(wav_path), None
+        except Exception as e:
+            text, error = None, str(e)
+        latency = time.perf_counter() - start
+        errors, words = word_errors(reference, text) if reference is not None and text is not None else (None, None)
+        return {"backend": name, "sample": index, "duration_s": round(audio_duration(wav_path), 3),
+                "latency_s": round(latency, 3), "transcription": text, "reference": reference,
+                "word_errors": errors, "reference_words": words, "error": error}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        rows = list(executor.map(run, samples))
+    elapsed = time.perf_counter() - start
+
+    ok = [row for row in rows if row["transcription"] is not None]
+    latencies = np.array([row["latency_s"] for row in ok]) if ok else np.zeros(0)
+    audio_s = sum(row["duration_s"] for row in ok)
+    scored = [row for row in ok if row["word_errors"] is not None]
+    reference_words = sum(row["reference_words"] for row in scored)
+    summary = {
+        "backend": name, "samples": len(rows), "failed": len(rows) - len(ok), "workers": workers,
+        "wer": round(sum(row["word_errors"] for row in scored) / reference_words, 4) if reference_words else None,
+        "audio_s": round(audio_s, 1), "wall_s": round(elapsed, 2),
+        # processing time per second of audio (one request at a time) and audio transcribed per second (all workers)
+        "rtf": round(latencies.sum() / audio_s, 4) if audio_s else None,
+        "throughput_audio_s_per_s": round(audio_s / elapsed, 2) if elapsed else None,
+        "throughput_samples_per_s": round(len(ok) / elapsed, 2) if elapsed else None,
+    }
+    if len(latencies):
+        for p in (50, 95, 99):
+            summary[f"latency_p{p}_s"] = round(float(np.percentile(latencies, p)), 3)
+    return rows, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline speech to text evaluation of the recorded samples (WER, real time factor, latency).")
+    parser.add_argument('-path', type=str, default='./evaluation/rbc_evaluation/audio/', help='Folder of the recorded samples and references.')
+    parser.add_argument('-backends', type=str, default='groq:whisper-large-v3', help="Comma separated backends: 'groq:<model>' or 'whisper:<model>'.")
+    parser.add_argument('-workers', type=int, default=4, help='Concurrent transcriptions.')
+    parser.add_argument('-out', type=str, default='./evaluation/rbc_evaluation/asr_results', help='Output folder (per sample CSV and summary JSON).')
+    args = parser.parse_args()
+
+    if os.name == 'nt':
+        from llm.llm_api import groq_api_key
+    else:
+        from llm_api import groq_api_key
+
+    samples = load_samples(args.path)
+    if not samples:
+        print(f"No 'audio_sample_*.wav' in {args.path}: record them with 'python evaluation/rbc_evaluation/benchmark.py -audio'")
+        sys.exit(1)
+    print(f"{len(samples)} samples ({sum(1 for s in samples if s[2] is not None)} with reference)")
+
+    os.makedirs(args.out, exist_ok=True)
+    all_rows, summaries = [], []
+    for spec in args.backends.split(','):
+        rows, summary = evaluate_backend(spec, make_backend(spec, groq_api_key), samples, args.workers)
+        all_rows += rows
+        summaries.append(summary)
+        print(f"  {spec:<32} WER {summary['wer']}   RTF {summary['rtf']}   {summary['throughput_audio_s_per_s']} audio s/s   "
+              f"p50 {summary.get('latency_p50_s')} s   p95 {summary.get('latency_p95_s')} s   failed {summary['failed']}")
+
+    with open(os.path.join(args.out, "transcriptions.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(all_rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(all_rows)
+    with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2)
+    print(f"Results saved in {args.out}")
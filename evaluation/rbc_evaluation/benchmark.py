@@ -10,9 +10,8 @@ import time
 import os
 from gtts import gTTS
 
-from face_main import analyze_emotion, head_pose_estimator, irid_pose_estimator, gaze_estimator, score, get_screen_resolution
+from face_main import analyze_emotion, face_pose_estimator, gaze_estimator, score, get_screen_resolution
 from audio import record_audio
-from audio_api import audio_groq_api
 
 def attention_benchmark(q, stop_event):
 
@@ -87,10 +86,11 @@ def attention_benchmark(q, stop_event):
                     # Pass the frame to the eye_landmark_extraction function that returns the left and right eye landmarks, and the pupil coordinates
                     #left_eye_coords, right_eye_coords, left_pupil, right_pupil, outer_boundary_left, outer_boundary_right, lower_boundary_left, lower_boundary_right = eye_landmark_extraction(face_lm, w, h)
                     
-                    # Compute the head pose
-                    nose_2d, face_2d, theta_head = head_pose_estimator(face_lm, w, h)
-                    
-                    irid_2d, theta_eye = irid_pose_estimator(face_lm, w, h)
+                    # Compute the head pose and the irid pose with a single landmark conversion
+                    pose = face_pose_estimator(face_lm, w, h)
+                    if pose is None:
+                        continue
+                    nose_2d, face_2d, irid_2d, theta_head, theta_eye = pose
                     #left_eye_coords += irid_2d[0:5]
                     #right_eye_coords += irid_2d[5:]
 
@@ -159,18 +159,38 @@ def attention_benchmark(q, stop_event):
     camera.release()
     
 
+# sentences read by the tester, saved as the references of the word error rate (asr_benchmark.py)
+REFERENCE_SENTENCES = [
+    "Ciao, mi chiamo Luca e ho otto anni.",
+    "Mi piacciono molto le storie di draghi e cavalieri.",
+    "Oggi vorrei cantare una canzone insieme a te.",
+    "Il mio animale preferito è il gatto.",
+    "Facciamo una storia su un pirata che cerca un tesoro.",
+    "Non mi piace questa storia, cambiamo gioco.",
+]
+
+
 def audio_benchmark(samples):
+    # recording phase only: the tester reads the shown sentence, the audio and the reference text are saved.
+    # The transcription is evaluated offline (concurrently, with the WER) by asr_benchmark.py
+    path = "./evaluation/rbc_evaluation/audio/"
     for i in range(1,samples+1):
-        path = "./evaluation/rbc_evaluation/audio/"
-        print("recording sample ", i)
+        reference = REFERENCE_SENTENCES[(i - 1) % len(REFERENCE_SENTENCES)]
+        print(f"recording sample {i}, read: '{reference}'")
         record_audio(path+"audio_sample_"+str(i)+".wav")
-        print("transcribing sample ", i)
-        response = audio_groq_api(api_key = groq_api_key, model_name = 'whisper-large-v3', audio_path = path+"audio_sample_"+str(i)+".wav")
-        with open(path+"transcription_"+str(i)+".txt", "w") as text_file:
-            text_file.write(response)
-        print("synthesizing sample ", i)
-        tts = gTTS(response, lang="it")
+        with open(path+"reference_"+str(i)+".txt", "w", encoding="utf-8") as text_file:
+            text_file.write(reference)
+    print("Evaluate the transcription with 'python evaluation/rbc_evaluation/asr_benchmark.py'")
+
+
+def tts_benchmark(path="./evaluation/rbc_evaluation/audio/"):
+    # synthesizes the references of the recorded samples (text to speech check of the RBC evaluation)
+    i = 1
+    while os.path.exists(path+"reference_"+str(i)+".txt"):
+        with open(path+"reference_"+str(i)+".txt", "r", encoding="utf-8") as text_file:
+            tts = gTTS(text_file.read(), lang="it")
         tts.save(path+"tts_"+str(i)+".mp3")
+        i += 1
     
     
 if __name__ == "__main__":
@@ -179,17 +199,18 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Benchmarking script for engagement and audio models.")
-    parser.add_argument('-audio_samples', type=int, default=100, help='Number of audio samples to record and transcribe.')
-    parser.add_argument('-audio', action='store_true', help='Flag to run audio benchmark.')
+    parser.add_argument('-audio_samples', type=int, default=100, help='Number of audio samples to record.')
+    parser.add_argument('-audio', action='store_true', help='Flag to record the audio samples (evaluated by asr_benchmark.py).')
+    parser.add_argument('-tts', action='store_true', help='Flag to synthesize the references of the recorded samples.')
     parser.add_argument('-engagement', action='store_true', help='Flag to run engagement benchmark.')
     args = parser.parse_args()
     
-    with open("llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
-    
     if args.audio:
         os.makedirs("./evaluation/rbc_evaluation/audio/", exist_ok=True)
         audio_benchmark(args.audio_samples)
+
+    if args.tts:
+        tts_benchmark()
         
     if args.engagement:
         stop_event = threading.Event()
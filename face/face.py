@@ -4,19 +4,29 @@ import numpy as np
 import mediapipe as mp
 import cv2
 import time
-import tkinter as tk
+import functools
+import os
 
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
 
-def get_screen_resolution():
+
+def get_screen_resolution(default=(1920, 1080)):
     """ Function to get the screen resolution.
     Args:
-        
+        default (tuple): resolution returned when tkinter is not installed or there is no display (headless nodes).
     Outputs:
         - width (int): The width of the screen
         - height (int): The height of the screen.
     """
 
-    root = tk.Tk()
+    # tkinter is imported here so that it is an optional dependency of the sensing
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return default
     width = root.winfo_screenwidth()
     height = root.winfo_screenheight()
     root.destroy()  # Close the tkinter window
@@ -25,7 +35,7 @@ def get_screen_resolution():
 def analyze_emotion(image_path):
     """Analyze the emotion in the given image (one frame of the video) using DeepFace.
     Args:
-        image_path (str): Path to the image file.
+        image_path (str or np.ndarray): Path to the image file, or the BGR frame itself (avoids writing it to disk).
     Outputs:
         emotion (str): The emotion with the highest score.
     """
@@ -89,27 +99,41 @@ def eye_landmark_extraction(face_lm, w, h):
     return left_eye_coords, right_eye_coords, left_pupil, right_pupil, outer_boundary_left, outer_boundary_right, lower_boundary_left, lower_boundary_right
 '''
 
-def irid_pose_estimator(face_lm, w, h):
+# Mediapipe landmarks used by the pose estimators. They are gathered once per frame in a single
+# (N, 3) array (see landmarks_to_array) and then sliced with the index arrays below.
+# 1: Nose tip, 33: Left eye outer corner, 263: Right eye outer corner, 61: Left mouth corner, 291: Right mouth corner, 199: Chin
+HEAD_LANDMARKS_IDX = np.array([1, 33, 263, 61, 291, 199])
+# 468-472: left eye irid points, 473-477: right eye irid points
+IRID_LANDMARKS_IDX = np.arange(468, 478)
+# All the landmarks needed by face_pose_estimator (head first, then irids) and their positions inside that array
+POSE_LANDMARKS_IDX = np.concatenate([HEAD_LANDMARKS_IDX, IRID_LANDMARKS_IDX])
+HEAD_ROWS = np.arange(0, len(HEAD_LANDMARKS_IDX))
+IRID_ROWS = np.arange(len(HEAD_LANDMARKS_IDX), len(POSE_LANDMARKS_IDX))
 
-    """Estimate the head pose in the given image.
+
+def landmarks_to_array(face_lm, landmarks_idx=POSE_LANDMARKS_IDX):
+    """Convert the mediapipe landmarks to a numpy array (done once per frame).
     Args:
         face_lm (list[obj]): the face landmarks obtained from the mediapipe Face Mesh model.
+        landmarks_idx (np.ndarray): indices of the landmarks to extract (default: the ones used by the pose estimators).
     Outputs:
-        
+        points (np.ndarray): (N, 3) float32 array with the normalized (x, y, z) coordinates of the landmarks.
     """
-    # Define a list of landmarks used to solve the PnP problem
-    # 468-472: left eye irid points
-    # 473-477: right eye irid points
-    
-    landmarks_idx = [468, 469, 470, 471, 472, 473, 474, 475, 476, 477]
 
-    # Create a list of 2D and 3D points for the other landmarks scaling the normalized coordinates to the image dimensions
-    irid_2d = [(int(face_lm.landmark[idx].x*w), int(face_lm.landmark[idx].y*h)) for idx in landmarks_idx]
-    irid_3d = [(int(face_lm.landmark[idx].x*w), int(face_lm.landmark[idx].y*h), face_lm.landmark[idx].z) for idx in landmarks_idx]
+    landmark = face_lm.landmark
+    return np.array([(landmark[idx].x, landmark[idx].y, landmark[idx].z) for idx in landmarks_idx], dtype=np.float32)
 
-    # Convert the 2D and 3D points to numpy arrays
-    irid_2d_np = np.array(irid_2d, dtype=np.float32)
-    irid_3d_np = np.array(irid_3d, dtype=np.float32)
+
+@functools.lru_cache(maxsize=8)
+def camera_intrinsics(w, h):
+    """Return the camera matrix and distortion coefficients for a given frame size (cached per frame size).
+    Args:
+        w (int): width of the frame.
+        h (int): height of the frame.
+    Outputs:
+        camera_matrix (np.ndarray): 3x3 pinhole camera matrix (read-only).
+        dist_coeffs (np.ndarray): 4x1 distortion coefficients (read-only).
+    """
 
     # Define the camera matrix (assuming a simple pinhole camera model), focal length and distortion coefficients
     cx, cy = w / 2, h / 2  # Principal point (center of the image)
@@ -119,81 +143,110 @@ def irid_pose_estimator(face_lm, w, h):
                               [0, 0, 1]])
     dist_coeffs = np.zeros((4, 1))  # Assuming no lens distortion
 
+    # The arrays are shared between all the calls with the same frame size, so they must not be modified
+    camera_matrix.setflags(write=False)
+    dist_coeffs.setflags(write=False)
+    return camera_matrix, dist_coeffs
+
+
+def solve_pose(points, w, h):
+    """Solve the PnP problem for a set of landmarks and return the Euler angles.
+    Args:
+        points (np.ndarray): (N, 3) normalized landmark coordinates (rows of landmarks_to_array).
+        w (int): width of the frame.
+        h (int): height of the frame.
+    Outputs:
+        points_2d (np.ndarray): (N, 2) int array with the landmark coordinates in pixels.
+        angles (tuple): Euler angles (theta_x, theta_y, theta_z), or None if solvePnP failed.
+    """
+
+    # Scale the normalized coordinates to the image dimensions (truncated to pixels, as int() does)
+    points_2d = (points[:, :2] * np.array([w, h], dtype=np.float32)).astype(np.int32)
+    points_3d = np.empty((len(points), 3), dtype=np.float32)
+    points_3d[:, :2] = points_2d
+    points_3d[:, 2] = points[:, 2]
+
+    camera_matrix, dist_coeffs = camera_intrinsics(w, h)
+
     # We apply the solvePnP function to estimate the rotation vector
     # success is a boolean indicating if the function was successful
     # rot_vec is the rotation vector that describes the rotation of the head: ex. (theta_x, theta_y, theta_z) are the angles of rotation around the x, y, and z axes
-    success, rot_vec, _ = cv2.solvePnP(irid_3d_np, irid_2d_np, camera_matrix, dist_coeffs)
+    success, rot_vec, _ = cv2.solvePnP(points_3d, points_2d.astype(np.float32), camera_matrix, dist_coeffs)
+    if not success:
+        return points_2d, None
 
-    if success:
-        # Then we trasform the rotation vector to a rotation matrix
-        R, _ = cv2.Rodrigues(rot_vec)
+    # Then we trasform the rotation vector to a rotation matrix
+    R, _ = cv2.Rodrigues(rot_vec)
 
-        # We extract the Euler angles from the rotation matrix
-        # The angles are in radians, we can convert them to degrees if needed
-        angles, _, _, _, _, _ = cv2.RQDecomp3x3(R)
-        theta_x, theta_y, theta_z = angles[0]*360, angles[1]*360, angles[2]*360
+    # We extract the Euler angles from the rotation matrix
+    angles, _, _, _, _, _ = cv2.RQDecomp3x3(R)
+    return points_2d, (angles[0]*360, angles[1]*360, angles[2]*360)
 
-        # Rotation around the x_axis means looking up/down, rotation around the y_axis means looking left/right
-        return irid_2d, (theta_x, theta_y, theta_z)
-    else:
+
+def face_pose_estimator(face_lm, w, h):
+
+    """Estimate both the head pose and the irid pose in the given image with a single landmark conversion.
+    Args:
+        face_lm (list[obj]): the face landmarks obtained from the mediapipe Face Mesh model.
+        w (int): width of the frame.
+        h (int): height of the frame.
+    Outputs:
+        nose_2d (tuple): coordinates of the nose tip in pixels.
+        face_2d (list[tuple]): coordinates in pixels of the landmarks used for the head pose.
+        irid_2d (list[tuple]): coordinates in pixels of the irid landmarks.
+        theta_head (tuple): Euler angles of the head pose (theta_x, theta_y, theta_z).
+        theta_eye (tuple): Euler angles of the irid pose (theta_x, theta_y, theta_z).
+        It returns None if one of the two poses cannot be estimated.
+    """
+
+    points = landmarks_to_array(face_lm)
+
+    face_2d, theta_head = solve_pose(points[HEAD_ROWS], w, h)
+    irid_2d, theta_eye = solve_pose(points[IRID_ROWS], w, h)
+
+    if theta_head is None or theta_eye is None:
         print("Head pose estimation failed.")
         return None
 
-def head_pose_estimator(face_lm, w, h):
+    # Rotation around the x_axis means looking up/down, rotation around the y_axis means looking left/right
+    face_2d = [tuple(p) for p in face_2d.tolist()]
+    irid_2d = [tuple(p) for p in irid_2d.tolist()]
+    return face_2d[0], face_2d, irid_2d, theta_head, theta_eye
 
-    """Estimate the head pose in the given image.
+
+def irid_pose_estimator(face_lm, w, h):
+
+    """Estimate the irid pose in the given image.
     Args:
         face_lm (list[obj]): the face landmarks obtained from the mediapipe Face Mesh model.
     Outputs:
-        
+        irid_2d (list[tuple]): coordinates in pixels of the irid landmarks.
+        theta_eye (tuple): Euler angles of the irid pose (theta_x, theta_y, theta_z).
     """
-    # Define a list of landmarks used to solve the PnP problem
-    # 1: Nose tip
-    # 33: Left eye outer corner
-    # 263: Right eye outer corner
-    # 61: Left mouth corner
-    # 291: Right mouth corner
-    # 199: Chin
-    landmarks_idx = [1, 33, 263, 61, 291, 199]
-
-    # Create a tuple of the nose landmark coordinates in 2D pixels scaling the normalized coordinates to the image dimensions
-    nose_2d = (int(face_lm.landmark[1].x * w), int(face_lm.landmark[1].y * h))
-
-    # Create a list of 2D and 3D points for the other landmarks scaling the normalized coordinates to the image dimensions
-    face_2d = [(int(face_lm.landmark[idx].x*w), int(face_lm.landmark[idx].y*h)) for idx in landmarks_idx]
-    face_3d = [(int(face_lm.landmark[idx].x*w), int(face_lm.landmark[idx].y*h), face_lm.landmark[idx].z) for idx in landmarks_idx]
-
-    # Convert the 2D and 3D points to numpy arrays
-    face_2d_np = np.array(face_2d, dtype=np.float32)
-    face_3d_np = np.array(face_3d, dtype=np.float32)
-
-    # Define the camera matrix (assuming a simple pinhole camera model), focal length and distortion coefficients
-    cx, cy = w / 2, h / 2  # Principal point (center of the image)
-    f = 1.0*w  # Focal length (assume the focal length is equal to the width of the image as usual)
-    camera_matrix = np.array([[f, 0, cx],
-                              [0, f, cy],
-                              [0, 0, 1]])
-    dist_coeffs = np.zeros((4, 1))  # Assuming no lens distortion
 
-    # We apply the solvePnP function to estimate the rotation vector
-    # success is a boolean indicating if the function was successful
-    # rot_vec is the rotation vector that describes the rotation of the head: ex. (theta_x, theta_y, theta_z) are the angles of rotation around the x, y, and z axes
-    success, rot_vec, _ = cv2.solvePnP(face_3d_np, face_2d_np, camera_matrix, dist_coeffs)
+    irid_2d, theta_eye = solve_pose(landmarks_to_array(face_lm, IRID_LANDMARKS_IDX), w, h)
+    if theta_eye is None:
+        print("Head pose estimation failed.")
+        return None
+    return [tuple(p) for p in irid_2d.tolist()], theta_eye
 
-    if success:
-        # Then we trasform the rotation vector to a rotation matrix
-        R, _ = cv2.Rodrigues(rot_vec)
+def head_pose_estimator(face_lm, w, h):
 
-        # We extract the Euler angles from the rotation matrix
-        # The angles are in radians, we can convert them to degrees if needed
-        angles, _, _, _, _, _ = cv2.RQDecomp3x3(R)
-        theta_x, theta_y, theta_z = angles[0]*360, angles[1]*360, angles[2]*360
+    """Estimate the head pose in the given image.
+    Args:
+        face_lm (list[obj]): the face landmarks obtained from the mediapipe Face Mesh model.
+    Outputs:
+        nose_2d (tuple): coordinates of the nose tip in pixels.
+        face_2d (list[tuple]): coordinates in pixels of the landmarks used for the head pose.
+        theta_head (tuple): Euler angles of the head pose (theta_x, theta_y, theta_z).
+    """
 
-        # Rotation around the x_axis means looking up/down, rotation around the y_axis means looking left/right
-        return nose_2d, face_2d, (theta_x, theta_y, theta_z)
-    else:
+    face_2d, theta_head = solve_pose(landmarks_to_array(face_lm, HEAD_LANDMARKS_IDX), w, h)
+    if theta_head is None:
         print("Head pose estimation failed.")
         return None
+    face_2d = [tuple(p) for p in face_2d.tolist()]
+    return face_2d[0], face_2d, theta_head
 
   
 
@@ -209,8 +262,8 @@ def gaze_estimator(theta_eye, theta_head):
         gaze_direction (str): The estimated gaze direction.
     """
 
-    threshold_head_x = 14  # Threshold for horizontal gaze direction of head
-    threshold_head_y = 12  # Thresold for vertical gaze direction of head
+    threshold_head_x = settings.sensing.head_threshold_x  # Threshold for horizontal gaze direction of head
+    threshold_head_y = settings.sensing.head_threshold_y  # Thresold for vertical gaze direction of head
     #threshold_eye_x = 5  # Threshold for horizontal gaze direction of head
     #threshold_eye_y = 3  # Threshold for vertical gaze direction of head
     
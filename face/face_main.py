@@ -1,153 +1,110 @@
 import cv2
-import mediapipe as mp
 import os
 if os.name == 'nt':  # 'nt' stands for Windows
-    from face.face import analyze_emotion, head_pose_estimator, irid_pose_estimator, gaze_estimator, score, get_screen_resolution
+    from face.face import analyze_emotion, face_pose_estimator, gaze_estimator, score, get_screen_resolution
+    from face.pipeline import EngagementPipeline
 
 if os.name == 'posix':
-    from face import analyze_emotion, head_pose_estimator, irid_pose_estimator, gaze_estimator, score, get_screen_resolution
+    from face import analyze_emotion, face_pose_estimator, gaze_estimator, score, get_screen_resolution
+    from pipeline import EngagementPipeline
 import time
-import os
 
-def face_thread(q, stop_event):
+def draw_overlays(frame, nose_2d, face_2d, theta_head, text):
+    """Draw the landmarks used for the head pose, the head direction and the text on the frame (in place)."""
+
+    # Draw the nose landmark and all the landmarks used for head pose estimation
+    cv2.circle(frame, (nose_2d[0], nose_2d[1]), radius=2, color=(0, 0, 255), thickness=-1)
+    for (x, y) in face_2d:
+        cv2.circle(frame, (x, y), radius=2, color=(0, 0, 255), thickness=-1)
+
+    # Draw the head direction from the nose
+    p1 = (int(nose_2d[0]), int(nose_2d[1]))
+    p2 = (int(nose_2d[0] + theta_head[1] * 2) , int(nose_2d[1] - theta_head[0] * 2))
+    cv2.line(frame, p1, p2, (255, 0, 0), 3)
+
+    # Add the text on the image
+    cv2.putText(frame, text, (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 2553, 0), 2)
+
+
+def face_thread(q, stop_event, gaze_hz=10, emotion_hz=1, max_width=640, headless=False, stats=None, preview=None, camera=None):
+    """Engagement estimation loop: it reads the camera, estimates gaze and emotion and puts the engagement scores in 'q'.
+    Args:
+        q (queue.Queue): queue where the engagement scores are put (the last one is the average of the session).
+        stop_event (threading.Event): event to stop the loop.
+        gaze_hz (float): target rate of the landmark + gaze analysis (frames in between are dropped).
+        emotion_hz (float): target rate of the emotion analysis (and of the scores put in the queue).
+        max_width (int): frames wider than this are downscaled before the analysis (None to keep the full resolution).
+        headless (bool): if True no window is created and no GUI call is made in the loop.
+        stats (FrameStats): optional counters filled by the loop (how many frames were dropped vs. processed).
+        preview (PreviewChannel): optional shared memory channel to a debug-preview process (face/preview.py).
+            The overlays are drawn and published only while the preview window is open.
+        camera (obj): optional frame source with the cv2.VideoCapture grab/retrieve interface (face/sources.py),
+            the default camera is used if None.
+    """
+
+    pipeline = EngagementPipeline(gaze_hz=gaze_hz, emotion_hz=emotion_hz, max_width=max_width, stats=stats)
+    stats = pipeline.stats
 
-    # Get the screen resolution
-    screen_width, screen_height = get_screen_resolution()
-    # Create a named window and move it to the top-right corner of the screen
     window_name = "Engagement Estimation"
-    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
-    cv2.moveWindow(window_name, screen_width-50, 0) # Move the window to the top-right corner
-    cv2.resizeWindow(window_name, 640, 440) # Resize the window to 640x460
-
-    # Initialize the counter for frames. The emotion will be saved each "num_frames_emotion" frames.
-    counter_frames = 0
-    num_frames_emotion = 20
+    if not headless:
+        # Get the screen resolution
+        screen_width, screen_height = get_screen_resolution()
+        # Create a named window and move it to the top-right corner of the screen
+        cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+        cv2.moveWindow(window_name, screen_width-50, 0) # Move the window to the top-right corner
+        cv2.resizeWindow(window_name, 640, 440) # Resize the window to 640x460
 
-    if not os.path.exists("./frames"):
-        os.makedirs("./frames")
-    
     # Open the default camera (usually the first camera)
-    camera = cv2.VideoCapture(0)
+    if camera is None:
+        camera = cv2.VideoCapture(0)
 
     # Check if the camera opened successfully
     if not camera.isOpened():
-        raise("Error: Could not open camera. Check if the camera is connected, or change the idx of the camera in 'camera = cv2.VideoCapture(0)' line.")
-        quit()
-
-    # Initialization of gaze score 'g' and engagement score 's', and emotion string
-    g = 0
-    s = 0
-    s_list = []
-    detected_emotion = ''
+        raise RuntimeError("Error: Could not open camera. Check if the camera is connected, or change the idx of the camera in 'camera = cv2.VideoCapture(0)' line.")
 
     while not stop_event.is_set():
 
-        #time.sleep(1)  # Sleep for a short time to avoid high CPU usage
-
-        # Read a frame from the camera (ret is a boolean indicating success)
-        ret, frame = camera.read()
-        counter_frames += 1     # increment the frame counter
-        
-        if ret is True:
-        
-            # Save the frame as an image file for DeepFace emotion analysis
-            image_path = "image.jpg"
-            # Get the image width and height needed for obtaining left eye and right eye landmarks
-            h, w, _ = frame.shape
-            # Save the frame as an image file
-            cv2.imwrite(image_path, frame)
-
-            # Analyze the emotion in the captured frame each "num_frames_emotion_analysis" frames
-            if counter_frames % num_frames_emotion == 0:
-                emotion = analyze_emotion(image_path)
-                s, detected_emotion = score(g/num_frames_emotion, emotion)
-                s_list.append(s)
-                q.put(s)
-                g = 0
-
-            # Extract landmarks from the captured frame and extract gaze direction
-
-            # Initialize the Face Mesh model
-            mp_face_mesh = mp.solutions.face_mesh
-
-            # Create a Face Mesh instance with 
-            with mp_face_mesh.FaceMesh(max_num_faces=1,     # The maximum number of faces to detect in the image
-                                    refine_landmarks=True,   # Enable landmark refinement for eyes and lips (more accurate position of eyes landmarks, needed for gaze estimation)
-                                    min_detection_confidence=0.5, # Threshold for face detection confidence: minimum confidence value to detect a face in the image
-                                    min_tracking_confidence=0.7  # Threshold for face tracking confidence: minimum confidence value to assume that the face is being tracked correctly between frames
-                                    ) as face_mesh:
-                
-                # Process the image to get face landmarks
-                results = face_mesh.process(frame)
-                if results.multi_face_landmarks:
-                    # Get the first detected face landmarks
-                    face_lm = results.multi_face_landmarks[0]
-                    # Pass the frame to the eye_landmark_extraction function that returns the left and right eye landmarks, and the pupil coordinates
-                    #left_eye_coords, right_eye_coords, left_pupil, right_pupil, outer_boundary_left, outer_boundary_right, lower_boundary_left, lower_boundary_right = eye_landmark_extraction(face_lm, w, h)
-                    
-                    # Compute the head pose
-                    nose_2d, face_2d, theta_head = head_pose_estimator(face_lm, w, h)
-                    
-                    irid_2d, theta_eye = irid_pose_estimator(face_lm, w, h)
-                    #left_eye_coords += irid_2d[0:5]
-                    #right_eye_coords += irid_2d[5:]
-
-                    # Gaze estimation
-                    gaze = gaze_estimator(theta_eye, theta_head)
-                    #print(f"State: {gaze}")
-                
-                    # Display results
-                    if irid_2d:
-                        # Draw circles on the eye landmarks
-                        #for (x, y) in irid_2d:
-                        #    cv2.circle(frame, (x, y), radius=2, color=(255, 0, 0), thickness=-1)
-                        #for (x, y) in right_eye_coords[-5:]:
-                        #    cv2.circle(frame, (x, y), radius=2, color=(255, 0, 0), thickness=-1)
-                        # Draw a red circle at the pupil
-                        left_pupil = irid_2d[0]
-                        #cv2.circle(frame, irid_2d[0], radius=8, color=(0, 255, 0), thickness=2)
-                        #cv2.circle(frame, irid_2d[5], radius=8, color=(0, 255, 0), thickness=2)
-
-                        # Draw the nose landmark and all the landmarks used for head pose estimation
-                        cv2.circle(frame, (nose_2d[0], nose_2d[1]), radius=2, color=(0, 0, 255), thickness=-1)  # Draw line from center of left eye to pupil
-                        for (x, y) in face_2d:
-                            cv2.circle(frame, (x, y), radius=2, color=(0, 0, 255), thickness=-1)
-                        
-                        '''
-                        # Draw lines from the center of the left and right eyes to the pupils
-                        cv2.line(frame, outer_boundary_left, left_pupil, (0, 0, 0), 2)  # Draw line from center of left eye to pupil
-                        cv2.line(frame, outer_boundary_right, right_pupil, (0, 0, 0), 2)  # Draw line from center of right eye to pupil
-                        
-                        cv2.line(frame, lower_boundary_left, left_pupil, (0, 0, 0), 2)  # Draw line from center of left eye to pupil
-                        cv2.line(frame, lower_boundary_right, right_pupil, (0, 0, 0), 2)  # Draw line from center of right eye to pupil
-                        '''
-                        p1 = (int(nose_2d[0]), int(nose_2d[1]))
-                        p2 = (int(nose_2d[0] + theta_head[1] * 2) , int(nose_2d[1] - theta_head[0] * 2))
-                        #p3 = (int(left_pupil[0] + theta_eye[1] * 5) , int(left_pupil[1] - theta_eye[0] * 5))
-                
-                        cv2.line(frame, p1, p2, (255, 0, 0), 3)
-                        #cv2.line(frame, left_pupil, p3, (255, 0, 0), 3)
-                        
-                        if gaze == 'centered':
-                            g += 1
-                        
-                        # Add the text on the image
-                        cv2.putText(frame,str(s) + ' '+ gaze+' '+ detected_emotion, (20, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 2553, 0), 2)
-
-                        # Show the output image
-                        cv2.imshow(window_name, frame)
-                        
-                else:
-                    pass
-                    #print("No landmarks detected.")
-
-            # To stop the loop, press 'q'
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+        # Grab a frame from the camera without decoding it (ret is a boolean indicating success)
+        ret = camera.grab()
+        if not ret:
+            stats.read_failures += 1
+            continue
+        stats.captured += 1
+
+        # The governors decide which frames are analyzed: the other ones are grabbed but never decoded
+        do_gaze, do_emotion = pipeline.schedule(time.monotonic())
+        if not (do_gaze or do_emotion):
+            continue
+
+        # Decode only the frames that are going to be analyzed
+        ret, frame = camera.retrieve()
+        if not ret:
+            stats.read_failures += 1
+            continue
+
+        result = pipeline.analyze(frame, do_gaze, do_emotion)
+        if result["score"] is not None:
+            q.put(result["score"])
+
+        # Display results only if someone is watching (local window or preview process)
+        watched = preview is not None and preview.watching
+        if result["gaze"] is not None and (not headless or watched):
+            frame = result["frame"]
+            draw_overlays(frame, result["nose_2d"], result["face_2d"], result["theta_head"], pipeline.overlay_text(result["gaze"]))
+            if watched:
+                preview.publish(frame)
+            if not headless:
+                # Show the output image
+                cv2.imshow(window_name, frame)
+
+        # To stop the loop, press 'q'
+        if not headless and cv2.waitKey(1) & 0xFF == ord('q'):
+            break
 
     camera.release()
-    s = sum(s_list) / len(s_list) if s_list else 0
-    q.put(s)
+    pipeline.close()
+    print(f"Engagement estimation: {stats}")
+    q.put(pipeline.session_score())
     
 
 if __name__ == "__main__":
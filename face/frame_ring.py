@@ -0,0 +1,102 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class FrameRing:
+    """Fixed-size ring of frames in shared memory between one capture process (writer) and the analysis processes
+    (readers). Frames are never pickled: the writer copies each frame once into a free slot and the readers get
+    NumPy views of the slots.
+
+    A reader pins the slot it is working on ('latest' ... 'release'), and the writer never overwrites a pinned slot,
+    so the views stay valid while they are analyzed. With 'slots' >= number of readers + 2 the writer always finds
+    a free slot. The lock only protects the slot metadata (a few integers), never the frame copies.
+    """
+
+    def __init__(self, lock, slots=4, height=480, width=640, name=None):
+        """Create the ring (name=None) or attach to an existing one (name of the shared memory)."""
+        self.lock = lock
+        self.slots = slots
+        self.shape = (height, width, 3)
+        frame_size = height * width * 3
+        # header: [write counter] + per slot [seq, pins, height, width] as int64, then the timestamps as float64
+        header_size = 8 * (1 + 4 * slots) + 8 * slots
+        self.created = name is None
+        if self.created:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_size + slots * frame_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+
+        buf = self.shm.buf
+        self.counter = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self.meta = np.ndarray((slots, 4), dtype=np.int64, buffer=buf, offset=8)
+        self.timestamps = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=8 * (1 + 4 * slots))
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=header_size)
+        if self.created:
+            self.counter[0] = 0
+            self.meta[:] = 0
+            self.meta[:, 0] = -1  # no frame in the slot
+            self.timestamps[:] = 0
+
+    def attach_args(self):
+        # arguments to re-open the ring in another process: FrameRing(*ring.attach_args())
+        return self.lock, self.slots, self.shape[0], self.shape[1], self.name
+
+    def write(self, frame, timestamp):
+        """Copy a frame (at most height x width) into a free slot and publish it as the latest one.
+        Outputs:
+            seq (int): sequence number of the frame, or -1 if every slot is pinned (the frame is dropped).
+        """
+
+        h, w = frame.shape[:2]
+        if h > self.shape[0] or w > self.shape[1]:
+            raise ValueError(f"Frame {frame.shape} larger than the ring slots {self.shape}")
+
+        with self.lock:
+            seq = int(self.counter[0]) + 1
+            # the oldest unpinned slot (lowest seq) is overwritten
+            free = [i for i in range(self.slots) if self.meta[i, 1] == 0]
+            if not free:
+                return -1
+            slot = min(free, key=lambda i: self.meta[i, 0])
+            self.meta[slot, 0] = -1  # being written
+
+        self.frames[slot, :h, :w] = frame
+
+        with self.lock:
+            self.meta[slot, 0] = seq
+            self.meta[slot, 2] = h
+            self.meta[slot, 3] = w
+            self.timestamps[slot] = timestamp
+            self.counter[0] = seq
+        return seq
+
+    def latest(self, after=0):
+        """Pin and return the most recent frame if it is newer than 'after'.
+        Outputs:
+            (slot, seq, timestamp, frame) with 'frame' a NumPy view of the shared memory (valid until release(slot)),
+            or None if there is no newer frame.
+        """
+
+        with self.lock:
+            seq = int(self.counter[0])
+            if seq <= after:
+                return None
+            slot = int(np.argmax(self.meta[:, 0]))
+            if self.meta[slot, 0] != seq:
+                return None
+            self.meta[slot, 1] += 1
+            h, w = int(self.meta[slot, 2]), int(self.meta[slot, 3])
+            timestamp = float(self.timestamps[slot])
+        return slot, seq, timestamp, self.frames[slot, :h, :w]
+
+    def release(self, slot):
+        # unpin a slot returned by latest()
+        with self.lock:
+            self.meta[slot, 1] -= 1
+
+    def close(self):
+        del self.counter, self.meta, self.timestamps, self.frames
+        self.shm.close()
+        if self.created:
+            self.shm.unlink()
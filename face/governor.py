@@ -0,0 +1,84 @@
+import time
+import cv2
+
+
+class RateGovernor:
+    """Decide when a periodic analysis must run, so that it runs at most 'rate_hz' times per second
+    whatever the frame rate of the camera is. The time is passed explicitly (camera or video timestamps can be used).
+    """
+
+    def __init__(self, rate_hz):
+        # rate_hz <= 0 (or None) means "no limit": the analysis runs on every frame
+        self.period = 1.0 / rate_hz if rate_hz and rate_hz > 0 else 0.0
+        self.next_time = None
+
+    def ready(self, now=None):
+        """Return True if the analysis is due at time 'now' (seconds), and schedule the next one.
+        Args:
+            now (float): current time in seconds (default: time.monotonic()).
+        Outputs:
+            ready (bool): True if the analysis must run on this frame.
+        """
+
+        if now is None:
+            now = time.monotonic()
+        if self.next_time is None or now >= self.next_time:
+            # Schedule from the ideal deadline to keep the average rate, but never accumulate a backlog
+            if self.next_time is None or now - self.next_time > self.period:
+                self.next_time = now + self.period
+            else:
+                self.next_time += self.period
+            return True
+        return False
+
+
+class FrameStats:
+    """Counters of the sensing loop: how many frames were captured, analyzed or dropped."""
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.captured = 0        # frames read from the camera
+        self.read_failures = 0   # camera reads that did not return a frame
+        self.dropped = 0         # frames skipped by the rate governors (not decoded / not analyzed)
+        self.gaze_processed = 0  # frames passed to the landmark + gaze estimation
+        self.no_face = 0         # analyzed frames without any face detected
+        self.emotion_processed = 0  # frames passed to the emotion analysis
+
+    def report(self):
+        """Return the counters and the effective rates as a dictionary."""
+        elapsed = max(time.monotonic() - self.start_time, 1e-9)
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "captured": self.captured,
+            "read_failures": self.read_failures,
+            "dropped": self.dropped,
+            "gaze_processed": self.gaze_processed,
+            "no_face": self.no_face,
+            "emotion_processed": self.emotion_processed,
+            "capture_fps": round(self.captured / elapsed, 2),
+            "gaze_hz": round(self.gaze_processed / elapsed, 2),
+            "emotion_hz": round(self.emotion_processed / elapsed, 2),
+        }
+
+    def __str__(self):
+        r = self.report()
+        return (f"{r['captured']} frames captured in {r['elapsed_s']}s ({r['capture_fps']} fps): "
+                f"{r['gaze_processed']} processed for gaze ({r['gaze_hz']} Hz, {r['no_face']} without face), "
+                f"{r['emotion_processed']} for emotion ({r['emotion_hz']} Hz), {r['dropped']} dropped, "
+                f"{r['read_failures']} read failures")
+
+
+def downscale_frame(frame, max_width):
+    """Downscale the frame (keeping the aspect ratio) so that its width is at most 'max_width' pixels.
+    Args:
+        frame (np.ndarray): BGR frame.
+        max_width (int): maximum width in pixels (None or 0 means no downscaling).
+    Outputs:
+        frame (np.ndarray): the downscaled frame (the same object if no downscaling is needed).
+    """
+
+    h, w = frame.shape[:2]
+    if not max_width or w <= max_width:
+        return frame
+    scale = max_width / w
+    return cv2.resize(frame, (max_width, int(round(h * scale))), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,124 @@
+import os
+import time
+import mediapipe as mp
+
+if os.name == 'nt':  # 'nt' stands for Windows
+    from face.face import analyze_emotion, face_pose_estimator, gaze_estimator, score
+    from face.governor import RateGovernor, FrameStats, downscale_frame
+
+if os.name == 'posix':
+    from face import analyze_emotion, face_pose_estimator, gaze_estimator, score
+    from governor import RateGovernor, FrameStats, downscale_frame
+
+
+class EngagementPipeline:
+    """Per-frame engagement estimation shared by the live sensing loop (face_main.face_thread) and the offline replay
+    (face/replay.py): rate governors, landmarks, head/irid pose, gaze, emotion and engagement score.
+
+    The caller first asks which analyses are due with 'schedule(t)' (so that the frames that are going to be dropped
+    are never decoded), then passes the decoded frame to 'analyze'.
+    """
+
+    def __init__(self, gaze_hz=10, emotion_hz=1, max_width=640, use_emotion=True, stats=None):
+        self.gaze_governor = RateGovernor(gaze_hz)
+        self.emotion_governor = RateGovernor(emotion_hz)
+        self.max_width = max_width
+        self.use_emotion = use_emotion
+        self.stats = stats if stats is not None else FrameStats()
+
+        # Initialization of gaze score 'g' (centered frames), number of gaze samples 'n_gaze', engagement score 's', and emotion string
+        self.g = 0
+        self.n_gaze = 0
+        self.s = 0
+        self.s_list = []
+        self.detected_emotion = ''
+
+        # Initialize the Face Mesh model once: it keeps tracking the face between consecutive frames
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(
+            max_num_faces=1,     # The maximum number of faces to detect in the image
+            refine_landmarks=True,   # Enable landmark refinement for eyes and lips (more accurate position of eyes landmarks, needed for gaze estimation)
+            min_detection_confidence=0.5, # Threshold for face detection confidence: minimum confidence value to detect a face in the image
+            min_tracking_confidence=0.7  # Threshold for face tracking confidence: minimum confidence value to assume that the face is being tracked correctly between frames
+        )
+
+    def schedule(self, t=None):
+        """Return which analyses are due at time 't' (seconds, camera clock or video timestamp).
+        Outputs:
+            do_gaze (bool), do_emotion (bool): if both are False the frame is dropped (and counted as such).
+        """
+
+        if t is None:
+            t = time.monotonic()
+        do_gaze = self.gaze_governor.ready(t)
+        do_emotion = self.emotion_governor.ready(t)
+        if not (do_gaze or do_emotion):
+            self.stats.dropped += 1
+        return do_gaze, do_emotion
+
+    def analyze(self, frame, do_gaze=True, do_emotion=False):
+        """Analyze one decoded frame.
+        Args:
+            frame (np.ndarray): BGR frame (it is downscaled to 'max_width' if needed).
+            do_gaze (bool), do_emotion (bool): the analyses to run (see 'schedule').
+        Outputs:
+            result (dict): 'frame' (the analyzed, possibly downscaled frame), 'gaze' ('centered', 'not centered' or None
+                if no face/pose), 'emotion' (str or None), 'score' (new engagement score or None), 'theta_head',
+                'theta_eye', 'nose_2d', 'face_2d' (None if not computed).
+        """
+
+        # Downscale the frame before the landmarks extraction
+        frame = downscale_frame(frame, self.max_width)
+        # Get the image width and height needed for obtaining left eye and right eye landmarks
+        h, w, _ = frame.shape
+        result = {"frame": frame, "gaze": None, "emotion": None, "score": None,
+                  "theta_head": None, "theta_eye": None, "nose_2d": None, "face_2d": None}
+
+        # Analyze the emotion at the emotion rate (the frame is passed directly, without saving it)
+        if do_emotion:
+            emotion = None
+            if self.use_emotion:
+                self.stats.emotion_processed += 1
+                emotion = analyze_emotion(frame)
+            self.s, self.detected_emotion = score(self.g/self.n_gaze if self.n_gaze else 0, emotion)
+            self.s_list.append(self.s)
+            self.g = 0
+            self.n_gaze = 0
+            result["emotion"] = emotion
+            result["score"] = self.s
+
+        if not do_gaze:
+            return result
+
+        # Extract landmarks from the captured frame and extract gaze direction
+        self.stats.gaze_processed += 1
+        results = self.face_mesh.process(frame)
+        if not results.multi_face_landmarks:
+            self.stats.no_face += 1
+            return result
+
+        # Compute the head pose and the irid pose of the first detected face with a single landmark conversion
+        pose = face_pose_estimator(results.multi_face_landmarks[0], w, h)
+        if pose is None:
+            return result
+        nose_2d, face_2d, irid_2d, theta_head, theta_eye = pose
+
+        # Gaze estimation
+        gaze = gaze_estimator(theta_eye, theta_head)
+        self.n_gaze += 1
+        if gaze == 'centered':
+            self.g += 1
+
+        result.update({"gaze": gaze, "theta_head": theta_head, "theta_eye": theta_eye,
+                       "nose_2d": nose_2d, "face_2d": face_2d})
+        return result
+
+    def overlay_text(self, gaze):
+        # text drawn on the preview frames
+        return str(self.s) + ' ' + gaze + ' ' + self.detected_emotion
+
+    def session_score(self):
+        # average engagement score of the session
+        return sum(self.s_list) / len(self.s_list) if self.s_list else 0
+
+    def close(self):
+        self.face_mesh.close()
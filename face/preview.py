@@ -0,0 +1,101 @@
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+import cv2
+
+
+class PreviewChannel:
+    """Shared memory channel between the sensing loop and the debug-preview process.
+    The sensing loop writes the annotated frame in a single shared buffer (no pickling, no pipe), the preview
+    process shows it. The 'watching' flag is set by the preview process while its window is open, so the sensing
+    loop draws the overlays and copies the frames only when someone is looking at them.
+    """
+
+    def __init__(self, height=480, width=640, ctx=None):
+        ctx = ctx or mp.get_context("spawn")
+        self.shape = (height, width, 3)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)))
+        self.frame = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.frame[:] = 0
+        self.seq = ctx.Value('L', 0)         # incremented at each published frame
+        self.watching_flag = ctx.Value('b', 0)  # set by the preview process while the window is open
+        self.stop_event = ctx.Event()
+
+    @property
+    def watching(self):
+        return bool(self.watching_flag.value)
+
+    def publish(self, frame):
+        """Copy the frame in the shared buffer (resized to the preview size if needed)."""
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]), interpolation=cv2.INTER_AREA)
+        with self.seq.get_lock():
+            self.frame[:] = frame
+            self.seq.value += 1
+
+    def close(self):
+        # stop the preview process and release the shared memory
+        self.stop_event.set()
+        del self.frame
+        self.shm.close()
+        self.shm.unlink()
+
+
+def preview_process(shm_name, shape, seq, watching_flag, stop_event, window_name="Engagement Estimation"):
+    """Debug-preview process: it shows the frames published in the shared memory until the window is closed ('q')
+    or the stop event is set. It is the only process that makes GUI calls.
+    """
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
+    cv2.resizeWindow(window_name, shape[1], shape[0])
+    watching_flag.value = 1
+    last_seq = -1
+    try:
+        while not stop_event.is_set():
+            with seq.get_lock():
+                current = seq.value
+                if current != last_seq:
+                    image = frame.copy()
+            if current != last_seq:
+                cv2.imshow(window_name, image)
+                last_seq = current
+            # To stop the preview, press 'q' (the sensing keeps running)
+            if cv2.waitKey(30) & 0xFF == ord('q'):
+                break
+    finally:
+        watching_flag.value = 0
+        cv2.destroyAllWindows()
+        del frame
+        shm.close()
+
+
+def start_preview(height=480, width=640):
+    """Create the shared memory channel and start the debug-preview process.
+    Outputs:
+        channel (PreviewChannel): channel to pass to the sensing loop.
+        process (multiprocessing.Process): the preview process.
+    """
+
+    ctx = mp.get_context("spawn")
+    channel = PreviewChannel(height, width, ctx=ctx)
+    process = ctx.Process(target=preview_process,
+                          args=(channel.shm.name, channel.shape, channel.seq, channel.watching_flag, channel.stop_event),
+                          daemon=True)
+    process.start()
+    return channel, process
+
+
+if __name__ == "__main__":
+    # Quick check of the channel: publish a moving square for a few seconds
+    channel, process = start_preview()
+    for i in range(100):
+        image = np.zeros(channel.shape, dtype=np.uint8)
+        cv2.rectangle(image, (i * 5, 200), (i * 5 + 40, 240), (0, 255, 0), -1)
+        if channel.watching:
+            channel.publish(image)
+        time.sleep(0.05)
+    channel.close()
+    process.join()
@@ -0,0 +1,149 @@
+import sys
+sys.path.insert(0, './face')
+
+import os
+import csv
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+if os.name == 'nt':  # 'nt' stands for Windows
+    from face.pipeline import EngagementPipeline
+    from face.sources import open_source
+
+if os.name == 'posix':
+    from pipeline import EngagementPipeline
+    from sources import open_source
+
+
+FRAME_COLUMNS = ["clip", "frame", "t", "analysis", "gaze", "theta_head_x", "theta_head_y", "emotion", "score"]
+
+
+def replay_clip(path, out_dir, gaze_hz=10, emotion_hz=1, max_width=640, use_emotion=True, fps=1.0):
+    """Feed a video file (or a directory of frames) to the engagement pipeline as fast as possible and write the
+    per-frame table '<out_dir>/<clip>.csv'.
+    Args:
+        path (str): video file or directory of frames.
+        out_dir (str): directory of the per-frame tables.
+        gaze_hz, emotion_hz, max_width: see EngagementPipeline (the rates refer to the video time).
+        use_emotion (bool): if False DeepFace is not called (neutral emotion), to benchmark only the gaze.
+        fps (float): recording rate of the frame directories (videos use their own fps).
+    Outputs:
+        summary (dict): per-clip counters and throughput numbers.
+    """
+
+    source = open_source(path, fps=fps)
+    if not source.isOpened():
+        raise RuntimeError(f"Could not open {path}")
+    pipeline = EngagementPipeline(gaze_hz=gaze_hz, emotion_hz=emotion_hz, max_width=max_width, use_emotion=use_emotion)
+    stats = pipeline.stats
+
+    clip = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+    table_path = os.path.join(out_dir, clip + ".csv")
+    centered = 0
+    gaze_frames = 0
+    start = time.perf_counter()
+
+    with open(table_path, "w", newline="", encoding="utf-8") as table_file:
+        writer = csv.writer(table_file)
+        writer.writerow(FRAME_COLUMNS)
+        while source.grab():
+            stats.captured += 1
+            t = source.timestamp()
+            do_gaze, do_emotion = pipeline.schedule(t)
+            if not (do_gaze or do_emotion):
+                writer.writerow([clip, source.index, round(t, 3), "dropped", "", "", "", "", ""])
+                continue
+            ret, frame = source.retrieve()
+            if not ret:
+                stats.read_failures += 1
+                continue
+
+            result = pipeline.analyze(frame, do_gaze, do_emotion)
+            if result["gaze"] is not None:
+                gaze_frames += 1
+                centered += result["gaze"] == 'centered'
+            theta = result["theta_head"] or ("", "")
+            analysis = "+".join(name for name, done in (("gaze", do_gaze), ("emotion", do_emotion)) if done)
+            writer.writerow([clip, source.index, round(t, 3), analysis, result["gaze"] or "",
+                             round(theta[0], 2) if theta[0] != "" else "", round(theta[1], 2) if theta[1] != "" else "",
+                             result["emotion"] or "", "" if result["score"] is None else round(result["score"], 3)])
+
+    wall = time.perf_counter() - start
+    source.release()
+    pipeline.close()
+
+    video_s = (source.index + 1) / source.fps if source.fps else 0
+    return {
+        "clip": clip,
+        "frames": stats.captured,
+        "gaze_processed": stats.gaze_processed,
+        "emotion_processed": stats.emotion_processed,
+        "dropped": stats.dropped,
+        "no_face": stats.no_face,
+        "centered_ratio": round(centered / gaze_frames, 3) if gaze_frames else 0,
+        "session_score": round(pipeline.session_score(), 3),
+        "video_s": round(video_s, 2),
+        "wall_s": round(wall, 2),
+        "fps": round(stats.captured / wall, 1) if wall else 0,
+        "realtime_factor": round(video_s / wall, 1) if wall else 0,
+    }
+
+
+def replay_clips(paths, out_dir, workers=None, **options):
+    """Replay many clips across a process pool (one pipeline per clip).
+    Args:
+        paths (list[str]): video files or directories of frames.
+        out_dir (str): output directory (per-frame tables and 'summary.csv').
+        workers (int): number of processes (default: number of CPUs).
+        options: see replay_clip.
+    Outputs:
+        summaries (list[dict]): per-clip summaries, in the order of 'paths'.
+        wall (float): total wall time in seconds.
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    summaries = {}
+    # spawn: mediapipe/TensorFlow are not fork-safe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as executor:
+        futures = {executor.submit(replay_clip, path, out_dir, **options): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summaries[path] = future.result()
+                print(f"  {path}: {summaries[path]['frames']} frames, {summaries[path]['fps']} fps, x{summaries[path]['realtime_factor']} real time")
+            except Exception as e:
+                print(f"  {path}: replay failed: {e}")
+    wall = time.perf_counter() - start
+
+    summaries = [summaries[path] for path in paths if path in summaries]
+    if summaries:
+        with open(os.path.join(out_dir, "summary.csv"), "w", newline="", encoding="utf-8") as summary_file:
+            writer = csv.DictWriter(summary_file, fieldnames=list(summaries[0].keys()))
+            writer.writeheader()
+            writer.writerows(summaries)
+    return summaries, wall
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline replay of the engagement estimation over recorded clips.")
+    parser.add_argument('inputs', nargs='+', help='Video files or directories of frames (e.g. evaluation/rbc_evaluation/frames).')
+    parser.add_argument('-out', type=str, default='evaluation/replay_results', help='Output directory.')
+    parser.add_argument('-workers', type=int, default=None, help='Number of processes (default: number of CPUs).')
+    parser.add_argument('-gaze_hz', type=float, default=10, help='Gaze analysis rate in video time (0: every frame).')
+    parser.add_argument('-emotion_hz', type=float, default=1, help='Emotion analysis rate in video time (0: every frame).')
+    parser.add_argument('-max_width', type=int, default=640, help='Frames wider than this are downscaled.')
+    parser.add_argument('-fps', type=float, default=1.0, help='Recording rate of the frame directories.')
+    parser.add_argument('-no_emotion', action='store_true', help='Skip DeepFace (neutral emotion) to benchmark only the gaze.')
+    args = parser.parse_args()
+
+    print(f"Replaying {len(args.inputs)} clips ...")
+    summaries, wall = replay_clips(args.inputs, args.out, workers=args.workers, gaze_hz=args.gaze_hz,
+                                   emotion_hz=args.emotion_hz, max_width=args.max_width,
+                                   use_emotion=not args.no_emotion, fps=args.fps)
+    frames = sum(s["frames"] for s in summaries)
+    video_s = sum(s["video_s"] for s in summaries)
+    print(f"\n{len(summaries)} clips, {frames} frames in {wall:.1f}s: {frames / wall:.1f} frames/s, "
+          f"x{video_s / wall:.1f} real time. Tables saved in '{args.out}'")
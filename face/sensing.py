@@ -0,0 +1,135 @@
+import os
+import time
+import multiprocessing as mp
+
+if os.name == 'nt':  # 'nt' stands for Windows
+    from face.frame_ring import FrameRing
+    from face.governor import FrameStats, downscale_frame
+
+if os.name == 'posix':
+    from frame_ring import FrameRing
+    from governor import FrameStats, downscale_frame
+
+
+def capture_process(ring_args, stop_event, camera_index=0, max_width=640):
+    """Camera process: it reads the camera as fast as it delivers frames and writes them (downscaled) in the ring.
+    Args:
+        ring_args (tuple): FrameRing.attach_args() of the ring created by the parent.
+        stop_event (multiprocessing.Event): event to stop the process.
+        camera_index (int): index of the camera for cv2.VideoCapture.
+        max_width (int): frames wider than this are downscaled before being written.
+    """
+
+    import cv2
+    ring = FrameRing(*ring_args)
+    camera = cv2.VideoCapture(camera_index)
+    if not camera.isOpened():
+        print("Error: Could not open camera. Check if the camera is connected, or change the camera index.")
+        stop_event.set()
+    stats = FrameStats()
+    try:
+        while not stop_event.is_set():
+            ret, frame = camera.read()
+            if not ret:
+                stats.read_failures += 1
+                continue
+            stats.captured += 1
+            if ring.write(downscale_frame(frame, max_width), time.monotonic()) < 0:
+                stats.dropped += 1  # every slot is pinned by the readers
+    finally:
+        camera.release()
+        ring.close()
+        print(f"Capture process: {stats}")
+
+
+def analysis_process(ring_args, scores, stop_event, gaze_hz=10, emotion_hz=1):
+    """Analysis process: it runs the engagement pipeline on the latest frame of the ring (zero-copy view) and sends
+    the engagement scores on the 'scores' queue (the last one is the average of the session).
+    """
+
+    if os.name == 'nt':
+        from face.pipeline import EngagementPipeline
+    else:
+        from pipeline import EngagementPipeline
+
+    ring = FrameRing(*ring_args)
+    # the frames are already downscaled by the capture process
+    pipeline = EngagementPipeline(gaze_hz=gaze_hz, emotion_hz=emotion_hz, max_width=None)
+    stats = pipeline.stats
+    last_seq = 0
+    try:
+        while not stop_event.is_set():
+            latest = ring.latest(after=last_seq)
+            if latest is None:
+                time.sleep(0.002)  # no new frame yet
+                continue
+            slot, seq, timestamp, frame = latest
+            try:
+                # frames overwritten between two reads were never seen by this worker
+                stats.captured += seq - last_seq
+                stats.dropped += max(seq - last_seq - 1, 0)
+                last_seq = seq
+                do_gaze, do_emotion = pipeline.schedule(timestamp)
+                if do_gaze or do_emotion:
+                    result = pipeline.analyze(frame, do_gaze, do_emotion)
+                    if result["score"] is not None:
+                        scores.put(result["score"])
+            finally:
+                ring.release(slot)
+    finally:
+        pipeline.close()
+        ring.close()
+        print(f"Analysis process: {stats}")
+        scores.put(pipeline.session_score())
+
+
+class SensingService:
+    """Multi-process engagement sensing: a camera process writes the frames in a shared memory ring (face/frame_ring.py)
+    and an analysis process reads the latest one and sends back the engagement scores on a multiprocessing queue.
+    Nothing of the vision workload runs in the caller (e.g. the Flask server), that only reads the queue.
+
+    It exposes start()/join() like the threading.Thread running face_main.face_thread, so it can replace it.
+    """
+
+    def __init__(self, scores, stop_event, gaze_hz=10, emotion_hz=1, max_width=640, camera_index=0, slots=4, ctx=None):
+        """
+        Args:
+            scores (multiprocessing.Queue): queue of the engagement scores (created with the same context).
+            stop_event (multiprocessing.Event): event to stop the processes.
+            slots (int): number of frames in the ring (at least number of readers + 2).
+        """
+
+        self.ctx = ctx or mp.get_context("spawn")
+        self.scores = scores
+        self.stop_event = stop_event
+        # slots large enough for any aspect ratio of the downscaled frames
+        width = max_width or 1920
+        self.ring = FrameRing(self.ctx.Lock(), slots=slots, height=width, width=width)
+        ring_args = self.ring.attach_args()
+        self.capture = self.ctx.Process(target=capture_process, args=(ring_args, stop_event, camera_index, max_width), daemon=True)
+        self.analysis = self.ctx.Process(target=analysis_process, args=(ring_args, scores, stop_event, gaze_hz, emotion_hz), daemon=True)
+
+    @staticmethod
+    def make_channels(ctx=None):
+        """Return the (scores queue, stop event) to pass to the service."""
+        ctx = ctx or mp.get_context("spawn")
+        return ctx.Queue(), ctx.Event()
+
+    def start(self):
+        self.analysis.start()
+        self.capture.start()
+
+    def is_alive(self):
+        return self.capture.is_alive() or self.analysis.is_alive()
+
+    def join(self, timeout=None):
+        self.capture.join(timeout)
+        self.analysis.join(timeout)
+        if self.is_alive():
+            # still running after the timeout: stopped here, the shared memory is released only when nobody uses it
+            print("Sensing processes still alive after the timeout, terminating them")
+            for proc in (self.capture, self.analysis):
+                if proc.is_alive():
+                    proc.terminate()
+                proc.join()
+        self.ring.close()
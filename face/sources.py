@@ -0,0 +1,93 @@
+import os
+import glob
+import cv2
+
+
+class VideoFileSource:
+    """Frame source reading a video file, with the same grab/retrieve interface of cv2.VideoCapture.
+    The timestamps come from the video itself, so the rate governors see the real time of the recording
+    even when the replay runs faster than real time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.index = -1
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def grab(self):
+        ret = self.capture.grab()
+        if ret:
+            self.index += 1
+        return ret
+
+    def retrieve(self):
+        return self.capture.retrieve()
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def timestamp(self):
+        # time of the current frame in seconds
+        return self.index / self.fps
+
+    def release(self):
+        self.capture.release()
+
+
+class FrameDirSource:
+    """Frame source reading the images of a directory in (natural) name order, e.g. evaluation/rbc_evaluation/frames.
+    'fps' is the rate at which the frames were recorded (used for the timestamps).
+    """
+
+    extensions = (".jpg", ".jpeg", ".png", ".bmp")
+
+    def __init__(self, path, fps=1.0):
+        self.path = path
+        self.fps = fps
+        files = [f for f in glob.glob(os.path.join(path, "*")) if f.lower().endswith(self.extensions)]
+        self.files = sorted(files, key=self._natural_key)
+        self.index = -1
+
+    @staticmethod
+    def _natural_key(path):
+        # frame_2.jpg must come before frame_10.jpg
+        name = os.path.basename(path)
+        digits = ''.join(c if c.isdigit() else ' ' for c in name).split()
+        return (int(digits[-1]) if digits else -1, name)
+
+    def isOpened(self):
+        return len(self.files) > 0
+
+    def grab(self):
+        if self.index + 1 >= len(self.files):
+            return False
+        self.index += 1
+        return True
+
+    def retrieve(self):
+        frame = cv2.imread(self.files[self.index])
+        return frame is not None, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def timestamp(self):
+        return self.index / self.fps
+
+    def release(self):
+        pass
+
+
+def open_source(path, fps=1.0):
+    """Return the frame source for a video file or a directory of frames."""
+    if os.path.isdir(path):
+        return FrameDirSource(path, fps=fps)
+    return VideoFileSource(path)
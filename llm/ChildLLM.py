@@ -5,51 +5,34 @@ import uuid
 sys.path.insert(0, './llm')
 sys.path.insert(0, './neo4j_db')
 import os
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
 from datetime import datetime
-import yaml
-import os
 import random
 from datetime import date, timedelta
 import math
 
 # Check the operating system, it is used for the import modules
 if os.name == 'nt':  # 'nt' stands for Windows
-    from llm.llm_api import call_translation_api
+    from llm.llm_api import call_translation_api, groq_api_key, load_prompts
     from llm.TherapistLLM import TherapistLLM
 
     from llm.DatabaseLLM import DatabaseLLM
     from neo4j_db.database import KnowledgeGraph
 
-    script_dir = os.path.dirname(__file__)
-    file_path = os.path.join(script_dir, "api_key.txt")
-    with open(file_path, "r") as file:
-        groq_api_key = file.read()
-    with open("../config/llm_config.yaml", "r", encoding="utf-8") as f:
-        prompts = yaml.safe_load(f)
-
 elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
-    from llm_api import call_translation_api
+    from llm_api import call_translation_api, groq_api_key, load_prompts
     from TherapistLLM import TherapistLLM
     from DatabaseLLM import DatabaseLLM
     from database import KnowledgeGraph
 
-    with open("llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
-    with open("config/llm_config.yaml", "r", encoding="utf-8") as f:
-        prompts = yaml.safe_load(f)
-
-if not groq_api_key:
-    print("API KEY NOT LOADED: please follow the instructions in the README.md file to set up the API key.")
-    sys.exit(1)
-
-system_prompt = prompts["system_prompts"]["child_llm"]
-user_prompt = prompts["user_prompt_templates"]["child_llm"]
-
 
 class ChildLLM:
     def __init__(self, model_name):
-        self.system_prompt = system_prompt
-        self.user_prompt = user_prompt
+        prompts = load_prompts()
+        self.system_prompt = prompts["system_prompts"]["child_llm"]
+        self.user_prompt = prompts["user_prompt_templates"]["child_llm"]
         self.session_history = ''
         self.data = None
         self.model_name = model_name
@@ -64,7 +47,8 @@ class ChildLLM:
                                             model_name=self.model_name,
                                             system_prompt_template=self.system_prompt,
                                             user_prompt_template=prompt,
-                                            temperature=1)
+                                            temperature=1,
+                                            stage="ChildLLM")
 
         self.session_history += '\n -Therapist: ' + llm_response
         self.last_response = llm_response
@@ -130,7 +114,7 @@ if __name__ == '__main__':
 
     for conv in range(2):  # make 100 conversations
         print(f"\n     --- CONVERSATION {conv} STARTING ---\n")
-        child_llm = ChildLLM(model_name='gemma2-9b-it')
+        child_llm = ChildLLM(model_name=settings.models.child)
         name, surname, sex, birth, personality = random.choice(childs) # use a random child
         kg = KnowledgeGraph()
         all_data = kg.get_child(name=name, surname=surname)
@@ -146,19 +130,20 @@ if __name__ == '__main__':
             exit()
         else:
             child = all_data[0]
+            preferences = kg.get_preference_summary(name=child["Name"], surname=child["Surname"], birth_date=child.get("Birth"))
             data = {
                 "child_name": child["Name"],
                 "child_surname": child["Surname"],
                 "child_birth": child["Birth"],
                 "child_gender": child["Gender"],
                 "child_nation": child.get("Nation"),  # may be missing and return None
-                "child_likes": child["LIKES"],
-                "child_dislikes": child["DISLIKES"],
+                "child_likes": preferences["LIKES"],
+                "child_dislikes": preferences["DISLIKES"],
                 "previous_activity": child.get("last_activity"),
             }
 
         print("-- CHILD DATA --\n", data)
-        therapist = TherapistLLM(model_name='llama-3.3-70b-versatile')
+        therapist = TherapistLLM(model_name=settings.models.therapist)
         therapist.load_data(data)
 
         # score_start = random.uniform(0, 3.14) # simulate score
@@ -171,7 +156,7 @@ if __name__ == '__main__':
             therapist.add_child_response(child_response)  # + " [SCORE]: " + get_score(score_start, increment*i))
 
 
-        db_llm = DatabaseLLM(api_key=groq_api_key, model_name='gemma2-9b-it')
+        db_llm = DatabaseLLM(api_key=groq_api_key, model_name=settings.models.database)
         data_db_llm = '[CHILD INFO]:\n' + "name: " + data["child_name"] + "\nsurname: " + data[
             "child_surname"] + "\nbirth: " + data["child_birth"] + "\n" + "[CONVERSATION]:" + therapist.session_history
 
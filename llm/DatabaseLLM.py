@@ -3,52 +3,45 @@ sys.path.insert(0, './neo4j_db')
 sys.path.insert(0, './llm')
 import os
 import ast
-import yaml
-import os
 
 # Check the operating system, it is used for the import modules
 if os.name == 'nt':  # 'nt' stands for Windows
-    from neo4j_db.database import KnowledgeGraph
-    from llm.llm_api import call_translation_api
-    with open("../llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
-    with open("../config/llm_config.yaml", "r", encoding="utf-8") as f:
-        prompts = yaml.safe_load(f)
+    from neo4j_db.database import make_knowledge_graph
+    from llm.llm_api import call_translation_api, groq_api_key, load_prompts
 
 elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
-    from database import KnowledgeGraph
-    from llm_api import call_translation_api
-    with open("llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
-    with open("config/llm_config.yaml", "r", encoding="utf-8") as f:
-        prompts = yaml.safe_load(f)
-
-if not groq_api_key:
-    print("API KEY NOT LOADED: please follow the instructions in the README.md file to set up the API key.")
-    sys.exit(1)
-
-system_prompt_db = prompts["system_prompts"]["database_llm"]
+    from database import make_knowledge_graph
+    from llm_api import call_translation_api, groq_api_key, load_prompts
 
 class DatabaseLLM:
-    def __init__(self, api_key, model_name):
+    def __init__(self, api_key, model_name, kg=None):
         self.api_key = api_key
-        self.system_prompt = system_prompt_db
-        self.kg = KnowledgeGraph()
+        self.system_prompt = load_prompts()["system_prompts"]["database_llm"]
+        self.kg = kg if kg is not None else make_knowledge_graph() # the server passes its own graph
         self.model_name = model_name
         self.last_response = ''
 
-    def save_info(self, conversation = '', verbose = False, score = 0):
+    def save_info(self, conversation = '', verbose = False, score = 0, raise_errors = False):
+        # with raise_errors the failures of the LLM call and of the graph writes are raised (the server jobs retry them)
 
         llm_response = call_translation_api(api_key=groq_api_key,
                                             model_name=self.model_name,
                                             system_prompt_template=self.system_prompt,
                                             user_prompt_template=conversation,
-                                            temperature=0.0)
+                                            temperature=0.0,
+                                            stage="DatabaseLLM")
+        if llm_response is None:
+            if raise_errors:
+                raise RuntimeError("DatabaseLLM request failed")
+            print("DatabaseLLM request failed, nothing saved")
+            return
 
         self.last_response = llm_response
         if verbose:
             print(llm_response)
 
+        # all the writes of the session are collected and applied in a single transaction at the end
+        uow = self.kg.unit_of_work()
         #ID = random.randint(0, 9999999)
         for line in llm_response.strip().splitlines():
             line = line.strip()
@@ -68,11 +61,11 @@ class DatabaseLLM:
                 # Post-process data if needed
                 if fn == "add_child_node":
                     print("adding child")
-                    self.kg.add_child_node(data)
+                    uow.add_child_node(data)
 
                 elif fn == "add_activity":
                     print("adding activity")
-                    self.kg.add_activity(
+                    uow.add_activity(
                         name=data['name'],
                         surname=data['surname'],
                         birthdate=data['birthdate'],
@@ -83,4 +76,11 @@ class DatabaseLLM:
                     )
 
             except Exception as e:
-                print("Error in line:", line, "error:", e)
\ No newline at end of file
+                print("Error in line:", line, "error:", e)
+
+        try:
+            uow.commit()
+        except Exception as e:
+            if raise_errors:
+                raise
+            print("Error saving the session in the knowledge graph:", e)
@@ -3,38 +3,18 @@ import uuid
 
 sys.path.insert(0, './llm')
 import os
-from datetime import datetime
-import yaml
-import os
 
 # Check the operating system, it is used for the import modules
 if os.name == 'nt':  # 'nt' stands for Windows
-    from llm.llm_api import call_translation_api
-
-    script_dir = os.path.dirname(__file__)
-    file_path = os.path.join(script_dir, "api_key.txt")
-    with open(file_path, "r") as file:
-        groq_api_key = file.read()
-    with open("../config/llm_config.yaml", "r", encoding="utf-8") as f:
-        prompts = yaml.safe_load(f)
+    from llm.llm_api import call_translation_api, groq_api_key, load_prompts
 
 elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
-    from llm_api import call_translation_api
-    with open("llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
-    with open("config/llm_config.yaml", "r", encoding="utf-8") as f:
-        prompts = yaml.safe_load(f)
-
-
-if not groq_api_key:
-    print("API KEY NOT LOADED: please follow the instructions in the README.md file to set up the API key.")
-    sys.exit(1)
+    from llm_api import call_translation_api, groq_api_key, load_prompts
 
-system_prompt_therapist = prompts["system_prompts"]["gesture_llm"]
 
 class GestureLLM:
     def __init__(self, model_name):
-        self.system_prompt = system_prompt_therapist
+        self.system_prompt = load_prompts()["system_prompts"]["gesture_llm"]
         self.last_gesture = ''
         self.model_name = model_name
 
@@ -44,7 +24,8 @@ class GestureLLM:
                                             model_name=self.model_name,
                                             system_prompt_template=self.system_prompt,
                                             user_prompt_template=prompt,
-                                            temperature=0)
+                                            temperature=0,
+                                            stage="GestureLLM")
         print("\n\n\n ----", llm_response)
         return llm_response.split("[GESTURE]: ")[1]
 
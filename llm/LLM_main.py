@@ -1,5 +1,8 @@
 import sys
 import os
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
 import threading
 import queue
 
@@ -24,8 +27,7 @@ if os.name == 'nt':  # 'nt' stands for Windows
     from llm.TherapistLLM import TherapistLLM
     from llm.DatabaseLLM import DatabaseLLM
     from face.face_main import face_thread
-    with open("api_key.txt", "r") as file:
-        groq_api_key = file.read()
+    from llm.llm_api import groq_api_key
 
 elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
     from database import KnowledgeGraph
@@ -34,8 +36,7 @@ elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
     from TherapistLLM import TherapistLLM
     from DatabaseLLM import DatabaseLLM
     from face_main import face_thread
-    with open("llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
+    from llm_api import groq_api_key
 
 
 if not groq_api_key:
@@ -55,9 +56,10 @@ unknown_child = {
 }
 
 
-therapist_model = 'llama-3.3-70b-versatile'
-db_model = 'gemma2-9b-it' # from 8 October 2025 SHOULD CHANGE TO 'llama-3.1-8b-instant'
-whisper_model_name = 'whisper-large-v3'
+# models of config/app_config.yaml
+therapist_model = settings.models.therapist
+db_model = settings.models.database
+whisper_model_name = settings.models.whisper
 stop = ''
 
 # Create a stop event object for the face thread
@@ -98,14 +100,15 @@ elif len(all_data) > 1:
     birth = input("")
 else:
     child = all_data[0]
+    preferences = kg.get_preference_summary(name=child["Name"], surname=child["Surname"], birth_date=child.get("Birth"))
     data = {
             "child_name": child["Name"],
             "child_surname": child["Surname"],
             "child_birth": child["Birth"],
             "child_gender": child["Gender"],
             "child_nation": child.get("Nation"), # may be missing and return None
-            "child_likes": child["LIKES"],
-            "child_dislikes": child["DISLIKES"],
+            "child_likes": preferences["LIKES"],
+            "child_dislikes": preferences["DISLIKES"],
             "previous_activity": child.get("last_activity"),
         }
 #print(data)
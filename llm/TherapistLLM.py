@@ -1,51 +1,42 @@
 import sys
+import json
+import time
 import uuid
 
 sys.path.insert(0, './llm')
 import os
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
 from datetime import datetime
-import yaml
-import os
 
 # Check the operating system, it is used for the import modules
 if os.name == 'nt':  # 'nt' stands for Windows
-    from llm.llm_api import call_translation_api
+    from llm.llm_api import call_translation_api, groq_api_key, load_prompts, usage, usage_session
     from llm.GestureLLM import GestureLLM
-
-    script_dir = os.path.dirname(__file__)
-    file_path = os.path.join(script_dir, "api_key.txt")
-    with open(file_path, "r") as file:
-        groq_api_key = file.read()
-    with open("../config/llm_config.yaml", "r", encoding="utf-8") as f:
-        prompts = yaml.safe_load(f)
+    from llm.session_log import make_turn, parse_history, write_session_log
 
 elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
-    from llm_api import call_translation_api
+    from llm_api import call_translation_api, groq_api_key, load_prompts, usage, usage_session
     from GestureLLM import GestureLLM
-    with open("llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
-    with open("config/llm_config.yaml", "r", encoding="utf-8") as f:
-        prompts = yaml.safe_load(f)
-
-
-if not groq_api_key:
-    print("API KEY NOT LOADED: please follow the instructions in the README.md file to set up the API key.")
-    sys.exit(1)
+    from session_log import make_turn, parse_history, write_session_log
 
-system_prompt_therapist = prompts["system_prompts"]["therapist"]
-user_prompt_therapist = prompts["user_prompt_templates"]["therapist"]
 
 class TherapistLLM:
     def __init__(self, model_name):
-        self.system_prompt = system_prompt_therapist
-        self.user_prompt = user_prompt_therapist
+        prompts = load_prompts()
+        self.system_prompt = prompts["system_prompts"]["therapist"]
+        self.user_prompt = prompts["user_prompt_templates"]["therapist"]
         self.session_history = ''
+        self.turns = []  # structured copy of the session history (llm/session_log.py)
+        self.usage_id = f"therapist-{uuid.uuid4()}"  # usage session of the calls made outside of a usage_session
+        self.start = datetime.now()
         self.data = None
         self.model_name = model_name
         self.last_gesture = ''
         self.last_response = ''
         self.last_child_sentence = ''
-        self.gesture_llm = GestureLLM(model_name='deepseek-r1-distill-llama-70b')
+        self.gesture_llm = GestureLLM(model_name=settings.models.gesture)
 
     def load_data(self, data):
         self.data = data
@@ -64,6 +55,7 @@ class TherapistLLM:
     def add_child_response(self, response):
         self.last_child_sentence = response
         self.session_history += '\n -Child: ' + response
+        self.turns.append(make_turn("child", response))
 
     def speak(self):
         formatted_user_prompt = self.user_prompt.format(
@@ -78,16 +70,26 @@ class TherapistLLM:
             conversation_history=self.session_history
         )
         #print("FORMATTED PROMPT:\n ______________________ \n" + formatted_user_prompt + '\n ___________________')
-        llm_response = call_translation_api(api_key=groq_api_key,
-                                            model_name=self.model_name,
-                                            system_prompt_template=self.system_prompt,
-                                            user_prompt_template=formatted_user_prompt,
-                                            temperature=1)
-
-
-        self.last_response = llm_response
-        self.last_gesture = self.gesture_llm.get_gesture(self.last_child_sentence, llm_response) # get the gesture from the response
+        session = usage.current_session() or self.usage_id
+        start, before = time.perf_counter(), usage.session(session)
+        with usage_session(session):
+            llm_response = call_translation_api(api_key=groq_api_key,
+                                                model_name=self.model_name,
+                                                system_prompt_template=self.system_prompt,
+                                                user_prompt_template=formatted_user_prompt,
+                                                temperature=1,
+                                                stage="TherapistLLM")
+
+
+            self.last_response = llm_response
+            self.last_gesture = self.gesture_llm.get_gesture(self.last_child_sentence, llm_response) # get the gesture from the response
         self.session_history += '\n -Therapist: ' + llm_response + ' [GESTURE]: ' + self.last_gesture
+        # latency and tokens of the therapist and gesture LLMs for this turn (the calls of a session are sequential)
+        used = usage.session(session)
+        self.turns.append(make_turn("therapist", llm_response, gesture=self.last_gesture or None,
+                                    latency_s=round(time.perf_counter() - start, 3),
+                                    prompt_tokens=used["prompt_tokens"] - before["prompt_tokens"],
+                                    completion_tokens=used["completion_tokens"] - before["completion_tokens"]))
         return llm_response
 
     def export_conversation(self, path='conversations', other_info = None):
@@ -95,27 +97,36 @@ class TherapistLLM:
         Esporta la conversazione in un file di testo con un ID univoco.
         Compatibile sia con Windows che con Linux/Mac.
         """
-        # Creiamo una cartella "conversations" se non esiste
-        os.makedirs(path, exist_ok=True)
+        return write_conversation(self.session_history, path=path, other_info=other_info, turns=self.turns, start=self.start)
+
+
+def write_conversation(session_history, path='conversations', other_info = None, turns=None, start=None, usage=None):
+    # writes a conversation to a text file with a unique name (used also by the server jobs, after the session)
+    # and its turns to the structured session log of the day (llm/session_log.py), with the LLM usage of the session if given
+    # Creiamo una cartella "conversations" se non esiste
+    os.makedirs(path, exist_ok=True)
 
-        # Creiamo un ID univoco
-        unique_id = str(uuid.uuid4())
+    # Creiamo un ID univoco
+    unique_id = str(uuid.uuid4())
 
-        # Nome file con timestamp + ID
-        filename = f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{unique_id}.txt"
+    # Nome file con timestamp + ID
+    filename = f"conversation_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{unique_id}.txt"
 
-        # Percorso completo
-        file_path_conversation = os.path.join(path, filename)
+    # Percorso completo
+    file_path_conversation = os.path.join(path, filename)
 
-        # Salviamo il contenuto
-        with open(file_path_conversation, "w", encoding="utf-8") as file_conv:
-            file_conv.write("Therapy Session Conversation\n\n")
-            file_conv.write(self.session_history.strip())
-            if other_info:
-                file_conv.write('\n\n' + other_info)
+    # Salviamo il contenuto
+    with open(file_path_conversation, "w", encoding="utf-8") as file_conv:
+        file_conv.write("Therapy Session Conversation\n\n")
+        file_conv.write(session_history.strip())
+        if other_info:
+            file_conv.write('\n\n' + other_info)
+        if usage:
+            file_conv.write('\n\n[USAGE]: ' + json.dumps(usage))
 
+    write_session_log(turns if turns is not None else parse_history(session_history), path=path, session_id=unique_id, start=start)
 
-        return file_path_conversation
+    return file_path_conversation
 
 
 
@@ -137,7 +148,7 @@ if __name__ == '__main__':
         "child_dislikes": "",
         "previous_activity": "",
     }
-    therapist_model = 'llama-3.3-70b-versatile'
+    therapist_model = settings.models.therapist
     therapist = TherapistLLM(model_name=therapist_model)
     therapist.load_data(unknown_child)
 
@@ -0,0 +1,202 @@
+import os
+import re
+import sys
+import time
+import random
+import hashlib
+import argparse
+import threading
+
+from flask import Flask, request, jsonify
+
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
+
+"""
+Local stand-in of the Groq API for the load and latency tests: it speaks the same OpenAI-style protocol
+('/openai/v1/chat/completions' and '/openai/v1/audio/transcriptions') and answers with seeded responses in the format
+each LLM of the project expects (therapist sentences, '[GESTURE]: ...' tags, DatabaseLLM extraction lines, child
+sentences with '[SCORE]: ...'). The same request with the same seed always gets the same response.
+
+Start it and point the project to it (no API key is needed), from the root of the repository:
+    python llm/fake_llm_server.py -profile groq -port 8000
+    LLM_API_BASE_URL=http://localhost:8000/openai/v1 python server/server.py -experiment minimal
+"""
+
+# latency = base + jitter (seconds) + completion tokens / token rate, errors = probability of a 429 / 500 answer
+PROFILES = {
+    "instant": {"latency": 0.0, "jitter": 0.0, "tokens_per_s": 0, "rate_limit_p": 0.0, "error_p": 0.0},
+    "groq": {"latency": 0.25, "jitter": 0.1, "tokens_per_s": 500, "rate_limit_p": 0.0, "error_p": 0.0},
+    "slow": {"latency": 1.0, "jitter": 0.5, "tokens_per_s": 50, "rate_limit_p": 0.0, "error_p": 0.0},
+    "flaky": {"latency": 0.25, "jitter": 0.1, "tokens_per_s": 500, "rate_limit_p": 0.1, "error_p": 0.02},
+}
+
+THERAPIST_SENTENCES = [
+    "Ciao! Io sono Adam, come ti chiami?",
+    "Che bello! Ti va di inventare una storia insieme?",
+    "C'era una volta un piccolo drago che voleva imparare a volare. Come continua secondo te?",
+    "Wow, è un'idea bellissima! E poi cosa succede?",
+    "Ti piace la musica? Possiamo cantare una canzone insieme.",
+    "Pensiamo a un posto magico dove far vivere il nostro personaggio...",
+]
+CHILD_SENTENCES = [
+    "Ciao, mi piacciono i dinosauri.",
+    "Non lo so...",
+    "Il drago trova un amico gatto!",
+    "Voglio cantare una canzone sui pirati.",
+    "Basta, sono stanco.",
+    "Poi il drago vola sopra il mare.",
+]
+GESTURES = ["hello_gesture_1", "hello_gesture_2", "moving_gesture_single_arm", "moving_gesture_double_arm",
+            "thinking_gesture", "surprise_gesture", "approval_gesture", "disapproval_gesture"]
+GENRES = ["Fantasy", "Adventure", "Comedy", "Pop", "Cartoon"]
+TRANSCRIPTIONS = ["Ciao, mi chiamo Luca.", "Mi piace la storia del drago.", "Facciamo una canzone?", "Non mi va."]
+
+
+def load_system_prompts():
+    # system prompts of config/llm_config.yaml (settings.prompts(), reloaded when the file changes), to know which
+    # LLM of the project is calling
+    return {prompt.strip(): role for role, prompt in settings.prompts()["system_prompts"].items()}
+
+
+class FakeLLM:
+    def __init__(self, profile="instant", seed=0, **overrides):
+        self.profile = dict(PROFILES[profile])
+        self.profile.update({k: v for k, v in overrides.items() if v is not None})
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "rate_limited": 0, "errors": 0}
+        self._calls = 0
+
+    def rng(self, *parts):
+        # deterministic generator for a request (same seed and content -> same response)
+        digest = hashlib.sha256("|".join([str(self.seed)] + [str(p) for p in parts]).encode("utf-8")).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def role(self, system_prompt):
+        role = load_system_prompts().get((system_prompt or "").strip())
+        if role:
+            return role
+        text = (system_prompt or "").lower()
+        for role, keyword in (("gesture_llm", "gesture"), ("database_llm", "function"), ("child_llm", "simulating a child")):
+            if keyword in text:
+                return role
+        return "therapist"
+
+    def complete(self, system_prompt, user_prompt):
+        rng = self.rng(system_prompt, user_prompt)
+        role = self.role(system_prompt)
+        if role == "gesture_llm":
+            return "[GESTURE]: " + rng.choice(GESTURES)
+        if role == "child_llm":
+            return f"{rng.choice(CHILD_SENTENCES)} [SCORE]: {rng.random():.2f}"
+        if role == "database_llm":
+            return self.extraction(user_prompt, rng)
+        return rng.choice(THERAPIST_SENTENCES)
+
+    def extraction(self, conversation, rng):
+        # DatabaseLLM lines for the child of the [CHILD INFO] section (same format of the real model)
+        info = dict(re.findall(r"^(name|surname|birth):[ \t]*(.*)$", conversation, flags=re.MULTILINE))
+        name, surname, birth = info.get("name", "").strip(), info.get("surname", "").strip(), info.get("birth", "").strip()
+        lines = ['{"function": "add_child_node", "data": {"Name": "%s", "Surname": "%s", "Birth": "%s", "Gender": "%s"}}'
+                 % (name, surname, birth, rng.choice(["Male", "Female"]))]
+        activity_class = rng.choice(["Storytelling", "Conversation"])
+        lines.append('{"function": "add_activity", "data": {"name": "%s", "surname": "%s", "birthdate": "%s", "genre": "%s", '
+                     '"summary": "story number %d", "activity_class": "%s"}}'
+                     % (name, surname, birth, rng.choice(GENRES), rng.randint(0, 999), activity_class))
+        return "\n".join(lines)
+
+    def wait(self, completion_tokens, rng):
+        delay = self.profile["latency"] + rng.uniform(0, self.profile["jitter"])
+        if self.profile["tokens_per_s"]:
+            delay += completion_tokens / self.profile["tokens_per_s"]
+        if delay > 0:
+            time.sleep(delay)
+
+    def injected_error(self):
+        # 429 / 500 answers of the error profile (seeded by the number of requests, so a run is reproducible)
+        with self._lock:
+            self._calls += 1
+            self.counts["requests"] += 1
+            rng = self.rng("error", self._calls)
+        draw = rng.random()
+        if draw < self.profile["rate_limit_p"]:
+            with self._lock:
+                self.counts["rate_limited"] += 1
+            return 429
+        if draw < self.profile["rate_limit_p"] + self.profile["error_p"]:
+            with self._lock:
+                self.counts["errors"] += 1
+            return 500
+        return None
+
+
+def count_tokens(text):
+    # rough token count (about 0.75 words per token)
+    return max(1, int(len((text or "").split()) / 0.75))
+
+
+def create_app(fake):
+    app = Flask(__name__)
+
+    @app.route("/openai/v1/chat/completions", methods=["POST"])
+    @app.route("/v1/chat/completions", methods=["POST"])
+    def chat_completions():
+        error = fake.injected_error()
+        if error:
+            return jsonify({"error": {"message": "injected error", "code": error}}), error
+        body = request.get_json(force=True)
+        messages = body.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        user_prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        content = fake.complete(system_prompt, user_prompt)
+        prompt_tokens = count_tokens(system_prompt) + count_tokens(user_prompt)
+        completion_tokens = count_tokens(content)
+        fake.wait(completion_tokens, fake.rng("latency", system_prompt, user_prompt))
+        return jsonify({
+            "id": "fake-" + hashlib.sha1((system_prompt + user_prompt).encode("utf-8")).hexdigest()[:12],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    @app.route("/openai/v1/audio/transcriptions", methods=["POST"])
+    @app.route("/v1/audio/transcriptions", methods=["POST"])
+    def audio_transcriptions():
+        error = fake.injected_error()
+        if error:
+            return jsonify({"error": {"message": "injected error", "code": error}}), error
+        audio = request.files.get("file")
+        size = len(audio.read()) if audio else 0
+        rng = fake.rng("audio", size)
+        text = rng.choice(TRANSCRIPTIONS)
+        fake.wait(count_tokens(text), rng)
+        return jsonify({"text": text})
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        with fake._lock:
+            return jsonify(dict(fake.counts, profile=fake.profile))
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-style stand-in of the Groq API (chat completions and transcriptions).")
+    parser.add_argument('-port', type=int, default=8000, help='Port of the server.')
+    parser.add_argument('-profile', type=str, default='instant', choices=sorted(PROFILES), help='Latency and error profile.')
+    parser.add_argument('-seed', type=int, default=0, help='Seed of the responses.')
+    parser.add_argument('-latency', type=float, default=None, help='Base latency in seconds (overrides the profile).')
+    parser.add_argument('-jitter', type=float, default=None, help='Random extra latency in seconds (overrides the profile).')
+    parser.add_argument('-tokens_per_s', type=float, default=None, help='Generation speed, 0 for no limit (overrides the profile).')
+    parser.add_argument('-rate_limit_p', type=float, default=None, help='Probability of a 429 answer (overrides the profile).')
+    parser.add_argument('-error_p', type=float, default=None, help='Probability of a 500 answer (overrides the profile).')
+    args = parser.parse_args()
+
+    fake = FakeLLM(args.profile, args.seed, latency=args.latency, jitter=args.jitter, tokens_per_s=args.tokens_per_s,
+                   rate_limit_p=args.rate_limit_p, error_p=args.error_p)
+    create_app(fake).run(host='0.0.0.0', port=args.port, threaded=True)
@@ -3,28 +3,211 @@ sys.path.insert(0, './audio')
 sys.path.insert(0, './neo4j_db') 
 sys.path.insert(0, './llm')
 
-import os
 import requests
 import time
+import threading
+import collections
+import contextlib
 from typing import Optional
 import os
 
-# Check the operating system, it is used for the import modules
-if os.name == 'nt':  # 'nt' stands for Windows
-    with open("../llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
 
-elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
-    with open("llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
- 
+# Base URL of the OpenAI-style API: Groq, or a local stand-in for the offline load/latency tests
+# (e.g. LLM_API_BASE_URL=http://localhost:8000/openai/v1 with llm/fake_llm_server.py, llm.api_base_url in config/app_config.yaml)
+LLM_API_BASE_URL = settings.llm.api_base_url.rstrip("/")
 
+groq_api_key = settings.api_key()  # llm.api_key_path of config/app_config.yaml (no key is needed with a local stand-in)
 
 if not groq_api_key:
     print("API KEY NOT LOADED: please follow the instructions in the README.md file to set up the API key.")
     sys.exit(1)
 
-def call_translation_api(api_key, model_name, system_prompt_template, user_prompt_template, temperature) -> Optional[
+def load_prompts():
+    # prompts of config/llm_config.yaml, read by the first LLM created and again when the file changes
+    return settings.prompts()
+
+
+class RateLimiter:
+    """Budget of requests and tokens per minute shared by all the threads that call the API (e.g. the parallel
+    conversations of llm/simulation.py), set with set_rate_limiter. acquire() blocks until the last 60 seconds
+    leave room for one more request, record() accounts the tokens used by the response.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._events = collections.deque()  # (time, tokens) of the requests of the last minute
+        self._lock = threading.Lock()
+        self.waited_s = 0.0
+
+    def _trim(self, now):
+        while self._events and self._events[0][0] <= now - 60:
+            self._events.popleft()
+
+    def acquire(self):
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._trim(now)
+                requests_ok = not self.requests_per_minute or len(self._events) < self.requests_per_minute
+                tokens_ok = not self.tokens_per_minute or sum(t for _, t in self._events) < self.tokens_per_minute
+                if requests_ok and tokens_ok:
+                    self._events.append((now, 0))
+                    self.waited_s += now - start
+                    return
+                wait = self._events[0][0] + 60 - now if self._events else 0.1
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+    def record(self, tokens):
+        # the tokens of a response are charged to the newest request without tokens
+        with self._lock:
+            for i in range(len(self._events) - 1, -1, -1):
+                if self._events[i][1] == 0:
+                    self._events[i] = (self._events[i][0], tokens)
+                    return
+            self._events.append((time.monotonic(), tokens))
+
+
+# USD per million (prompt, completion) tokens of the models of the project (Groq price list), for the cost estimates
+MODEL_PRICES = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "deepseek-r1-distill-llama-70b": (0.75, 0.99),
+    "gemma2-9b-it": (0.20, 0.20),
+}
+# model used instead of the requested one when a session is over its budget
+CHEAPER_MODELS = {
+    "llama-3.3-70b-versatile": "llama-3.1-8b-instant",
+    "deepseek-r1-distill-llama-70b": "llama-3.1-8b-instant",
+    "gemma2-9b-it": "llama-3.1-8b-instant",
+}
+
+
+def request_cost(model_name, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = MODEL_PRICES.get(model_name, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+class UsageAccounting:
+    """Usage of the API aggregated in memory by session (an id of the therapy session), stage (the LLM class calling
+    the API) and model: requests, tokens, estimated cost and latency. The sessions are tagged with
+    'with usage_session(session_id):' around the calls and dropped when they are over (drop), at most the last
+    'max_sessions' sessions are kept (the totals by stage and model are never dropped, summary() is the usage of the
+    process).
+
+    With a budget (set_budget), the requests of a session that already used 'tokens' tokens or 'cost_usd' dollars
+    are sent to the cheaper model of CHEAPER_MODELS.
+    """
+
+    def __init__(self, max_sessions=1000):
+        self.max_sessions = max_sessions
+        self.token_budget = None
+        self.cost_budget = None
+        self._lock = threading.Lock()
+        self._sessions = collections.OrderedDict()  # session -> {(stage, model): counters}
+        self._totals = {}  # (stage, model) -> counters
+        self._local = threading.local()  # session of the calls of each thread
+
+    def current_session(self):
+        return getattr(self._local, "session", None)
+
+    @contextlib.contextmanager
+    def scope(self, session):
+        # the API calls of the current thread inside the block are accounted to 'session' (e.g. the chat id)
+        previous = self.current_session()
+        self._local.session = session
+        try:
+            yield
+        finally:
+            self._local.session = previous
+
+    def set_budget(self, tokens=None, cost_usd=None):
+        self.token_budget = tokens or None
+        self.cost_budget = cost_usd or None
+
+    @staticmethod
+    def _counters():
+        return {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cost_usd": 0.0, "latency_s": 0.0}
+
+    def record(self, session, stage, model_name, prompt_tokens, completion_tokens, latency_s):
+        values = {"requests": 1, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens,
+                  "cost_usd": request_cost(model_name, prompt_tokens, completion_tokens), "latency_s": latency_s}
+        with self._lock:
+            targets = [self._totals.setdefault((stage, model_name), self._counters())]
+            if session is not None:
+                entries = self._sessions.setdefault(session, {})
+                self._sessions.move_to_end(session)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                targets.append(entries.setdefault((stage, model_name), self._counters()))
+            for counters in targets:
+                for k, v in values.items():
+                    counters[k] += v
+
+    def model_for(self, session, model_name):
+        # requested model, or its cheaper one if the session is over budget
+        if session is None or (self.token_budget is None and self.cost_budget is None):
+            return model_name
+        with self._lock:
+            entries = list(self._sessions.get(session, {}).values())
+        tokens = sum(c["total_tokens"] for c in entries)
+        cost = sum(c["cost_usd"] for c in entries)
+        if (self.token_budget and tokens >= self.token_budget) or (self.cost_budget and cost >= self.cost_budget):
+            return CHEAPER_MODELS.get(model_name, model_name)
+        return model_name
+
+    @staticmethod
+    def _group(entries):
+        # {(stage, model): counters} -> totals, by stage and by model
+        total, by_stage, by_model = UsageAccounting._counters(), {}, {}
+        for (stage, model_name), counters in entries.items():
+            for target in (total, by_stage.setdefault(stage, UsageAccounting._counters()),
+                           by_model.setdefault(model_name, UsageAccounting._counters())):
+                for k, v in counters.items():
+                    target[k] += v
+        rounded = lambda c: dict(c, cost_usd=round(c["cost_usd"], 6), latency_s=round(c["latency_s"], 3))
+        return dict(rounded(total), by_stage={k: rounded(v) for k, v in by_stage.items()},
+                    by_model={k: rounded(v) for k, v in by_model.items()})
+
+    def session(self, session):
+        with self._lock:
+            entries = {k: dict(v) for k, v in self._sessions.get(session, {}).items()}
+        return self._group(entries)
+
+    def drop(self, session):
+        # forgets a finished session (its usage stays in the totals)
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def summary(self):
+        with self._lock:
+            totals = {k: dict(v) for k, v in self._totals.items()}
+            sessions = len(self._sessions)
+        return dict(self._group(totals), sessions=sessions, token_budget=self.token_budget, cost_budget_usd=self.cost_budget)
+
+    def reset(self):
+        with self._lock:
+            self._sessions.clear()
+            self._totals.clear()
+
+
+usage = UsageAccounting()
+usage_session = usage.scope  # 'with usage_session(session_id):' around the API calls of a session
+_rate_limiter = None
+
+
+def set_rate_limiter(limiter):
+    # RateLimiter used by every call_translation_api of the process (None to disable)
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+def call_translation_api(api_key, model_name, system_prompt_template, user_prompt_template, temperature, stage=None) -> Optional[
     str]:
     # This function sends a Prompt to a Groq-hosted API waiting for the response (the translated sentence)
     # Args: - api_key: the Groq API key you need to authorization
@@ -32,9 +215,10 @@ def call_translation_api(api_key, model_name, system_prompt_template, user_promp
     #       - system_prompt_template: <str> it is a prompt containing the instructions for the model (ex. "You are a translator...")
     #       - user_prompt_template: <str> it is a prompt containing the sentence to translate
     #       - temperature: <float> it is a float number to set the temperature of the model
+    #       - stage: <str> who is calling (ex. "TherapistLLM"), for the usage accounting
     # Output: - translation: <str> the translated sentence returned by the model, or None if an error occurred
 
-    url = "https://api.groq.com/openai/v1/chat/completions"  # this is the url of the Groq API (same structure of OpenAI message!)
+    url = LLM_API_BASE_URL + "/chat/completions"  # this is the url of the Groq API (same structure of OpenAI message!)
 
     # The header of the message contain the "Content-Type" (it say that the message structure will be json, a dict) and the "Authorization"
     # It is a string "Bearer gsk...." with the api_key in a Bearer Token type (Bearer means that the authorization is give with the api_key directly after)
@@ -46,6 +230,8 @@ def call_translation_api(api_key, model_name, system_prompt_template, user_promp
     # This is the message content itself. It contain the "model_name", its "temperature"
     # the messages contain two dictionaries: the first one is the system prompt (the instructions for the model, like "You are a translator...")
     # and the second one is the user prompt (the input sentence to translate)
+    session = usage.current_session()
+    model_name = usage.model_for(session, model_name)  # cheaper model if the session is over its budget
     data = {
         "model": model_name,
         "temperature": temperature,
@@ -63,15 +249,23 @@ def call_translation_api(api_key, model_name, system_prompt_template, user_promp
 
     while True:
         try:
+            if _rate_limiter is not None:
+                _rate_limiter.acquire()  # global budget of requests/tokens per minute
+            start = time.perf_counter()
             response = requests.post(url, headers=headers, json=data)  # send the request to the Groq API
             # Check for rate limiting (HTTP 429), wait 5 seconds and retry
             if response.status_code in [429, 500]:
-                print(f"Received {response.status_code}. Retrying in 5s...")
-                time.sleep(30)
+                print(f"Received {response.status_code}. Retrying in {settings.llm.retry_wait_s:g}s...")
+                time.sleep(settings.llm.retry_wait_s)
                 continue  # Retry after wait
 
             response.raise_for_status()  # Raise an exception for other HTTP errors like 400 or 500 (if one occurred)
             answer = response.json()  # return the response in json format (a dict)
+            answer_usage = answer.get("usage") or {}
+            prompt_tokens, completion_tokens = answer_usage.get("prompt_tokens", 0) or 0, answer_usage.get("completion_tokens", 0) or 0
+            usage.record(session, stage, model_name, prompt_tokens, completion_tokens, time.perf_counter() - start)
+            if _rate_limiter is not None:
+                _rate_limiter.record(prompt_tokens + completion_tokens)  # tokens of the request (for the tokens per minute)
 
             # Translation is a dict with 'id' (a unique identifier for the request),  'created' (the timestamp of the request) ...
             # inside 'choices' there are different generated responses in general, we take the first one
@@ -0,0 +1,172 @@
+import sys
+sys.path.insert(0, './llm')
+
+import os
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
+import json
+import time
+import difflib
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+# Check the operating system, it is used for the import modules
+if os.name == 'nt':  # 'nt' stands for Windows
+    from llm.llm_api import RateLimiter, set_rate_limiter
+    from llm.TherapistLLM import TherapistLLM
+    from llm.GestureLLM import GestureLLM
+    from llm.session_log import iter_turns
+elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
+    from llm_api import RateLimiter, set_rate_limiter
+    from TherapistLLM import TherapistLLM
+    from GestureLLM import GestureLLM
+    from session_log import iter_turns
+
+"""
+Replay of recorded sessions against a new therapist prompt or model: the child turns of the session logs
+(llm/session_log.py, with their '[SCORE]' values) are given again to TherapistLLM/GestureLLM and every new therapist
+turn is recorded next to the original one (text, gesture, latency, tokens). The sessions run in parallel and the
+output is one JSON line per session plus a report (totals and a text diff of the responses). Example (from the root
+of the repository):
+    python llm/replay.py conversations -model llama-3.1-8b-instant -workers 4 -out replay
+    python llm/replay.py conversations/sessions_20250831.jsonl -system_prompt new_prompt.txt -sessions 20
+
+The text conversations of the first versions can be replayed after 'python llm/session_log.py convert conversations'.
+"""
+
+# the session logs do not store the child data: the replay uses the prompt of a new child
+REPLAY_CHILD = {"child_name": "", "child_surname": "", "child_birth": "", "child_gender": "", "child_nation": "",
+                "child_likes": "", "child_dislikes": "", "previous_activity": ""}
+
+
+def iter_sessions(paths, limit=None):
+    # (session id, turns) of the logs, the turns of a session are consecutive lines
+    sessions = itertools.groupby(iter_turns(paths), key=lambda turn: (turn.get("session"), turn.get("start")))
+    for (session_id, _), turns in itertools.islice(sessions, limit):
+        yield session_id, list(turns)
+
+
+class SessionReplay:
+    def __init__(self, model_name=None, gesture_model=None, system_prompt=None, child_data=None):
+        self.model_name = model_name or settings.models.therapist
+        self.gesture_model = gesture_model
+        self.system_prompt = system_prompt
+        self.child_data = child_data or REPLAY_CHILD
+
+    def replay(self, session_id, turns):
+        """Replays the child turns of a session, a new therapist turn for every original one.
+        Outputs:
+            record (dict): session id and the (original, new) pairs of the therapist turns.
+        """
+
+        therapist = TherapistLLM(model_name=self.model_name)
+        if self.system_prompt:
+            therapist.system_prompt = self.system_prompt
+        if self.gesture_model:
+            therapist.gesture_llm = GestureLLM(model_name=self.gesture_model)
+        therapist.load_data(dict(self.child_data))
+
+        pairs = []
+        for turn in turns:
+            if turn.get("speaker") == "child":
+                score = turn.get("score")
+                therapist.add_child_response(turn["text"] + (" [SCORE]:" + str(score) if score is not None else ""))
+                continue
+            therapist.speak()
+            new = therapist.turns[-1]
+            pairs.append({"turn": turn.get("turn"),
+                          "original": {k: turn.get(k) for k in ("text", "gesture", "latency_s", "prompt_tokens", "completion_tokens")},
+                          "new": {k: new[k] for k in ("text", "gesture", "latency_s", "prompt_tokens", "completion_tokens")},
+                          "similarity": round(difflib.SequenceMatcher(None, turn.get("text") or "", new["text"]).ratio(), 3)})
+        return {"session": session_id, "model": self.model_name, "pairs": pairs}
+
+
+def side_stats(pairs, side):
+    # latency percentiles and tokens of the original or of the new therapist turns
+    latencies = np.array([p[side]["latency_s"] for p in pairs if p[side]["latency_s"] is not None], dtype=float)
+    stats = {"turns": len(pairs),
+             "prompt_tokens": sum(p[side]["prompt_tokens"] or 0 for p in pairs),
+             "completion_tokens": sum(p[side]["completion_tokens"] or 0 for p in pairs),
+             "words": sum(len((p[side]["text"] or "").split()) for p in pairs)}
+    if len(latencies):
+        stats.update({"latency_mean_s": round(float(latencies.mean()), 3),
+                      "latency_p50_s": round(float(np.percentile(latencies, 50)), 3),
+                      "latency_p95_s": round(float(np.percentile(latencies, 95)), 3)})
+    return stats
+
+
+def report(records):
+    # totals of the replay: original vs new cost and latency, gesture agreement and text similarity
+    pairs = [pair for record in records for pair in record["pairs"]]
+    if not pairs:
+        return {"sessions": len(records), "turns": 0}
+    with_gesture = [p for p in pairs if p["original"]["gesture"]]
+    return {"sessions": len(records), "turns": len(pairs),
+            "original": side_stats(pairs, "original"), "new": side_stats(pairs, "new"),
+            "gesture_agreement": round(sum(p["original"]["gesture"] == p["new"]["gesture"] for p in with_gesture) / len(with_gesture), 3) if with_gesture else None,
+            "mean_similarity": round(float(np.mean([p["similarity"] for p in pairs])), 3)}
+
+
+def write_diff(records, path):
+    # text diff of the therapist responses, session by session (only the turns that changed)
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(f"=== session {record['session']}\n")
+            for pair in record["pairs"]:
+                original, new = pair["original"], pair["new"]
+                if original["text"] == new["text"] and original["gesture"] == new["gesture"]:
+                    continue
+                f.write(f"--- turn {pair['turn']} (similarity {pair['similarity']}, "
+                        f"latency {original['latency_s']} -> {new['latency_s']} s, gesture {original['gesture']} -> {new['gesture']})\n")
+                f.writelines(line + "\n" for line in difflib.unified_diff(
+                    (original["text"] or "").splitlines(), new["text"].splitlines(), "original", "new", lineterm=""))
+            f.write("\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay of recorded sessions against a new therapist prompt or model.")
+    parser.add_argument('paths', nargs='*', default=['conversations'], help='Session logs (files or folders).')
+    parser.add_argument('-model', type=str, default=settings.models.therapist, help='Model of the TherapistLLM (default: models.therapist of config/app_config.yaml).')
+    parser.add_argument('-gesture_model', type=str, default=None, help='Model of the GestureLLM (default: the one set by TherapistLLM).')
+    parser.add_argument('-system_prompt', type=str, default=None, help='Text file with a new system prompt of the therapist.')
+    parser.add_argument('-sessions', type=int, default=None, help='Replay only the first sessions of the logs.')
+    parser.add_argument('-workers', type=int, default=4, help='Sessions replayed at the same time.')
+    parser.add_argument('-rpm', type=int, default=30, help='Global budget of API requests per minute (0: no limit).')
+    parser.add_argument('-out', type=str, default='replay', help='Output folder (sessions.jsonl, report.json, diff.txt).')
+    args = parser.parse_args()
+
+    system_prompt = None
+    if args.system_prompt:
+        with open(args.system_prompt, "r", encoding="utf-8") as f:
+            system_prompt = f.read()
+    set_rate_limiter(RateLimiter(requests_per_minute=args.rpm or None))
+    replayer = SessionReplay(model_name=args.model, gesture_model=args.gesture_model, system_prompt=system_prompt)
+
+    os.makedirs(args.out, exist_ok=True)
+    records = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor, \
+            open(os.path.join(args.out, "sessions.jsonl"), "w", encoding="utf-8") as out:
+        futures = {executor.submit(replayer.replay, session_id, turns): session_id
+                   for session_id, turns in iter_sessions(args.paths, args.sessions)}
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"  session {futures[future]} failed: {e}")
+                continue
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            records.append(record)
+            print(f"  [{len(records)}/{len(futures)}] session {record['session']} ({len(record['pairs'])} therapist turns)")
+
+    summary = report(records)
+    summary["seconds"] = round(time.perf_counter() - start, 1)
+    with open(os.path.join(args.out, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    write_diff(records, os.path.join(args.out, "diff.txt"))
+    print(json.dumps(summary, indent=2))
+    print(f"Results saved in {args.out}")
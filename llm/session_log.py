@@ -0,0 +1,196 @@
+import os
+import re
+import glob
+import json
+import random
+import argparse
+import datetime
+import threading
+import collections
+
+import numpy as np
+
+"""
+Structured log of the therapy sessions, next to the text files of write_conversation: one JSON line per turn in
+'conversations/sessions_<YYYYMMDD>.jsonl' (one file per day), so that thousands of sessions can be analyzed without
+parsing the free-form text again. Fields of a turn:
+    session, start (ISO time of the session), turn (0, 1, ...), speaker ('therapist' / 'child'), text,
+    gesture (therapist), score (child engagement), latency_s (therapist: LLM + gesture), prompt_tokens, completion_tokens
+
+The analytics read the files one line at a time (memory does not grow with the corpus): engagement by turn and by
+day, gesture distribution, turn latencies and tokens. Examples (from the root of the repository):
+    python llm/session_log.py analyze conversations
+    python llm/session_log.py convert conversations    (old text files -> conversations/sessions_legacy.jsonl)
+"""
+
+TURN_FIELDS = ["session", "start", "turn", "speaker", "text", "gesture", "score", "latency_s", "prompt_tokens", "completion_tokens"]
+SCORE_TAG = re.compile(r"\s*\[SCORE\]:\s*([-+]?\d*\.?\d+)\s*$")
+GESTURE_TAG = re.compile(r"\s*\[GESTURE\]:\s*(\S*)\s*$")
+LEGACY_NAME = re.compile(r"conversation_(\d{8}_\d{6})_([0-9a-f-]+)\.txt$")
+
+_write_lock = threading.Lock()
+
+
+def make_turn(speaker, text, **fields):
+    # turn of the log, the '[SCORE]:' / '[GESTURE]:' tags at the end of the text become fields
+    if speaker == "child":
+        match = SCORE_TAG.search(text)
+        if match:
+            text, fields["score"] = text[:match.start()], float(match.group(1))
+    else:
+        match = GESTURE_TAG.search(text)
+        if match:
+            text, fields["gesture"] = text[:match.start()], match.group(1) or None
+    turn = {field: None for field in TURN_FIELDS[4:]}
+    turn.update(fields, speaker=speaker, text=text.strip())
+    return turn
+
+
+def parse_history(session_history):
+    # turns of a session_history string ('\n -Therapist: ... [GESTURE]: ...' / '\n -Child: ... [SCORE]:0.5')
+    turns = []
+    for line in session_history.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("-Therapist:") or stripped.startswith("-Child:"):
+            speaker, _, text = stripped[1:].partition(":")
+            turns.append([speaker.lower(), text])
+        elif stripped.startswith('{"function"') or stripped.startswith('[USAGE]:'):  # sections appended by write_conversation
+            break
+        elif turns:  # multi-line response
+            turns[-1][1] += "\n" + line
+    return [make_turn(speaker, text) for speaker, text in turns]
+
+
+def write_session_log(turns, path='conversations', session_id=None, start=None):
+    """Appends the turns of a session to the log of the day (one JSON line per turn).
+    Outputs:
+        log path (str)
+    """
+
+    start = start or datetime.datetime.now()
+    os.makedirs(path, exist_ok=True)
+    log_path = os.path.join(path, f"sessions_{start.strftime('%Y%m%d')}.jsonl")
+    lines = [json.dumps(dict(session=session_id, start=start.isoformat(timespec="seconds"), turn=i, **turn), ensure_ascii=False)
+             for i, turn in enumerate(turns)]
+    with _write_lock, open(log_path, "a", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+    return log_path
+
+
+def iter_turns(paths):
+    # turns of the JSONL logs (files or folders), one line at a time
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, "sessions_*.jsonl"))) if os.path.isdir(path) else [path]
+        for file_path in files:
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # truncated line of a log being written
+
+
+def convert_legacy(path='conversations', out_path=None):
+    # writes the text files of write_conversation as JSONL turns (session id and start from the file name); the
+    # sessions already in the JSONL logs (write_conversation writes both) are skipped, not to be counted twice
+    out_path = out_path or os.path.join(path, "sessions_legacy.jsonl")
+    logs = [file_path for file_path in glob.glob(os.path.join(path, "sessions_*.jsonl"))
+            if os.path.abspath(file_path) != os.path.abspath(out_path)]
+    logged = {turn.get("session") for turn in iter_turns(logs)}
+    sessions = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for file_path in sorted(glob.glob(os.path.join(path, "conversation_*.txt"))):
+            match = LEGACY_NAME.search(os.path.basename(file_path))
+            if not match or match.group(2) in logged:
+                continue
+            start = datetime.datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").isoformat()
+            with open(file_path, "r", encoding="utf-8") as f:
+                turns = parse_history(f.read())
+            for i, turn in enumerate(turns):
+                out.write(json.dumps(dict(session=match.group(2), start=start, turn=i, **turn), ensure_ascii=False) + "\n")
+            sessions += 1
+    return sessions, out_path
+
+
+class Reservoir:
+    # uniform sample of at most 'size' values of a stream (the percentiles of a large corpus in bounded memory)
+    def __init__(self, size=10000, seed=0):
+        self.size = size
+        self.count = 0
+        self.values = []
+        self.rng = random.Random(seed)
+
+    def add(self, value):
+        self.count += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            i = self.rng.randrange(self.count)
+            if i < self.size:
+                self.values[i] = value
+
+    def summary(self):
+        if not self.values:
+            return {"count": 0}
+        values = np.array(self.values)
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"count": self.count, "mean": round(float(values.mean()), 3), "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3), "p99": round(float(p99), 3), "max": round(float(values.max()), 3)}
+
+
+def analyze(turns, max_turn=50):
+    """Streaming statistics of the turns (an iterable, e.g. iter_turns).
+    Outputs:
+        stats (dict): sessions, engagement by turn and by day, gesture distribution, therapist latency and tokens.
+    """
+
+    sessions = 0
+    score_by_turn = collections.defaultdict(lambda: [0.0, 0])  # turn of the session -> [sum, count]
+    score_by_day = collections.defaultdict(lambda: [0.0, 0])
+    gestures = collections.Counter()
+    latency = Reservoir()
+    tokens = collections.Counter()
+    for turn in turns:
+        sessions += turn.get("turn") == 0  # the turns of a session are written together, nothing is kept per session
+        if turn.get("speaker") == "child":
+            if turn.get("score") is not None:
+                day = (turn.get("start") or "")[:10]
+                for key, bucket in ((min(turn.get("turn") or 0, max_turn), score_by_turn), (day, score_by_day)):
+                    bucket[key][0] += turn["score"]
+                    bucket[key][1] += 1
+        else:
+            gestures[turn.get("gesture") or "none"] += 1
+            if turn.get("latency_s") is not None:
+                latency.add(turn["latency_s"])
+            for field in ("prompt_tokens", "completion_tokens"):
+                tokens[field] += turn.get(field) or 0
+
+    mean = lambda bucket: {key: round(total / count, 3) for key, (total, count) in sorted(bucket.items())}
+    total_gestures = sum(gestures.values())
+    return {
+        "sessions": sessions,
+        "engagement_by_turn": mean(score_by_turn),  # turns after 'max_turn' are counted in the last one
+        "engagement_by_day": mean(score_by_day),
+        "gestures": {gesture: {"count": count, "share": round(count / total_gestures, 3)} for gesture, count in gestures.most_common()},
+        "therapist_latency_s": latency.summary(),
+        "tokens": dict(tokens),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Structured session logs: analytics and conversion of the old text conversations.")
+    parser.add_argument('command', choices=['analyze', 'convert'], help="'analyze' the JSONL logs, 'convert' the text conversations to JSONL.")
+    parser.add_argument('paths', nargs='*', default=['conversations'], help='Log files or folders (convert: the folder of the text files).')
+    parser.add_argument('-max_turn', type=int, default=50, help='Turns after this one are counted together in the engagement trend.')
+    parser.add_argument('-out', type=str, default=None, help='analyze: JSON file of the statistics, convert: JSONL output.')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        sessions, out_path = convert_legacy(args.paths[0], args.out)
+        print(f"{sessions} conversations written to {out_path}")
+    else:
+        stats = analyze(iter_turns(args.paths), max_turn=args.max_turn)
+        print(json.dumps(stats, indent=2, ensure_ascii=False))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2, ensure_ascii=False)
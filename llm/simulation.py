@@ -0,0 +1,183 @@
+import sys
+sys.path.insert(0, './llm')
+sys.path.insert(0, './neo4j_db')
+
+import os
+# central configuration (config/settings.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Check the operating system, it is used for the import modules
+if os.name == 'nt':  # 'nt' stands for Windows
+    from llm.llm_api import RateLimiter, set_rate_limiter, usage, usage_session
+    from llm.ChildLLM import ChildLLM, make_childs, groq_api_key
+    from llm.TherapistLLM import TherapistLLM
+    from llm.DatabaseLLM import DatabaseLLM
+    from neo4j_db.database import make_knowledge_graph
+elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
+    from llm_api import RateLimiter, set_rate_limiter, usage, usage_session
+    from ChildLLM import ChildLLM, make_childs, groq_api_key
+    from TherapistLLM import TherapistLLM
+    from DatabaseLLM import DatabaseLLM
+    from database import make_knowledge_graph
+
+"""
+Simulation of therapy sessions between the TherapistLLM and a ChildLLM (the child is played by an LLM with a
+personality trait), many conversations at a time under a global budget of requests/tokens per minute.
+
+Every conversation is one line of the JSONL output (child, conversation history, DatabaseLLM extraction, score,
+duration and tokens): a run can be stopped and started again with the same arguments, the conversations already in
+the output file are skipped. Example (from the root of the repository):
+    python llm/simulation.py -conversations 100 -children 50 -turns 8 -workers 8 -rpm 30 -out simulations.jsonl
+"""
+
+
+class SimulationRunner:
+    def __init__(self, num_children=50, turns=8, personalities=None, workers=4, seed=0, save=True,
+                 therapist_model=None, child_model=None, db_model=None, kg=None):
+        self.turns = turns
+        self.workers = workers
+        self.seed = seed
+        self.save = save
+        # default models: the ones of config/app_config.yaml
+        self.therapist_model = therapist_model or settings.models.therapist
+        self.child_model = child_model or settings.models.child
+        self.db_model = db_model or settings.models.database
+        # one graph for all the conversations (its driver pool is shared by the threads)
+        self.kg = kg if kg is not None else make_knowledge_graph()
+
+        random.seed(seed)  # make_childs uses the global generator
+        self.children = make_childs(num_children)
+        if personalities:
+            rng = random.Random(seed)
+            self.children = [(name, surname, sex, birth, rng.choice(personalities)) for name, surname, sex, birth, _ in self.children]
+        self._write_lock = threading.Lock()
+
+    def child_data(self, name, surname, sex, birth):
+        # same data of the server (new child, or the profile and the preference summary of a known one)
+        known = self.kg.get_child(name=name, surname=surname, birth_date=birth, preferences=False)
+        if not known:
+            return {"child_name": name, "child_surname": surname, "child_birth": birth, "child_gender": sex,
+                    "child_nation": "", "child_likes": "", "child_dislikes": "", "previous_activity": ""}
+        child = known[0]
+        preferences = self.kg.get_preference_summary(name=name, surname=surname, birth_date=birth)
+        return {"child_name": child["Name"], "child_surname": child["Surname"], "child_birth": child["Birth"],
+                "child_gender": child.get("Gender"), "child_nation": child.get("Nation"),
+                "child_likes": preferences["LIKES"], "child_dislikes": preferences["DISLIKES"],
+                "previous_activity": child.get("last_activity")}
+
+    def run_conversation(self, index):
+        # one session: 'turns' therapist/child exchanges, then the DatabaseLLM extraction (saved in the graph)
+        session_id = f"simulation-{self.seed}-{index}"
+        with usage_session(session_id):
+            record = self._run_conversation(index)
+        record["usage"] = usage.session(session_id)  # requests, tokens and cost, by stage and by model
+        usage.drop(session_id)
+        return record
+
+    def _run_conversation(self, index):
+        start = time.perf_counter()
+        rng = random.Random(self.seed * 1000003 + index)  # same child and score when a run is resumed
+        name, surname, sex, birth, personality = self.children[rng.randrange(len(self.children))]
+        data = self.child_data(name, surname, sex, birth)
+
+        therapist = TherapistLLM(model_name=self.therapist_model)
+        therapist.load_data(data)
+        child_llm = ChildLLM(model_name=self.child_model)
+        data['personality'] = personality
+        for _ in range(self.turns):
+            therapist.speak()
+            therapist.add_child_response(child_llm.respond(data, therapist.session_history))
+
+        score = rng.uniform(0, 1)
+        db_response = None
+        if self.save:
+            conversation = ('[CHILD INFO]:\n' + "name: " + name + "\nsurname: " + surname + "\nbirth: " + birth + "\n"
+                            + "[CONVERSATION]:" + therapist.session_history)
+            db_llm = DatabaseLLM(api_key=groq_api_key, model_name=self.db_model, kg=self.kg)
+            db_llm.save_info(conversation=conversation, score=score)
+            db_response = db_llm.last_response
+
+        return {"conversation": index, "seed": self.seed,
+                "child": {"name": name, "surname": surname, "sex": sex, "birth": birth, "personality": personality},
+                "turns": self.turns, "history": therapist.session_history, "db_response": db_response, "score": score,
+                "seconds": round(time.perf_counter() - start, 2)}
+
+    @staticmethod
+    def completed(path):
+        # indices of the conversations already in the output file (a truncated last line is ignored)
+        done = set()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)["conversation"])
+                    except (ValueError, KeyError):
+                        continue
+        return done
+
+    def run(self, num_conversations, out_path):
+        """Run the conversations not yet in 'out_path' on 'workers' threads, appending each one as soon as it ends.
+        Outputs:
+            summary (dict): completed/failed conversations, conversations per minute and tokens per second.
+        """
+
+        done = self.completed(out_path)
+        todo = [i for i in range(num_conversations) if i not in done]
+        print(f"{len(done)} conversations already in {out_path}, {len(todo)} to run on {self.workers} workers")
+        start = time.perf_counter()
+        tokens_start = usage.summary()["total_tokens"]
+        completed = failed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, open(out_path, "a", encoding="utf-8") as out:
+            futures = {executor.submit(self.run_conversation, i): i for i in todo}
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"  conversation {futures[future]} failed: {e}")
+                    continue
+                with self._write_lock:
+                    out.write(json.dumps(record, default=str) + "\n")
+                    out.flush()
+                completed += 1
+                elapsed = time.perf_counter() - start
+                tokens = usage.summary()["total_tokens"] - tokens_start
+                print(f"  [{completed + failed}/{len(todo)}] conversation {record['conversation']} in {record['seconds']}s "
+                      f"({completed / elapsed * 60:.2f} conversations/min, {tokens / elapsed:.1f} tokens/s)")
+
+        elapsed = time.perf_counter() - start
+        tokens = usage.summary()["total_tokens"] - tokens_start
+        return {"completed": completed, "failed": failed, "seconds": round(elapsed, 1),
+                "conversations_per_min": round(completed / elapsed * 60, 2) if elapsed else 0.0,
+                "tokens_per_s": round(tokens / elapsed, 1) if elapsed else 0.0, "tokens": tokens}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parallel simulation of therapy sessions with the ChildLLM.")
+    parser.add_argument('-conversations', type=int, default=100, help='Number of conversations.')
+    parser.add_argument('-children', type=int, default=50, help='Number of simulated children (ChildLLM.make_childs).')
+    parser.add_argument('-personalities', type=str, default=None, help='Comma separated personality traits of the children (default: the ChildLLM ones).')
+    parser.add_argument('-turns', type=int, default=8, help='Therapist/child turns per conversation.')
+    parser.add_argument('-workers', type=int, default=4, help='Conversations run at the same time.')
+    parser.add_argument('-rpm', type=int, default=30, help='Global budget of API requests per minute (0: no limit).')
+    parser.add_argument('-tpm', type=int, default=0, help='Global budget of API tokens per minute (0: no limit).')
+    parser.add_argument('-seed', type=int, default=0, help='Seed of the children and of the conversations.')
+    parser.add_argument('-no_save', action='store_true', help='Do not run the DatabaseLLM (nothing is written in the graph).')
+    parser.add_argument('-out', type=str, default='simulations.jsonl', help='JSONL output (also used to resume a run).')
+    args = parser.parse_args()
+
+    set_rate_limiter(RateLimiter(requests_per_minute=args.rpm or None, tokens_per_minute=args.tpm or None))
+    runner = SimulationRunner(num_children=args.children, turns=args.turns, workers=args.workers, seed=args.seed,
+                              personalities=args.personalities.split(',') if args.personalities else None,
+                              save=not args.no_save)
+    try:
+        print(runner.run(args.conversations, args.out))
+    finally:
+        runner.kg.close()
@@ -0,0 +1,248 @@
+import os
+import abc
+import datetime
+import contextlib
+
+# Check the operating system, it is used for the import modules
+if os.name == 'nt':  # 'nt' stands for Windows
+    from neo4j_db.config import NODES, ACTIVITIES, PREFERENCE_TOP_K, PREFERENCE_HALF_LIFE_DAYS
+    from neo4j_db.profile_cache import ChildProfileCache
+elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
+    from config import NODES, ACTIVITIES, PREFERENCE_TOP_K, PREFERENCE_HALF_LIFE_DAYS
+    from profile_cache import ChildProfileCache
+
+
+def preference_strength(relation, score):
+    # how much the child liked (LIKES) or disliked (DISLIKES) the activity, in [0, 1] (0.5 without a score)
+    try:
+        score = float(score)
+    except (TypeError, ValueError):
+        return 0.5
+    return score if relation == 'LIKES' else 1 - score
+
+
+def summarize_preferences(activities, top_k, half_life_days, now=None):
+    """Aggregate the activities of a child ({relation, genre, summary, class, score, date}) as the Neo4j summary query:
+    one weight per (relation, class, genre, summary), sum of the strengths halved every 'half_life_days', and the
+    'top_k' heaviest per (relation, class).
+    Outputs:
+        rows (list[dict]): {relation, class, top: [{genre, summary, weight, times}]}
+    """
+
+    now = now or datetime.datetime.now()
+    weights = {}
+    for act in activities:
+        age_s = (now - act["date"]).total_seconds() if act.get("date") else 0
+        key = (act["relation"], act.get("class") or 'Other', act["genre"], act["summary"])
+        weight, times = weights.get(key, (0.0, 0))
+        weights[key] = (weight + preference_strength(act["relation"], act.get("score")) * 0.5 ** (age_s / (half_life_days * 86400.0)),
+                        times + 1)
+    groups = {}
+    for (relation, activity_class, genre, summary), (weight, times) in weights.items():
+        groups.setdefault((relation, activity_class), []).append({"genre": genre, "summary": summary, "weight": weight, "times": times})
+    return [{"relation": relation, "class": activity_class,
+             "top": sorted(top, key=lambda entry: entry["weight"], reverse=True)[:top_k]}
+            for (relation, activity_class), top in groups.items()]
+
+
+def format_preference_summary(rows, top_k):
+    # {"LIKES": {class: [{genre, summary, weight, times}, ...]}, "DISLIKES": {...}} with at most top_k entries per class
+    # (the rows of several matching children are merged)
+    summary = {"LIKES": {}, "DISLIKES": {}}
+    for row in rows:
+        summary[row["relation"]].setdefault(row["class"], []).extend(row["top"])
+    for relation in summary:
+        for activity_class, top in summary[relation].items():
+            top = sorted(top, key=lambda entry: entry["weight"], reverse=True)[:top_k]
+            summary[relation][activity_class] = [dict(entry, weight=round(entry["weight"], 3)) for entry in top]
+    return summary
+
+
+class GraphBackend(abc.ABC):
+    """Storage interface of the knowledge graph used by the server, DatabaseLLM and the simulations.
+    KnowledgeGraph (database.py) implements it on Neo4j, MemoryKnowledgeGraph (memory_graph.py) in process.
+    Use make_knowledge_graph (database.py) to get the backend selected in config/db_config.yaml.
+
+    The writes are collected by a GraphUnitOfWork and applied by the backend in apply_writes, so every backend
+    shares the same validation of the data extracted from the conversations. The abstract methods are the ones a
+    backend must implement (a backend missing one cannot be created).
+    """
+
+    def __init__(self):
+        self.nodes_properties = NODES
+        self.activities = ACTIVITIES
+
+    # ----- reads -----
+    @abc.abstractmethod
+    def get_child(self, name=None, surname=None, birth_date=None, last_activity_limit=3, use_cache=True, preferences=True):
+        # matching children (all of them without filters) as dictionaries with their properties,
+        # 'LIKES'/'DISLIKES' lists of {genre, summary, class} (not with preferences=False: the profile only, whose
+        # size does not grow with the history of the child) and, if any, 'last_activity'
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_child_preferences(self, name=None, surname=None, birth_date=None):
+        # {"LIKES": [...], "DISLIKES": [...]} of the matching children
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_last_activity(self, name=None, surname=None, birth_date=None, limit=3):
+        # {"last_activity": [{activity_genre, activity_summary}, ...]} or None
+        raise NotImplementedError
+
+    def get_preference_summary(self, name=None, surname=None, birth_date=None, top_k=None, half_life_days=None, use_cache=True):
+        """Bounded summary of the preferences of the matching children, for the prompts: for each relation and activity
+        class the 'top_k' activities by weight (score, halved every 'half_life_days' since the session), aggregated by
+        the backend instead of returning every LIKES/DISLIKES edge. See format_preference_summary for the format.
+        """
+
+        top_k = top_k or PREFERENCE_TOP_K
+        half_life_days = half_life_days or PREFERENCE_HALF_LIFE_DAYS
+        cache_key = ChildProfileCache.make_key(name, surname, birth_date, "preference_summary", top_k, half_life_days)
+        if use_cache:
+            cached = self.profile_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        summary = format_preference_summary(self._preference_rows(name, surname, birth_date, top_k, half_life_days), top_k)
+        if use_cache:
+            self.profile_cache.put(cache_key, summary)
+        return summary
+
+    @abc.abstractmethod
+    def _preference_rows(self, name, surname, birth_date, top_k, half_life_days):
+        # rows of summarize_preferences for all the matching children
+        raise NotImplementedError
+
+    # ----- writes -----
+    @abc.abstractmethod
+    def apply_writes(self, children, activities):
+        # applies atomically the writes collected by a GraphUnitOfWork
+        raise NotImplementedError
+
+    def unit_of_work(self):
+        # collects writes and applies them at once (see GraphUnitOfWork)
+        return GraphUnitOfWork(self)
+
+    def add_child_node(self, params):
+        # adds a child node with params (if it does not already exist)
+        print(" - adding node:", params)
+        with self.unit_of_work() as uow:
+            uow.add_child_node(params)
+
+    def add_activity(self, childID = None, name = None, surname = None, birthdate = None, genre = None, summary = None, score = None, activityClass = None):
+        # adds an activity and builds the relationships with the child and the activity class
+        print(f"    -Adding activity: childID={childID}, name={name}, surname={surname}, birthdate={birthdate}, genre={genre}, summary={summary}, score={score}, activityClass={activityClass}")
+        with self.unit_of_work() as uow:
+            uow.add_activity(childID=childID, name=name, surname=surname, birthdate=birthdate,
+                             genre=genre, summary=summary, score=score, activityClass=activityClass)
+
+    # ----- bulk import/export (see graph_io.py) -----
+    @abc.abstractmethod
+    def iter_profiles(self, batch_size=1000):
+        # streams every child as {"child": properties, "activities": [{relation, genre, summary, class, score, date}]}
+        raise NotImplementedError
+
+    def import_profiles(self, profiles):
+        # writes a batch of profiles (same format of iter_profiles) at once: missing children are created and the
+        # activities keep their score and date. Returns the number of written activities
+        children, activities = [], []
+        for profile in profiles:
+            child = {k: v for k, v in profile["child"].items() if v is not None}
+            children.append(child)
+            for act in profile.get("activities", []):
+                activity_class = act.get("class")
+                activities.append({
+                    "child_id": child.get("Id") if not (child.get("Name") and child.get("Surname")) else None,
+                    "name": child.get("Name"),
+                    "surname": child.get("Surname"),
+                    "birth": child.get("Birth"),
+                    "genre": act["genre"],
+                    "summary": act["summary"],
+                    "relation": act["relation"],
+                    "score": act.get("score", ''),
+                    "date": act["date"],
+                    "class_id": self.activities.index(activity_class) if activity_class in self.activities else -1,
+                })
+        self.apply_writes(children, activities)
+        return len(activities)
+
+    def bulk(self):
+        # context of a bulk operation (many batches): for Neo4j all of them reuse one session
+        return self.session()
+
+    # ----- utils -----
+    def has_all_keys_with_values(self, d, keys):
+        # checks if the dictionary has all keys of the keys list
+        return all(key in d and d[key] not in (None, '', [], {}, ()) for key in keys)
+
+    @contextlib.contextmanager
+    def session(self):
+        # groups the operations of a logical operation (no-op for the backends without sessions)
+        yield None
+
+    def pool_metrics(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class GraphUnitOfWork:
+    """Collects the writes of one logical operation (e.g. everything DatabaseLLM extracts from a session) and lets
+    the backend apply them at once (for Neo4j: a single write transaction, one UNWIND statement per kind of write).
+    Use it as a context manager (commit on exit) or call commit() explicitly.
+    """
+
+    def __init__(self, kg):
+        self.kg = kg
+        self.children = []
+        self.activities = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def add_child_node(self, params):
+        # the child is created at commit if no child with the same Name, Surname (and Birth, if given) exists
+        self.children.append({k: v for k, v in params.items() if v is not None})
+
+    def add_activity(self, childID = None, name = None, surname = None, birthdate = None, genre = None, summary = None, score = None, activityClass = None):
+        # activity detail + SUBCLASS_OF its class + LIKES/DISLIKES from the child (matched by Id or by Name, Surname, Birth)
+        if not self.kg.has_all_keys_with_values({"Genre": genre, "Summary": summary}, self.kg.nodes_properties['ActivityDetail']):
+            print("Warning: the provided params for avtivity detail are incomplete")
+            return
+        if childID is None and not (name and surname):
+            print("Warning: the provided params for the child of the activity are incomplete")
+            return
+        if score is None:
+            # no engagement score of the session (e.g. no sensing data): neither LIKES nor DISLIKES can be decided
+            print(f"Warning: no score for the activity {genre}, the preference is not stored")
+            return
+        self.activities.append({
+            "child_id": childID,
+            "name": name,
+            "surname": surname,
+            "birth": birthdate or None,
+            "genre": genre,
+            "summary": summary,
+            "relation": 'LIKES' if score > 0.5 else 'DISLIKES',
+            "score": score if score else '',
+            "date": datetime.datetime.now(),
+            "class_id": self.kg.activities.index(activityClass),  # ValueError for an unknown activity class
+        })
+
+    def is_empty(self):
+        return not self.children and not self.activities
+
+    def commit(self):
+        # applies all the collected writes at once (children first, so the activities can match them)
+        if self.is_empty():
+            return
+        children, activities = self.children, self.activities
+        self.children, self.activities = [], []
+        self.kg.apply_writes(children, activities)
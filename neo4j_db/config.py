@@ -1,16 +1,34 @@
 import os
-import yaml
-# NEO4J VARIABLES
-if os.name == 'nt':  # 'nt' stands for Windows
-    with open("../config/db_config.yaml", "r", encoding="utf-8") as f:
-            neo4j_data = yaml.safe_load(f)
-if os.name == 'posix':  # 'posix' stands for Linux or macOS
-    with open("config/db_config.yaml", "r", encoding="utf-8") as f:
-            neo4j_data = yaml.safe_load(f)
-
-NEO4J_URI = neo4j_data["NEO4J_URI"]
-NEO4J_USERNAME = neo4j_data["NEO4J_USERNAME"]
-NEO4J_PASSWORD = neo4j_data["NEO4J_PASSWORD"]
+import sys
+# config/settings.py, the same import on every OS ('config' is also the name of neo4j_db/config.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
+
+# NEO4J VARIABLES (config/db_config.yaml, section 'database' of config/settings.py: checked, and overridden by
+# ADAM_DATABASE_<KEY> or '-set database.<key>=...')
+database = settings.database
+
+NEO4J_URI = database.neo4j_uri
+NEO4J_USERNAME = database.neo4j_username
+NEO4J_PASSWORD = database.neo4j_password
+
+# KNOWLEDGE GRAPH BACKEND: 'neo4j' or 'memory' (in process, optionally saved to GRAPH_SNAPSHOT_PATH)
+GRAPH_BACKEND = database.graph_backend  # the GRAPH_BACKEND variable wins over the file (benchmarks)
+GRAPH_SNAPSHOT_PATH = database.graph_snapshot_path
+
+# DRIVER POOL
+NEO4J_MAX_CONNECTION_POOL_SIZE = database.neo4j_max_connection_pool_size
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = database.neo4j_connection_acquisition_timeout  # seconds
+NEO4J_MAX_TRANSACTION_RETRY_TIME = database.neo4j_max_transaction_retry_time  # seconds
+
+# CHILD PROFILE CACHE
+PROFILE_CACHE_SIZE = database.profile_cache_size  # entries
+PROFILE_CACHE_TTL = database.profile_cache_ttl  # seconds
+
+# PREFERENCE SUMMARY (KnowledgeGraph.get_preference_summary)
+PREFERENCE_TOP_K = database.preference_top_k  # activities per class and relation
+PREFERENCE_HALF_LIFE_DAYS = database.preference_half_life_days  # weight of an activity halves every N days
+PREFERENCE_MATERIALIZE = database.preference_materialize
 
 # DATABASE DATA
 NODES = {
@@ -19,6 +37,14 @@ NODES = {
     "ActivityDetail": ["Genre", "Summary"]
 }
 
+# Identity properties of the nodes: create_node merges on them (the other properties are set), so that the
+# query text only depends on the label and can be reused from the Neo4j plan cache
+NODE_KEYS = {
+    "Child": ["Name", "Surname", "Birth"],
+    "Activity": ["Id"],
+    "ActivityDetail": ["Genre", "Summary"]
+}
+
 RELATIONSHIPS = [
     {"type": "LIKES", "from": "Child", "to": "ActivityDetail", "properties": ["score", "date"]},
     {"type": "DISLIKES", "from": "Child", "to": "ActivityDetail", "properties": ["score", "date"]},
@@ -26,3 +52,16 @@ RELATIONSHIPS = [
 ]
 
 ACTIVITIES = ["Storytelling", "Music", "Conversation"]
+
+# SCHEMA: indexes and constraints created at startup by KnowledgeGraph.migrate_schema.
+# The statements are idempotent, change SCHEMA_VERSION when adding one so that it is applied to the existing graphs.
+# Version 2: Id of the Activity nodes made by the first versions (only a name), see KnowledgeGraph.migrate_activity_ids
+SCHEMA_VERSION = 2
+SCHEMA = [
+    # (kind, name, statement)
+    ("INDEX", "child_name", "CREATE INDEX child_name IF NOT EXISTS FOR (c:Child) ON (c.Name)"),
+    ("INDEX", "child_name_surname_birth", "CREATE INDEX child_name_surname_birth IF NOT EXISTS FOR (c:Child) ON (c.Name, c.Surname, c.Birth)"),
+    ("CONSTRAINT", "child_id_unique", "CREATE CONSTRAINT child_id_unique IF NOT EXISTS FOR (c:Child) REQUIRE c.Id IS UNIQUE"),
+    ("CONSTRAINT", "activity_id_unique", "CREATE CONSTRAINT activity_id_unique IF NOT EXISTS FOR (a:Activity) REQUIRE a.Id IS UNIQUE"),
+    ("INDEX", "activity_detail_genre_summary", "CREATE INDEX activity_detail_genre_summary IF NOT EXISTS FOR (ad:ActivityDetail) ON (ad.Genre, ad.Summary)"),
+]
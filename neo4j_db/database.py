@@ -3,6 +3,11 @@ sys.path.insert(0, './audio')
 sys.path.insert(0, './neo4j_db')
 
 import os
+import json
+import time
+import hashlib
+import threading
+import contextlib
 from neo4j import GraphDatabase
 import datetime
 from neo4j.time import Date
@@ -10,31 +15,225 @@ from neo4j.time import Date
 
 # Check the operating system, it is used for the import modules
 if os.name == 'nt':  # 'nt' stands for Windows
-    from neo4j_db.config import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, NODES, RELATIONSHIPS, ACTIVITIES
+    from neo4j_db.config import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, NODES, NODE_KEYS, RELATIONSHIPS, ACTIVITIES, SCHEMA, SCHEMA_VERSION
+    from neo4j_db.config import NEO4J_MAX_CONNECTION_POOL_SIZE, NEO4J_CONNECTION_ACQUISITION_TIMEOUT, NEO4J_MAX_TRANSACTION_RETRY_TIME
+    from neo4j_db.config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+    from neo4j_db.profile_cache import ChildProfileCache
+    from neo4j_db.backend import GraphBackend, GraphUnitOfWork
+    from neo4j_db.memory_graph import MemoryKnowledgeGraph
+    from neo4j_db.config import GRAPH_BACKEND, PREFERENCE_TOP_K, PREFERENCE_HALF_LIFE_DAYS, PREFERENCE_MATERIALIZE
 elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
-    from config import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, NODES, RELATIONSHIPS, ACTIVITIES
-
-class KnowledgeGraph:
-    def __init__(self):
-        self.URI = NEO4J_URI
-        self.USER = NEO4J_USERNAME
-        self.PASSWORD = NEO4J_PASSWORD
-        self.nodes_properties = NODES
-        self.activities = ACTIVITIES
+    from config import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, NODES, NODE_KEYS, RELATIONSHIPS, ACTIVITIES, SCHEMA, SCHEMA_VERSION
+    from config import NEO4J_MAX_CONNECTION_POOL_SIZE, NEO4J_CONNECTION_ACQUISITION_TIMEOUT, NEO4J_MAX_TRANSACTION_RETRY_TIME
+    from config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+    from profile_cache import ChildProfileCache
+    from backend import GraphBackend, GraphUnitOfWork
+    from memory_graph import MemoryKnowledgeGraph
+    from config import GRAPH_BACKEND, PREFERENCE_TOP_K, PREFERENCE_HALF_LIFE_DAYS, PREFERENCE_MATERIALIZE
+
+# Shared by all the KnowledgeGraph instances of the process, so that a write made through one of them
+# (e.g. DatabaseLLM.kg) invalidates the profiles read through the others (e.g. the server kg)
+PROFILE_CACHE = ChildProfileCache(max_size=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+
+
+class KnowledgeGraph(GraphBackend):
+    # children are created only if no child with the same Name, Surname (and Birth, if given) exists
+    CHILDREN_QUERY = """
+    UNWIND $children AS child
+    CALL {
+        WITH child
+        OPTIONAL MATCH (c:Child {Name: child.Name, Surname: child.Surname})
+        WHERE child.Birth IS NULL OR c.Birth = child.Birth
+        WITH child, count(c) AS existing
+        WHERE existing = 0
+        CREATE (n:Child)
+        SET n = child
+    }
+    """
+
+    # activity detail + SUBCLASS_OF its class + LIKES/DISLIKES from the child (matched by Id or by Name, Surname, Birth)
+    ACTIVITIES_QUERY = """
+    UNWIND $activities AS act
+    MERGE (ad:ActivityDetail {Genre: act.genre, Summary: act.summary})
+    WITH ad, act
+    OPTIONAL MATCH (a:Activity {Id: act.class_id})
+    FOREACH (_ IN CASE WHEN a IS NULL THEN [] ELSE [1] END | MERGE (ad)-[:SUBCLASS_OF]->(a))
+    WITH DISTINCT ad, act
+    CALL {
+        WITH act
+        MATCH (c:Child {Id: act.child_id})
+        RETURN c
+        UNION
+        WITH act
+        MATCH (c:Child {Name: act.name, Surname: act.surname})
+        WHERE act.child_id IS NULL AND (act.birth IS NULL OR c.Birth = act.birth)
+        RETURN c
+    }
+    FOREACH (_ IN CASE WHEN act.relation = 'LIKES' THEN [1] ELSE [] END |
+        MERGE (c)-[:LIKES {score: act.score, date: act.date}]->(ad))
+    FOREACH (_ IN CASE WHEN act.relation = 'DISLIKES' THEN [1] ELSE [] END |
+        MERGE (c)-[:DISLIKES {score: act.score, date: act.date}]->(ad))
+    """
+
+    # preference summary of the child 'c' (see summarize_preferences in backend.py), skipped when 'fresh' (materialized)
+    PREFERENCE_SUMMARY_SUBQUERY = """
+    CALL {
+        WITH c, fresh
+        MATCH (c)-[r:LIKES|DISLIKES]->(ad:ActivityDetail)
+        WHERE NOT fresh
+        OPTIONAL MATCH (ad)-[:SUBCLASS_OF]->(a:Activity)
+        WITH type(r) AS relation, coalesce(a.name, 'Other') AS activity_class, ad, r,
+             CASE WHEN toFloat(r.score) IS NULL THEN 0.5
+                  WHEN type(r) = 'LIKES' THEN toFloat(r.score)
+                  ELSE 1 - toFloat(r.score) END AS strength
+        WITH relation, activity_class, ad,
+             sum(strength * 0.5 ^ (duration.inSeconds(coalesce(r.date, localdatetime()), localdatetime()).seconds / ($half_life_days * 86400.0))) AS weight,
+             count(r) AS times
+        ORDER BY weight DESC
+        WITH relation, activity_class, collect({genre: ad.Genre, summary: ad.Summary, weight: weight, times: times})[..$top_k] AS top
+        RETURN collect({relation: relation, class: activity_class, top: top}) AS summary
+    }
+    """
+
+    # summaries of the children written by ACTIVITIES_QUERY, stored on the node when PREFERENCE_MATERIALIZE is set.
+    # The decay multiplies all the weights of a child by the same factor, so the stored ranking stays valid
+    MATERIALIZE_QUERY = """
+    UNWIND $activities AS act
+    CALL {
+        WITH act
+        MATCH (c:Child {Id: act.child_id})
+        RETURN c
+        UNION
+        WITH act
+        MATCH (c:Child {Name: act.name, Surname: act.surname})
+        WHERE act.child_id IS NULL AND (act.birth IS NULL OR c.Birth = act.birth)
+        RETURN c
+    }
+    WITH DISTINCT c, false AS fresh
+    """ + PREFERENCE_SUMMARY_SUBQUERY + """
+    RETURN elementId(c) AS node, summary
+    """
+
+    def __init__(self, uri=None, user=None, password=None):
+        super().__init__()
+        # the connection details default to the ones in config/db_config.yaml
+        self.URI = uri or NEO4J_URI
+        self.USER = user or NEO4J_USERNAME
+        self.PASSWORD = password or NEO4J_PASSWORD
         self.check()
 
-        self.driver = GraphDatabase.driver(self.URI, auth=(self.USER, self.PASSWORD))
-        self.check_connection()
-
-        self.add_activity_updates() # just in case we added a new activity in the config.py
+        # the pool is shared by all the threads (Flask requests), each logical operation borrows one session
+        self.pool_size = NEO4J_MAX_CONNECTION_POOL_SIZE
+        self.acquisition_timeout = NEO4J_CONNECTION_ACQUISITION_TIMEOUT
+        self.driver = GraphDatabase.driver(self.URI, auth=(self.USER, self.PASSWORD),
+                                           max_connection_pool_size=self.pool_size,
+                                           connection_acquisition_timeout=self.acquisition_timeout,
+                                           max_transaction_retry_time=NEO4J_MAX_TRANSACTION_RETRY_TIME)
+        self._local = threading.local()  # session of the logical operation running in the current thread
+        self.profile_cache = PROFILE_CACHE
+        self._metrics_lock = threading.Lock()
+        # counters of the logical operations (driver sessions, see session()) and of their transactions; the state of
+        # the connection pool itself is read from the driver by pool_metrics
+        self._metrics = {"operations": 0, "operations_in_progress": 0, "peak_operations_in_progress": 0,
+                         "reads": 0, "writes": 0, "auto_commit": 0, "retries": 0, "failures": 0,
+                         "query_time_s": 0.0, "borrow_time_s": 0.0, "max_borrow_time_s": 0.0}
+        self._query_texts = {}  # memoized query texts of create_node / create_relationship
+        self.bootstrap()
+
+    def catalog_version(self):
+        # version of the activity catalog of config.py (changes when an activity is added, removed or moved)
+        return hashlib.sha1("|".join(self.activities).encode("utf-8")).hexdigest()[:12]
+
+    def bootstrap(self):
+        # checks the connection and reads the schema and catalog versions in a single round-trip, then migrates
+        # the schema and updates the activity catalog only if they changed (usually nothing else is run)
+        try:
+            state = self.read("""
+            OPTIONAL MATCH (m:SchemaMigration)
+            WITH max(m.version) AS schema_version
+            OPTIONAL MATCH (c:Catalog {name: 'activities'})
+            RETURN schema_version, c.version AS catalog_version
+            """)[0]
+            print("Connection OK")
+        except Exception as e:
+            print("Connection failed:", e)
+            return
+        self.migrate_schema(current=state["schema_version"] or 0) # indexes and constraints
+        if state["catalog_version"] != self.catalog_version():
+            self.add_activity_updates() # just in case we added a new activity in the config.py
+
+    def get_schema_version(self):
+        # version of the schema applied to the graph (0 if no migration was ever applied)
+        result = self.run_query("MATCH (m:SchemaMigration) RETURN max(m.version) AS version")
+        return (result[0]["version"] if result else None) or 0
+
+    def migrate_schema(self, force=False, current=None):
+        # creates the indexes and constraints of config.py SCHEMA if the graph has an older schema version.
+        # Every statement is idempotent (IF NOT EXISTS), the version is recorded only if all of them succeeded
+        if current is None:
+            current = self.get_schema_version()
+        if current >= SCHEMA_VERSION and not force:
+            return current
+        print(f"Migrating the graph schema from version {current} to {SCHEMA_VERSION}")
+        failed = False
+        for kind, name, statement in SCHEMA:
+            try:
+                self.run_query(statement, raise_errors=True)
+            except Exception as e:
+                print(f"  - {kind.lower()} {name} failed: {e}")
+                failed = True
+        if current < 2:
+            try:
+                self.migrate_activity_ids()
+            except Exception as e:
+                print(f"  - activity ids failed: {e}")
+                failed = True
+        if failed:
+            return current
+        self.run_query("CREATE (m:SchemaMigration {version: $version, applied_at: datetime()})", {"version": SCHEMA_VERSION})
+        return SCHEMA_VERSION
+
+    def migrate_activity_ids(self):
+        # the first versions made the Activity nodes by name only: add_activity_updates merges them by Id and would
+        # make a second node per class. The Id of the catalog is set on one existing node per name, then the other
+        # nodes without Id of that name (e.g. made by a version of the code in between) are merged into it
+        activities = [{"Id": i, "name": elem} for i, elem in enumerate(self.activities)]
+        self.write("""
+        UNWIND $activities AS activity
+        MATCH (a:Activity {name: activity.name})
+        WHERE a.Id IS NULL AND NOT EXISTS { MATCH (:Activity {Id: activity.Id}) }
+        WITH activity, head(collect(a)) AS a
+        SET a.Id = activity.Id
+        """, {"activities": activities})
+        self.write("""
+        UNWIND $activities AS activity
+        MATCH (current:Activity {Id: activity.Id})
+        MATCH (old:Activity {name: activity.name})
+        WHERE old.Id IS NULL
+        CALL {
+            WITH old, current
+            MATCH (ad:ActivityDetail)-[r:SUBCLASS_OF]->(old)
+            MERGE (ad)-[:SUBCLASS_OF]->(current)
+            DELETE r
+        }
+        DETACH DELETE old
+        """, {"activities": activities})
 
     def add_activity_updates(self):
-        # adds the nodes in self.activities if they do not already exist
-        for elem in self.activities:
-            self.run_query(f'MERGE (a:Activity {{name: "{elem}"}})')
+        # adds (or renames) the Activity nodes of self.activities, the id is the position in the list, with a single
+        # parameterized statement, and records the catalog version so that the next startups skip it
+        self.write("""
+        UNWIND $activities AS activity
+        MERGE (a:Activity {Id: activity.Id})
+        SET a.name = activity.name
+        WITH count(a) AS updated
+        MERGE (c:Catalog {name: 'activities'})
+        SET c.version = $version, c.updated_at = datetime()
+        """, {"activities": [{"Id": i, "name": elem} for i, elem in enumerate(self.activities)],
+              "version": self.catalog_version()})
 
     def get_last_activity(self, name=None, surname=None, birth_date=None, limit = 3):
-        query = f"""
+        query = """
         MATCH (c:Child)-[r]->(ad:ActivityDetail)
         WHERE ($name IS NULL OR c.Name = $name)
           AND ($surname IS NULL OR c.Surname = $surname)
@@ -44,54 +243,83 @@ class KnowledgeGraph:
                ad.Genre AS activity_genre,
                ad.Summary AS activity_summary
         ORDER BY r.date DESC
-        LIMIT {limit}
+        LIMIT $limit
         """
         params = {
             "name": name,
             "surname": surname,
-            "birth_date": birth_date
+            "birth_date": birth_date,
+            "limit": limit
         }
 
-        results = self.run_query(query, params or {})
+        results = self.read(query, params or {})
         return {"last_activity": results} if results else None
 
-    def get_child(self, name=None, surname=None, birth_date=None):
+    def get_child(self, name=None, surname=None, birth_date=None, last_activity_limit=3, use_cache=True, preferences=True):
+        # returns the matching children (all of them if no filter is given) with their LIKES/DISLIKES (not with
+        # preferences=False) and last activities, everything in a single round-trip (one subquery per child).
+        # The result is served from the profile cache when possible (invalidated by the write paths)
+        cache_key = ChildProfileCache.make_key(name, surname, birth_date, last_activity_limit, preferences)
+        if use_cache:
+            cached = self.profile_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        child_info = self._get_child(name, surname, birth_date, last_activity_limit, preferences)
+        if use_cache:
+            self.profile_cache.put(cache_key, child_info)
+        return child_info
+
+    def _get_child(self, name, surname, birth_date, last_activity_limit, preferences=True):
         if not name and not surname and not birth_date:
             # No filters — return all children
-            query = """
-            MATCH (c:Child)
-            RETURN properties(c) AS child
-            """
-            params = {}
-        else:
-            # Apply filters conditionally
-            query = """
-            MATCH (c:Child)
-            WHERE ($name IS NULL OR c.Name = $name)
-              AND ($surname IS NULL OR c.Surname = $surname)
-              AND ($birth_date IS NULL OR c.Birth = $birth_date)
-            RETURN properties(c) AS child
-            """
-            params = {
-                "name": name,
-                "surname": surname,
-                "birth_date": birth_date
-            }
+            name = surname = birth_date = None
+        params = {
+            "name": name,
+            "surname": surname,
+            "birth_date": birth_date,
+            "limit": last_activity_limit
+        }
+
+        # Only the given filters are put in the WHERE clause (a "$x IS NULL OR ..." predicate cannot use the indexes)
+        filters = [f"c.{prop} = ${key}" for prop, key in (("Name", "name"), ("Surname", "surname"), ("Birth", "birth_date"))
+                   if params[key] is not None]
+        where = ("WHERE " + " AND ".join(filters)) if filters else ""
+
+        # every LIKES/DISLIKES edge of the child, only if requested (the prompts use get_preference_summary)
+        preferences_call = """
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[r:LIKES|DISLIKES]->(ad:ActivityDetail)-[:SUBCLASS_OF]->(a:Activity)
+            RETURN collect(CASE WHEN type(r) = 'LIKES' THEN {genre: ad.Genre, summary: ad.Summary, class: a.name} END) AS likes,
+                   collect(CASE WHEN type(r) = 'DISLIKES' THEN {genre: ad.Genre, summary: ad.Summary, class: a.name} END) AS dislikes
+        }
+        """ if preferences else ""
+
+        query = """
+        MATCH (c:Child)
+        """ + where + preferences_call + """
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[r:LIKES|DISLIKES]->(ad:ActivityDetail)
+            WITH r, ad
+            ORDER BY r.date DESC
+            LIMIT $limit
+            RETURN collect(CASE WHEN ad IS NOT NULL THEN {activity_genre: ad.Genre, activity_summary: ad.Summary} END) AS last_activity
+        }
+        RETURN properties(c) AS child, last_activity""" + (", likes, dislikes" if preferences else "")
 
-        results = self.run_query(query, params or {})
+        results = self.read(query, params)
 
         child_info = []
         for record in results:
-            name = record['child']["Name"]
-            surname = record["child"]["Surname"]
-            birth = record["child"]["Birth"]
-            child_preferences = self.get_child_preferences(name=name, surname=surname, birth_date=birth)
-            last_activity = self.get_last_activity(name=name, surname=surname, birth_date=birth)
-            if child_preferences:
-                record['child'].update(child_preferences)
-            if last_activity:
-                record['child'].update(last_activity)
-            child_info.append(record["child"])
+            child = record["child"]
+            if preferences:
+                child["LIKES"] = record["likes"]
+                child["DISLIKES"] = record["dislikes"]
+            if record["last_activity"]:
+                child["last_activity"] = record["last_activity"]
+            child_info.append(child)
 
         return child_info
 
@@ -113,7 +341,7 @@ class KnowledgeGraph:
             "birth_date": birth_date
         }
 
-        results = self.run_query(query, params or {})
+        results = self.read(query, params or {})
 
         preferences = {"LIKES": [], "DISLIKES": []}
         for record in results:
@@ -128,6 +356,28 @@ class KnowledgeGraph:
 
         return preferences
 
+    def _preference_rows(self, name, surname, birth_date, top_k, half_life_days):
+        # aggregated by Neo4j (one subquery per child), the materialized summary is used when it has the default settings
+        params = {"name": name or None, "surname": surname or None, "birth_date": birth_date or None, "top_k": top_k,
+                  "half_life_days": half_life_days,
+                  "use_materialized": PREFERENCE_MATERIALIZE and top_k == PREFERENCE_TOP_K and half_life_days == PREFERENCE_HALF_LIFE_DAYS}
+        filters = [f"c.{prop} = ${key}" for prop, key in (("Name", "name"), ("Surname", "surname"), ("Birth", "birth_date"))
+                   if params[key] is not None]
+        where = ("WHERE " + " AND ".join(filters)) if filters else ""
+
+        query = """
+        MATCH (c:Child)
+        """ + where + """
+        WITH c, $use_materialized AND c.preference_summary IS NOT NULL AS fresh
+        """ + self.PREFERENCE_SUMMARY_SUBQUERY + """
+        RETURN CASE WHEN fresh THEN c.preference_summary END AS materialized, summary
+        """
+
+        rows = []
+        for record in self.read(query, params):
+            rows += json.loads(record["materialized"]) if record["materialized"] else record["summary"]
+        return rows
+
     def check(self):
         # check if the env variables passed to the class are well defined
         if not self.URI or not self.USER or not self.PASSWORD:
@@ -141,25 +391,136 @@ class KnowledgeGraph:
         except Exception as e:
             print("Connection failed:", e)
 
-    def run_query(self, query, parameters=None):
-        # executes any query passed as string with optional params
+    def _count(self, **increments):
+        with self._metrics_lock:
+            for key, value in increments.items():
+                self._metrics[key] += value
+
+    @contextlib.contextmanager
+    def session(self):
+        # borrows one driver session for a whole logical operation: all the queries run in the current thread
+        # inside the 'with' block (read, write, run_query) reuse it instead of opening a new one each
+        current = getattr(self._local, "session", None)
+        if current is not None:
+            yield current  # nested operation: reuse the outer session
+            return
+        my_session = self.driver.session()  # lazy: the connection is borrowed by each transaction (see _execute)
+        with self._metrics_lock:
+            self._metrics["operations"] += 1
+            self._metrics["operations_in_progress"] += 1
+            self._metrics["peak_operations_in_progress"] = max(self._metrics["peak_operations_in_progress"],
+                                                               self._metrics["operations_in_progress"])
+        self._local.session = my_session
+        try:
+            yield my_session
+        finally:
+            self._local.session = None
+            my_session.close()
+            self._count(operations_in_progress=-1)
+
+    def _execute(self, work, write):
+        # runs work(tx) in a managed transaction: the driver retries it on transient errors (deadlocks,
+        # leader switches, dropped connections) for up to NEO4J_MAX_TRANSACTION_RETRY_TIME seconds
+        attempts = [0]
+        start = time.perf_counter()
+
+        def counted_work(tx):
+            attempts[0] += 1
+            if attempts[0] == 1:
+                # the driver calls the work once a connection was borrowed from the pool and the transaction begun
+                borrow = time.perf_counter() - start
+                with self._metrics_lock:
+                    self._metrics["borrow_time_s"] += borrow
+                    self._metrics["max_borrow_time_s"] = max(self._metrics["max_borrow_time_s"], borrow)
+            return work(tx)
+
+        try:
+            with self.session() as my_session:
+                if write:
+                    return my_session.execute_write(counted_work)
+                return my_session.execute_read(counted_work)
+        except Exception:
+            self._count(failures=1)
+            raise
+        finally:
+            self._count(retries=max(attempts[0] - 1, 0), query_time_s=time.perf_counter() - start,
+                        **{"writes" if write else "reads": 1})
+
+    def execute_read(self, work):
+        # runs work(tx) in a managed read transaction (with retries), returns its result
+        return self._execute(work, write=False)
+
+    def execute_write(self, work):
+        # runs work(tx) in a managed write transaction (with retries), returns its result
+        return self._execute(work, write=True)
+
+    def read(self, query, parameters=None):
+        # read query in a managed transaction, returns the records as dictionaries (raises on failure)
+        return self.execute_read(lambda tx: [record.data() for record in tx.run(query, parameters or {})])
+
+    def write(self, query, parameters=None):
+        # write query in a managed transaction, returns the records as dictionaries (raises on failure)
+        return self.execute_write(lambda tx: [record.data() for record in tx.run(query, parameters or {})])
+
+    def _driver_pool(self):
+        # connections of the driver pool, in use and idle (internals of the neo4j driver: None if they are not there)
+        try:
+            pool = self.driver._pool
+            with pool.lock:
+                addresses = list(pool.connections)
+                total = sum(len(pool.connections[address]) for address in addresses)
+            in_use = sum(pool.in_use_connection_count(address) for address in addresses)
+        except Exception:
+            return None
+        return {"in_use": in_use, "idle": total - in_use}
+
+    def pool_metrics(self):
+        # counters of the operations and transactions (borrow: time from the start of a managed transaction to its
+        # work, i.e. connection taken from the pool + BEGIN), configuration and current state of the driver pool
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        transactions = metrics["reads"] + metrics["writes"]
+        metrics["mean_borrow_time_ms"] = round(metrics["borrow_time_s"] / transactions * 1000, 2) if transactions else 0.0
+        for key in ("query_time_s", "borrow_time_s", "max_borrow_time_s"):
+            metrics[key] = round(metrics[key], 3)
+        metrics["pool"] = {"max_size": self.pool_size, "acquisition_timeout_s": self.acquisition_timeout,
+                           "connections": self._driver_pool()}
+        return metrics
+
+    def run_query(self, query, parameters=None, raise_errors=False):
+        # executes any query passed as string with optional params (auto-commit transaction, needed for the schema
+        # statements). On failure it prints the error and returns an empty list, unless raise_errors is True
         #print("running query", query)
+        start = time.perf_counter()
         try:
-            with self.driver.session() as my_session:
+            with self.session() as my_session:
                 query_result = my_session.run(query, parameters or {})
                 return [record.data() for record in query_result]
         except Exception as e:
+            self._count(failures=1)
+            if raise_errors:
+                raise
             print(f"Query failed: {e}")
-            return None
+            return []
+        finally:
+            self._count(auto_commit=1, query_time_s=time.perf_counter() - start)
 
     def create_node(self, label, properties, verbose=False):
-        # makes a node
-        props = ", ".join(f"{k}: ${k}" for k in properties)
-        query = f"MERGE (n:{label} {{ {props} }}) RETURN n"
+        # makes a node: it is merged on the identity keys of the label (config.py NODE_KEYS) and the other
+        # properties are set, so the query text (and its cached plan) only depends on the label
+        keys = tuple(k for k in NODE_KEYS.get(label, sorted(properties)) if properties.get(k) is not None)
+        text_key = ("node", label, keys)
+        query = self._query_texts.get(text_key)
+        if query is None:
+            props = ", ".join(f"{k}: $key.{k}" for k in keys)
+            query = f"MERGE (n:{label} {{ {props} }}) SET n += $properties RETURN n"
+            self._query_texts[text_key] = query
+        parameters = {"key": {k: properties[k] for k in keys},
+                      "properties": {k: v for k, v in properties.items() if v is not None}}
         if verbose:
             print("- Building node")
             print(" - query:", query)
-        return self.run_query(query, properties)
+        return self.run_query(query, parameters)
 
     def create_relationship(self, start_node_label, start_node_match, end_node_label, end_node_match, relationship_name,
                             relationship_properties, verbose=False):
@@ -178,29 +539,33 @@ class KnowledgeGraph:
         - List of dictionaries containing the result of the query.
         """
 
-        # Helper function to build the WHERE clause for node matching
-        def build_match(alias, match):
-            return " AND ".join([f"{alias}.{k} = ${alias}_{k}" for k in match])
-
-        # Prepare parameters for query, prefixing keys to avoid collisions
-        parameters = {}
-        parameters.update({f"start_{k}": v for k, v in start_node_match.items()})
-        parameters.update({f"end_{k}": v for k, v in end_node_match.items()})
-        parameters.update({f"rel_{k}": v for k, v in (relationship_properties or {}).items()})
-
-        # Prepare relationship properties string if any properties are provided
-        rel_props = ""
-        if relationship_properties:
-            rel_props = " { " + ", ".join([f"{k}: $rel_{k}" for k in relationship_properties]) + " }"
-
-        # Cypher query string with MATCH on both nodes, WHERE clause, and CREATE relationship
-        query = f"""
-        MATCH (start:{start_node_label}), (end:{end_node_label})
-        WHERE {build_match('start', start_node_match)} AND {build_match('end', end_node_match)}
-        MERGE (start)-[r:{relationship_name}{rel_props}]->(end)
-        RETURN type(r)
-        """
+        relationship_properties = relationship_properties or {}
+
+        # The values are passed as three map parameters and the property names are sorted, so the same kind of
+        # relationship always produces the same query text (built once and memoized)
+        text_key = ("relationship", start_node_label, tuple(sorted(start_node_match)), end_node_label,
+                    tuple(sorted(end_node_match)), relationship_name, tuple(sorted(relationship_properties)))
+        query = self._query_texts.get(text_key)
+        if query is None:
+            # Helper function to build the node pattern properties (the MATCH can use the indexes)
+            def build_match(param, match):
+                return ", ".join(f"{k}: ${param}.{k}" for k in sorted(match))
+
+            # Prepare relationship properties string if any properties are provided
+            rel_props = ""
+            if relationship_properties:
+                rel_props = " { " + ", ".join(f"{k}: $rel.{k}" for k in sorted(relationship_properties)) + " }"
+
+            # Cypher query string with MATCH on both nodes and MERGE of the relationship
+            query = f"""
+            MATCH (start:{start_node_label} {{ {build_match('start', start_node_match)} }})
+            MATCH (end:{end_node_label} {{ {build_match('end', end_node_match)} }})
+            MERGE (start)-[r:{relationship_name}{rel_props}]->(end)
+            RETURN type(r)
+            """
+            self._query_texts[text_key] = query
 
+        parameters = {"start": start_node_match, "end": end_node_match, "rel": relationship_properties}
         query_result = self.run_query(query, parameters)
 
         if verbose:
@@ -210,21 +575,34 @@ class KnowledgeGraph:
 
         return query_result
 
-    def has_all_keys_with_values(self, d, keys):
-        # checks if the dictionary has all keys of the keys list
-        return all(key in d and d[key] not in (None, '', [], {}, ()) for key in keys)
+    def apply_writes(self, children, activities):
+        # applies the writes collected by a GraphUnitOfWork in a single write transaction (one round-trip)
+        def work(tx):
+            if children:
+                tx.run(self.CHILDREN_QUERY, {"children": children}).consume()
+            if activities:
+                tx.run(self.ACTIVITIES_QUERY, {"activities": activities}).consume()
+            if activities and PREFERENCE_MATERIALIZE:
+                rows = [{"node": record["node"], "summary": json.dumps(record["summary"])}
+                        for record in tx.run(self.MATERIALIZE_QUERY, {"activities": activities, "top_k": PREFERENCE_TOP_K,
+                                                                      "half_life_days": PREFERENCE_HALF_LIFE_DAYS})]
+                tx.run("""
+                UNWIND $rows AS row
+                MATCH (c:Child) WHERE elementId(c) = row.node
+                SET c.preference_summary = row.summary
+                """, {"rows": rows}).consume()
 
-    def add_child_node(self, params):
-        # adds a child node with params
-        if len(self.get_child(name=params['Name'], surname = params['Surname'], birth_date=params['Birth'])) == 0:
-            print(" - adding node:", params)
-            self.create_node("Child", params)
-        else:
-            print("node child already exist")
-        '''if self.has_all_keys_with_values(params, self.nodes_properties['Child']):
-            self.create_node("Child", params)
-        else:
-            print("Warning: the provided params for child are incomplete")'''
+        try:
+            self.execute_write(work)
+        finally:
+            # the cached profiles of the written children are stale (also if the transaction failed after a retry)
+            for child in children:
+                self.profile_cache.invalidate(child.get("Name"), child.get("Surname"), child.get("Birth"))
+            for act in activities:
+                if act["child_id"] is not None:
+                    self.profile_cache.clear()  # child known only by Id
+                else:
+                    self.profile_cache.invalidate(act["name"], act["surname"], act["birth"])
 
     def add_activity_detail_node(self, params):
         # adds an activityDetail node with params
@@ -269,37 +647,68 @@ class KnowledgeGraph:
             verbose=False
         )
 
-    def add_activity(self, childID = None, name = None, surname = None, birthdate = None, genre = None, summary = None, score = None, activityClass = None):
-        # adds an activity and builds the relationships with the child and the activity class
-        print(f"    -Adding activity: childID={childID}, name={name}, surname={surname}, birthdate={birthdate}, genre={genre}, summary={summary}, score={score}, activityClass={activityClass}")
-        activity_properties = {"Genre": genre, "Summary": summary}
-        self.add_activity_detail_node(activity_properties)
-        self.add_relationship_child_activity_detail(childID=childID,
-                                                    name = name,
-                                                    surname = surname,
-                                                    birthdate = birthdate,
-                                                    activityDetailProperties=activity_properties,
-                                                    score=score,
-                                                    activityNodeName=activityClass)
-
-    def erase_graph(self):
-        # erase all the informations in the graph
-        erase = input("Do you want to erase all the informations stored in the graph? [y/n] ")
-        if erase.lower() == 'y':
-            query = "MATCH (n) DETACH DELETE n"
-            self.run_query(query)
-            self.build_all_activities() # rebuilds activities
+    def iter_profiles(self, batch_size=1000):
+        # streams every child with its activities (see GraphBackend.iter_profiles): the records are fetched
+        # 'batch_size' at a time from a dedicated session, so the graph is never loaded in memory at once
+        query = """
+        MATCH (c:Child)
+        CALL {
+            WITH c
+            OPTIONAL MATCH (c)-[r:LIKES|DISLIKES]->(ad:ActivityDetail)
+            OPTIONAL MATCH (ad)-[:SUBCLASS_OF]->(a:Activity)
+            WITH r, ad, collect(a.name)[0] AS activity_class
+            ORDER BY r.date
+            RETURN collect(CASE WHEN ad IS NOT NULL THEN {relation: type(r), genre: ad.Genre, summary: ad.Summary,
+                                                          class: activity_class, score: r.score, date: r.date} END) AS activities
+        }
+        RETURN properties(c) AS child, activities
+        """
+        self._count(auto_commit=1)
+        with self.driver.session(fetch_size=batch_size) as my_session:
+            for record in my_session.run(query):
+                activities = record["activities"]
+                for act in activities:
+                    if hasattr(act["date"], "to_native"):
+                        act["date"] = act["date"].to_native()
+                yield {"child": record["child"], "activities": activities}
+
+    def erase_graph(self, confirm=True, batch_size=10000):
+        # erase all the informations in the graph (asks for a confirmation unless confirm is False), the nodes
+        # are deleted 'batch_size' at a time so that large graphs do not need a single huge transaction
+        if confirm:
+            erase = input("Do you want to erase all the informations stored in the graph? [y/n] ")
+            if erase.lower() != 'y':
+                return
+        deleted = batch_size
+        while deleted >= batch_size:
+            deleted = self.write("MATCH (n) WITH n LIMIT $limit DETACH DELETE n RETURN count(*) AS deleted",
+                                 {"limit": batch_size})[0]["deleted"]
+        self.profile_cache.clear()
+        self.build_all_activities() # rebuilds activities
 
     def build_all_activities(self):
         # rebuilds all activities that are saved in the config.py file, the id corresponds to the position in the list
         # this is useful if the graph was erased
-        for elem in self.activities:
-            self.create_node("Activity", {"Id": self.activities.index(elem), "name": elem})
+        self.add_activity_updates()
 
     def close(self):
         self.driver.close()
 
 
+def make_knowledge_graph(backend=None, **kwargs):
+    """Return the knowledge graph backend selected by 'backend' or by GRAPH_BACKEND in config/db_config.yaml:
+    'neo4j' (KnowledgeGraph, the default) or 'memory' (MemoryKnowledgeGraph, in process, no database needed).
+    The kwargs are passed to the backend constructor.
+    """
+
+    backend = (backend or GRAPH_BACKEND).lower()
+    if backend == 'memory':
+        return MemoryKnowledgeGraph(**kwargs)
+    if backend == 'neo4j':
+        return KnowledgeGraph(**kwargs)
+    raise ValueError(f"Unknown knowledge graph backend '{backend}': use 'neo4j' or 'memory'")
+
+
 def kg_test():
     # Instantiate the KnowledgeGraph with connection details
     kg = KnowledgeGraph()
@@ -0,0 +1,262 @@
+import sys
+sys.path.insert(0, './neo4j_db')
+sys.path.insert(0, './llm')
+
+import os
+import csv
+import json
+import time
+import random
+import argparse
+import datetime
+
+# Check the operating system, it is used for the import modules
+if os.name == 'nt':  # 'nt' stands for Windows
+    from neo4j_db.database import make_knowledge_graph
+elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
+    from database import make_knowledge_graph
+
+"""
+Bulk import/export of the knowledge graph, to move the children and their activities between sites (or backends),
+to warm start a new deployment and to seed large synthetic graphs for the load tests.
+
+Formats (chosen by the file extension):
+    .jsonl  one child per line: {"child": {properties}, "activities": [{relation, genre, summary, class, score, date}]}
+    .csv    one activity per row with the child columns repeated (a child without activities has one row with empty
+            activity columns), only the CSV_CHILD_COLUMNS properties of the child are kept: use JSONL for a full copy
+
+Examples (from the root of the repository):
+    python neo4j_db/graph_io.py export graph.jsonl
+    python neo4j_db/graph_io.py import graph.jsonl -batch_size 1000
+    python neo4j_db/graph_io.py seed -children 100000 -activities 5 -out synthetic.jsonl
+"""
+
+CSV_CHILD_COLUMNS = ["Id", "Name", "Surname", "Birth", "Gender", "Nation"]
+CSV_ACTIVITY_COLUMNS = ["relation", "genre", "summary", "class", "score", "date"]
+GENRES = ["Fantasy", "Adventure", "Horror", "Romantic", "Comedy", "Pop", "Rock", "Cartoon"]
+
+
+class Progress:
+    # prints the number of processed children/activities and the throughput every 'every' children
+    def __init__(self, label, every=10000):
+        self.label = label
+        self.every = every
+        self.children = 0
+        self.activities = 0
+        self.start = time.perf_counter()
+        self._next = every
+
+    def update(self, children, activities):
+        self.children += children
+        self.activities += activities
+        if self.every and self.children >= self._next:
+            self._next += self.every
+            self.report()
+
+    def report(self, final=False):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(f"  {'done: ' if final else ''}{self.label} {self.children} children, {self.activities} activities "
+              f"in {elapsed:.1f}s ({self.children / elapsed:.0f} children/s, {self.activities / elapsed:.0f} activities/s)")
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        return {"children": self.children, "activities": self.activities, "seconds": round(elapsed, 2),
+                "children_per_s": round(self.children / max(elapsed, 1e-9), 1)}
+
+
+# ----- file formats -----
+def _json_default(value):
+    # dates of the relationships (datetime or neo4j.time types)
+    if hasattr(value, "to_native"):
+        value = value.to_native()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _parse_date(value):
+    if isinstance(value, str) and value:
+        return datetime.datetime.fromisoformat(value)
+    return value or datetime.datetime.now()
+
+
+def read_profiles(path):
+    """Stream the profiles of a JSONL or CSV file (see the module docstring), one child at a time."""
+    if path.endswith(".csv"):
+        yield from _read_csv(path)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            profile = json.loads(line)
+            for act in profile.get("activities", []):
+                act["date"] = _parse_date(act.get("date"))
+            yield profile
+
+
+def _read_csv(path):
+    # the rows of a child are consecutive (as written by write_profiles)
+    profile, key = None, None
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            child = {k: row[k] for k in CSV_CHILD_COLUMNS if row.get(k)}
+            if child.get("Id", "").lstrip("-").isdigit():
+                child["Id"] = int(child["Id"])
+            row_key = tuple(sorted(child.items()))
+            if row_key != key:
+                if profile is not None:
+                    yield profile
+                profile, key = {"child": child, "activities": []}, row_key
+            if row.get("genre") and row.get("summary"):
+                profile["activities"].append({
+                    "relation": row["relation"], "genre": row["genre"], "summary": row["summary"],
+                    "class": row.get("class") or None,
+                    "score": float(row["score"]) if row.get("score") else '',
+                    "date": _parse_date(row.get("date")),
+                })
+    if profile is not None:
+        yield profile
+
+
+def write_profiles(profiles, path, progress=None):
+    """Write the profiles to a JSONL or CSV file (see the module docstring) while they are streamed."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = None
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=CSV_CHILD_COLUMNS + CSV_ACTIVITY_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+        for profile in profiles:
+            activities = profile.get("activities", [])
+            if writer is None:
+                f.write(json.dumps(profile, default=_json_default) + "\n")
+            else:
+                child = {k: profile["child"].get(k, '') for k in CSV_CHILD_COLUMNS}
+                for act in activities or [{}]:
+                    row = dict(child)
+                    row.update({k: act.get(k, '') for k in CSV_ACTIVITY_COLUMNS})
+                    if row["date"] != '':
+                        row["date"] = _json_default(row["date"])
+                    writer.writerow(row)
+            if progress is not None:
+                progress.update(1, len(activities))
+
+
+# ----- graph import/export -----
+def _batches(profiles, batch_size):
+    batch = []
+    for profile in profiles:
+        batch.append(profile)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_profiles(kg, profiles, batch_size=1000, progress_every=10000):
+    """Write the (streamed) profiles to the graph, 'batch_size' children per transaction (one UNWIND statement for the
+    children and one for the activities, see GraphBackend.import_profiles).
+    Outputs:
+        summary (dict): imported children and activities, elapsed seconds and throughput.
+    """
+
+    progress = Progress("imported", progress_every)
+    with kg.bulk():
+        for batch in _batches(profiles, batch_size):
+            written = kg.import_profiles(batch)
+            progress.update(len(batch), written)
+    progress.report(final=True)
+    return progress.summary()
+
+
+def export_graph(kg, path, batch_size=1000, progress_every=10000):
+    """Stream every child of the graph with its activities to a JSONL or CSV file.
+    Outputs:
+        summary (dict): exported children and activities, elapsed seconds and throughput.
+    """
+
+    progress = Progress("exported", progress_every)
+    write_profiles(kg.iter_profiles(batch_size=batch_size), path, progress)
+    progress.report(final=True)
+    return progress.summary()
+
+
+def import_graph(kg, path, batch_size=1000, progress_every=10000):
+    # imports a JSONL or CSV file written by export_graph (or by synthetic_profiles)
+    return import_profiles(kg, read_profiles(path), batch_size, progress_every)
+
+
+# ----- synthetic graphs -----
+def synthetic_profiles(num_children, activities_per_child=5, seed=0, activity_classes=None):
+    """Generate 'num_children' synthetic profiles (marked with Synthetic: true) from the children of
+    ChildLLM.make_childs, each with 'activities_per_child' LIKES/DISLIKES activities in the last year.
+    The (name, surname, birth) triples are unique, so every activity belongs to exactly one child.
+    """
+
+    from ChildLLM import make_childs  # needs the llm folder (and its api key), only for the synthetic graphs
+
+    rng = random.Random(seed)
+    random.seed(seed)  # make_childs uses the global generator
+    classes = activity_classes or ["Storytelling", "Music"]
+    now = datetime.datetime.now()
+    seen = set()
+    produced = 0
+    while produced < num_children:
+        for name, surname, sex, birth, personality in make_childs(min(10000, num_children - produced)):
+            if (name, surname, birth) in seen:
+                continue
+            seen.add((name, surname, birth))
+            activities = []
+            for j in range(activities_per_child):
+                score = round(rng.random(), 2)
+                activities.append({
+                    "relation": 'LIKES' if score > 0.5 else 'DISLIKES',
+                    "genre": rng.choice(GENRES),
+                    "summary": f"synthetic activity {produced}-{j}",
+                    "class": rng.choice(classes),
+                    "score": score,
+                    "date": now - datetime.timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86399)),
+                })
+            yield {"child": {"Name": name, "Surname": surname, "Birth": birth, "Gender": 'Male' if sex == "M" else 'Female',
+                             "Personality": personality, "Synthetic": True},
+                   "activities": activities}
+            produced += 1
+            if produced >= num_children:
+                return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import/export of the knowledge graph (JSONL or CSV, by file extension).")
+    parser.add_argument('command', choices=['export', 'import', 'seed'], help="'export' the graph to a file, 'import' a file, 'seed' synthetic children.")
+    parser.add_argument('path', nargs='?', default=None, help='File to export to / import from.')
+    parser.add_argument('-backend', type=str, default=None, help="'neo4j' or 'memory' (default: GRAPH_BACKEND in config/db_config.yaml).")
+    parser.add_argument('-batch_size', type=int, default=1000, help='Children per transaction (import) or per fetch (export).')
+    parser.add_argument('-progress', type=int, default=10000, help='Print the progress every N children.')
+    parser.add_argument('-children', type=int, default=100000, help='Number of synthetic children (seed).')
+    parser.add_argument('-activities', type=int, default=5, help='Activities per synthetic child (seed).')
+    parser.add_argument('-out', type=str, default=None, help='Write the synthetic children to this file instead of the graph (seed).')
+    parser.add_argument('-erase', action='store_true', help='Erase the graph (without confirmation!) before importing/seeding.')
+    args = parser.parse_args()
+
+    if args.command == 'seed' and args.out:
+        progress = Progress("generated", args.progress)
+        write_profiles(synthetic_profiles(args.children, args.activities), args.out, progress)
+        progress.report(final=True)
+        sys.exit(0)
+    if args.command != 'seed' and not args.path:
+        parser.error(f"'{args.command}' needs a file path")
+
+    kg = make_knowledge_graph(args.backend)
+    try:
+        if args.erase and args.command != 'export':
+            kg.erase_graph(confirm=False)
+        if args.command == 'export':
+            print(export_graph(kg, args.path, args.batch_size, args.progress))
+        elif args.command == 'import':
+            print(import_graph(kg, args.path, args.batch_size, args.progress))
+        else:
+            print(import_profiles(kg, synthetic_profiles(args.children, args.activities, activity_classes=kg.activities),
+                                  args.batch_size, args.progress))
+    finally:
+        kg.close()
@@ -0,0 +1,234 @@
+import os
+import json
+import datetime
+import threading
+import contextlib
+
+# Check the operating system, it is used for the import modules
+if os.name == 'nt':  # 'nt' stands for Windows
+    from neo4j_db.backend import GraphBackend, summarize_preferences
+    from neo4j_db.profile_cache import ChildProfileCache
+    from neo4j_db.config import GRAPH_SNAPSHOT_PATH, PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
+    from backend import GraphBackend, summarize_preferences
+    from profile_cache import ChildProfileCache
+    from config import GRAPH_SNAPSHOT_PATH, PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+
+
+class MemoryKnowledgeGraph(GraphBackend):
+    """In-process knowledge graph with the same API of KnowledgeGraph (reads, writes through GraphUnitOfWork),
+    for tests, evaluation runs and small deployments without a Neo4j server.
+
+    The graph is kept as an adjacency index: children by (Name, Surname) and by Id, activity details by
+    (Genre, Summary), and for each child the list of its LIKES/DISLIKES edges. A lookup is a dictionary access plus
+    a scan of the edges of the matched children. If 'snapshot_path' is given the graph is loaded from that JSON file
+    and saved to it after every write.
+    """
+
+    def __init__(self, snapshot_path=None, profile_cache=None):
+        super().__init__()
+        self.snapshot_path = snapshot_path if snapshot_path is not None else GRAPH_SNAPSHOT_PATH
+        # no round-trip to save, but the returned profiles must still be copies (the cache deep-copies them)
+        self.profile_cache = profile_cache or ChildProfileCache(max_size=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+        self._lock = threading.RLock()
+        self._metrics = {"reads": 0, "writes": 0}
+        self.autosave = True  # save the snapshot after every write (suspended by bulk())
+        self.clear()
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            self.load(self.snapshot_path)
+
+    def clear(self):
+        # empty graph (the Activity classes are the positions in self.activities)
+        with getattr(self, "_lock", threading.RLock()):
+            self.children = []             # child properties, the position is the internal node id
+            self.children_by_name = {}     # (Name, Surname) -> [node ids]
+            self.children_by_id = {}       # Id property -> [node ids]
+            self.details = {}              # (Genre, Summary) -> activity class name (SUBCLASS_OF) or None
+            self.edges = {}                # node id -> [{relation, genre, summary, score, date}]
+
+    # ----- reads -----
+    def _match(self, name=None, surname=None, birth_date=None):
+        # node ids of the children matching the given filters (all of them without filters)
+        if name and surname:
+            candidates = self.children_by_name.get((name, surname), [])
+        else:
+            candidates = range(len(self.children))
+        return [i for i in candidates
+                if (not name or self.children[i].get("Name") == name)
+                and (not surname or self.children[i].get("Surname") == surname)
+                and (not birth_date or self.children[i].get("Birth") == birth_date)]
+
+    def _preference(self, edge):
+        return {"genre": edge["genre"], "summary": edge["summary"], "class": self.details.get((edge["genre"], edge["summary"]))}
+
+    def _last_activities(self, node_ids, limit):
+        edges = [edge for i in node_ids for edge in self.edges.get(i, [])]
+        edges.sort(key=lambda edge: edge["date"], reverse=True)
+        return [{"activity_genre": edge["genre"], "activity_summary": edge["summary"]} for edge in edges[:limit]]
+
+    def get_child(self, name=None, surname=None, birth_date=None, last_activity_limit=3, use_cache=True, preferences=True):
+        cache_key = ChildProfileCache.make_key(name, surname, birth_date, last_activity_limit, preferences)
+        if use_cache:
+            cached = self.profile_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            self._metrics["reads"] += 1
+            child_info = []
+            for i in self._match(name, surname, birth_date):
+                child = dict(self.children[i])
+                if preferences:
+                    edges = self.edges.get(i, [])
+                    child["LIKES"] = [self._preference(edge) for edge in edges if edge["relation"] == 'LIKES']
+                    child["DISLIKES"] = [self._preference(edge) for edge in edges if edge["relation"] == 'DISLIKES']
+                last_activity = self._last_activities([i], last_activity_limit)
+                if last_activity:
+                    child["last_activity"] = last_activity
+                child_info.append(child)
+
+        if use_cache:
+            self.profile_cache.put(cache_key, child_info)
+        return child_info
+
+    def get_child_preferences(self, name=None, surname=None, birth_date=None):
+        preferences = {"LIKES": [], "DISLIKES": []}
+        with self._lock:
+            self._metrics["reads"] += 1
+            for i in self._match(name, surname, birth_date):
+                for edge in self.edges.get(i, []):
+                    preferences[edge["relation"]].append(self._preference(edge))
+        return preferences
+
+    def get_last_activity(self, name=None, surname=None, birth_date=None, limit=3):
+        with self._lock:
+            self._metrics["reads"] += 1
+            results = self._last_activities(self._match(name, surname, birth_date), limit)
+        return {"last_activity": results} if results else None
+
+    def _preference_rows(self, name, surname, birth_date, top_k, half_life_days):
+        rows = []
+        with self._lock:
+            self._metrics["reads"] += 1
+            for i in self._match(name, surname, birth_date):
+                activities = [dict(edge, **{"class": self.details.get((edge["genre"], edge["summary"]))})
+                              for edge in self.edges.get(i, [])]
+                rows += summarize_preferences(activities, top_k, half_life_days)
+        return rows
+
+    # ----- writes -----
+    def apply_writes(self, children, activities):
+        # same semantics of KnowledgeGraph.CHILDREN_QUERY and ACTIVITIES_QUERY
+        with self._lock:
+            self._metrics["writes"] += 1
+            for child in children:
+                if not self._match(child.get("Name"), child.get("Surname"), child.get("Birth")) or not (child.get("Name") and child.get("Surname")):
+                    self._add_child(dict(child))
+            for act in activities:
+                key = (act["genre"], act["summary"])
+                if key not in self.details or self.details[key] is None:
+                    self.details[key] = self.activities[act["class_id"]] if 0 <= act["class_id"] < len(self.activities) else None
+                if act["child_id"] is not None:
+                    node_ids = self.children_by_id.get(act["child_id"], [])
+                else:
+                    node_ids = self._match(act["name"], act["surname"], act["birth"])
+                for i in node_ids:
+                    edge = {"relation": act["relation"], "genre": act["genre"], "summary": act["summary"],
+                            "score": act["score"], "date": act["date"]}
+                    if edge not in self.edges.setdefault(i, []):  # MERGE
+                        self.edges[i].append(edge)
+            if self.autosave and self.snapshot_path:
+                self.save(self.snapshot_path)
+
+        for child in children:
+            self.profile_cache.invalidate(child.get("Name"), child.get("Surname"), child.get("Birth"))
+        for act in activities:
+            if act["child_id"] is not None:
+                self.profile_cache.clear()  # child known only by Id
+            else:
+                self.profile_cache.invalidate(act["name"], act["surname"], act["birth"])
+
+    def _add_child(self, child):
+        i = len(self.children)
+        self.children.append(child)
+        self.children_by_name.setdefault((child.get("Name"), child.get("Surname")), []).append(i)
+        if child.get("Id") is not None:
+            self.children_by_id.setdefault(child["Id"], []).append(i)
+        self.edges[i] = []
+
+    def iter_profiles(self, batch_size=1000):
+        # every child with its activities (see GraphBackend.iter_profiles), oldest activity first
+        for i in range(len(self.children)):
+            with self._lock:
+                child = dict(self.children[i])
+                activities = [{"relation": edge["relation"], "genre": edge["genre"], "summary": edge["summary"],
+                               "class": self.details.get((edge["genre"], edge["summary"])),
+                               "score": edge["score"], "date": edge["date"]}
+                              for edge in sorted(self.edges.get(i, []), key=lambda edge: edge["date"])]
+            yield {"child": child, "activities": activities}
+
+    @contextlib.contextmanager
+    def bulk(self):
+        # the snapshot is saved once at the end of the bulk operation instead of after every batch
+        autosave, self.autosave = self.autosave, False
+        try:
+            yield None
+        finally:
+            self.autosave = autosave
+            if autosave and self.snapshot_path:
+                self.save(self.snapshot_path)
+
+    def erase_graph(self, confirm=True, batch_size=None):
+        # erase all the informations in the graph (asks for a confirmation unless confirm is False)
+        if confirm:
+            erase = input("Do you want to erase all the informations stored in the graph? [y/n] ")
+            if erase.lower() != 'y':
+                return
+        self.clear()
+        self.profile_cache.clear()
+        if self.snapshot_path:
+            self.save(self.snapshot_path)
+
+    # ----- snapshot -----
+    def save(self, path):
+        # writes the graph to a JSON file (dates as ISO strings), through a temporary file to never leave it truncated
+        with self._lock:
+            data = {
+                "children": [{"properties": child,
+                              "edges": [dict(edge, date=edge["date"].isoformat()) for edge in self.edges.get(i, [])]}
+                             for i, child in enumerate(self.children)],
+                "details": [{"genre": genre, "summary": summary, "class": activity_class}
+                            for (genre, summary), activity_class in self.details.items()],
+            }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        with self._lock:
+            self.clear()
+            for entry in data.get("children", []):
+                self._add_child(entry["properties"])
+                self.edges[len(self.children) - 1] = [dict(edge, date=datetime.datetime.fromisoformat(edge["date"]))
+                                                      for edge in entry["edges"]]
+            for detail in data.get("details", []):
+                self.details[(detail["genre"], detail["summary"])] = detail["class"]
+        self.profile_cache.clear()
+
+    # ----- utils -----
+    def check_connection(self):
+        return True
+
+    def pool_metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["backend"] = "memory"
+        metrics["children"] = len(self.children)
+        return metrics
+
+    def close(self):
+        if self.snapshot_path:
+            self.save(self.snapshot_path)
@@ -0,0 +1,78 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+
+class ChildProfileCache:
+    """Read-through cache of the child profiles returned by KnowledgeGraph.get_child, keyed by the lookup
+    (name, surname, birth) with LRU + TTL eviction. The write paths of the graph invalidate the entries of the
+    written child, so a profile is fetched again only after it really changed (or after 'ttl' seconds, for writes
+    made by other processes).
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expiry time, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(name=None, surname=None, birth=None, *extra):
+        # empty strings and None are the same "no filter" for get_child
+        return (name or None, surname or None, birth or None) + extra
+
+    def get(self, key):
+        # returns a copy of the cached value, or None on a miss (or expired entry)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            if entry is not None:
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, name=None, surname=None, birth=None):
+        """Remove every entry whose lookup may include the child (name, surname, birth): the lookups with the same
+        values or without that filter. With no argument (e.g. child known only by Id) the whole cache is cleared.
+        """
+
+        if not name and not surname and not birth:
+            self.clear()
+            return
+        child = self.make_key(name, surname, birth)
+        with self._lock:
+            stale = [key for key in self._entries
+                     if all(k is None or c is None or k == c for k, c in zip(key[:3], child))]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._entries), "max_size": self.max_size, "ttl_s": self.ttl,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                    "evictions": self.evictions, "invalidations": self.invalidations}
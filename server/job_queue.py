@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import traceback
+
+
+class JobQueue:
+    """Durable queue of the post-session work of the server (conversation export, DatabaseLLM extraction and graph writes),
+    so that /chat/exit can answer immediately.
+
+    The jobs are rows of a local SQLite file: they survive a restart of the server and a failed job is retried with an
+    exponential backoff up to 'max_attempts' times. The handlers are registered by kind and run in 'workers' background
+    threads. The file can be shared by many processes (server, reloader, simulations): a running job is leased by its
+    queue for 'lease' seconds and the lease is renewed while the handler runs, so only the jobs whose owner stopped or
+    crashed (expired lease) are taken back by another queue.
+
+    Usage:
+        jobs = JobQueue("server/jobs.sqlite")
+        jobs.register("save_session", lambda payload: ...)
+        jobs.start()
+        jobs.enqueue("save_session", {"conversation": ..., "score": ...})
+    """
+
+    def __init__(self, path, workers=1, max_attempts=5, backoff=5.0, poll_interval=0.5, latency_window=200, lease=60.0):
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"  # this queue in the file
+        self.lease = lease  # seconds after which a running job whose lease was not renewed is run again
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff  # seconds before the first retry, doubled at every attempt
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._latencies = []  # seconds from enqueue to completion of the last 'latency_window' jobs
+        self._latency_window = latency_window
+        self._counts = {"done": 0, "failed": 0, "retried": 0}
+
+        with self._connect() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                run_at REAL NOT NULL,
+                finished_at REAL,
+                last_error TEXT,
+                owner TEXT,
+                lease_until REAL
+            )""")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):  # files of the first version
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_run_at ON jobs (status, run_at)")
+
+    def _connect(self):
+        # one connection per call: the queue is used from the Flask threads and from the workers
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return _Connection(conn)
+
+    def register(self, kind, handler):
+        # handler(payload) runs the job, an exception means failure (the job is retried)
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind, payload):
+        # stores the job (the payload must be JSON serializable) and wakes up a worker, returns the job id
+        now = time.time()
+        with self._connect() as conn:
+            job_id = conn.execute("INSERT INTO jobs (kind, payload, created_at, run_at) VALUES (?, ?, ?, ?)",
+                                  (kind, json.dumps(payload), now, now)).lastrowid
+        self._wakeup.set()
+        return job_id
+
+    def _claim(self):
+        # takes the oldest due job (atomically, other workers or server processes may share the file): a pending one or
+        # a running one whose lease expired (its queue was stopped or crashed)
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id, kind, payload, attempts, created_at FROM jobs "
+                               "WHERE (status = 'pending' AND run_at <= ?) "
+                               "OR (status = 'running' AND (lease_until IS NULL OR lease_until < ?)) "
+                               "ORDER BY run_at, id LIMIT 1", (now, now)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_until = ? WHERE id = ?",
+                             (self.owner, now + self.lease, row[0]))
+            conn.execute("COMMIT")
+        return row
+
+    def _renew(self, job_id, done):
+        # heartbeat of a running job: its lease is extended until the handler returns
+        while not done.wait(self.lease / 3):
+            try:
+                with self._connect() as conn:
+                    conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                                 (time.time() + self.lease, job_id, self.owner))
+            except sqlite3.Error as e:
+                print(f"Job {job_id}: lease not renewed: {e}")
+
+    def run_pending(self):
+        # runs one due job in the calling thread, returns False if there was none
+        row = self._claim()
+        if row is None:
+            return False
+        job_id, kind, payload, attempts, created_at = row
+        attempts += 1
+        done = threading.Event()
+        threading.Thread(target=self._renew, args=(job_id, done), daemon=True).start()
+        try:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise KeyError(f"no handler registered for the jobs '{kind}'")
+            handler(json.loads(payload))
+        except Exception as e:
+            done.set()
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            print(f"Job {job_id} ({kind}) failed at attempt {attempts}: {error}")
+            with self._connect() as conn:
+                if attempts >= self.max_attempts:
+                    conn.execute("UPDATE jobs SET status = 'failed', finished_at = ?, last_error = ?, lease_until = NULL "
+                                 "WHERE id = ? AND owner = ?", (time.time(), error, job_id, self.owner))
+                else:
+                    conn.execute("UPDATE jobs SET status = 'pending', run_at = ?, last_error = ?, lease_until = NULL "
+                                 "WHERE id = ? AND owner = ?", (time.time() + self.backoff * 2 ** (attempts - 1), error, job_id, self.owner))
+            with self._lock:
+                self._counts["failed" if attempts >= self.max_attempts else "retried"] += 1
+            return True
+
+        done.set()
+        finished_at = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'done', finished_at = ?, last_error = NULL, lease_until = NULL "
+                         "WHERE id = ? AND owner = ?", (finished_at, job_id, self.owner))
+        with self._lock:
+            self._counts["done"] += 1
+            self._latencies.append(finished_at - created_at)
+            del self._latencies[:-self._latency_window]
+        return True
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_pending():
+                    continue
+            except Exception as e:
+                print("Job queue error:", e)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        # the running jobs are completed, the pending ones stay in the file for the next start
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def metrics(self):
+        # queue depth by status and latency (enqueue -> done) of the last completed jobs
+        with self._connect() as conn:
+            by_status = dict(conn.execute("SELECT status, count(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT min(created_at) FROM jobs WHERE status IN ('pending', 'running')").fetchone()[0]
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self._counts)
+        metrics = {"pending": by_status.get("pending", 0), "running": by_status.get("running", 0),
+                   "done_total": by_status.get("done", 0), "failed_total": by_status.get("failed", 0),
+                   "oldest_pending_age_s": round(time.time() - oldest, 1) if oldest else 0.0}
+        metrics["depth"] = metrics["pending"] + metrics["running"]
+        metrics.update({k + "_since_start": v for k, v in counts.items()})
+        if latencies:
+            metrics["latency_mean_s"] = round(sum(latencies) / len(latencies), 2)
+            metrics["latency_p95_s"] = round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 2)
+        return metrics
+
+
+class _Connection:
+    # sqlite3 connection closed at the end of the 'with' block (sqlite3.Connection only ends the transaction)
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+        self.conn.close()
+        return False
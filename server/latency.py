@@ -0,0 +1,52 @@
+import time
+import threading
+import contextlib
+
+
+class LatencyRecorder:
+    """Latencies of the stages of the server requests (speech to text, therapist LLM, text to speech, ...), kept for the
+    last 'window' samples of each stage and reported as percentiles by /metrics.
+    """
+
+    def __init__(self, window=2000):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.setdefault(stage, [])
+            samples.append(seconds)
+            del samples[:-self.window]
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        # with recorder.time("tts"): ...
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        # {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+        return {stage: percentiles(values) for stage, values in samples.items() if values}
+
+
+def percentiles(values):
+    # summary in milliseconds of a list of latencies in seconds
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+
+    def pick(p):
+        return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 2)
+
+    return {"count": len(values), "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(values[-1] * 1000, 2)}
@@ -4,7 +4,9 @@ import threading
 import queue
 import uuid
 import glob
-from pydub import AudioSegment
+import functools
+from concurrent.futures import Future
+from datetime import datetime
 from flask import Flask, request, render_template, jsonify, redirect, url_for, session
 import argparse
 
@@ -12,70 +14,186 @@ import argparse
 sys.path.insert(0, './audio')
 sys.path.insert(0, './neo4j_db')
 sys.path.insert(0, './llm')
+sys.path.insert(0, './server')
 sys.path.insert(0, './face')
 app = Flask(__name__)
 
+# Central configuration (config/settings.py): app_config.yaml, environment and command line overrides
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from settings import settings
+
+# Argument Terminal Parser, you need to execute the code using "python server.py -experiment {full/minimal}"
+# Minimal: only text chat (no audio, no gestures)
+# Full: audio chat with robot that can talk and gestures
+parser = argparse.ArgumentParser(description="Robot IP and Port")
+parser.add_argument("-experiment", type=str, default='full', help="'minimal' or 'full' experiment")
+parser.add_argument("-gaze_hz", type=float, default=None, help="Target rate of the gaze analysis (frames in between are dropped) (default: sensing.gaze_hz of config/app_config.yaml)")
+parser.add_argument("-emotion_hz", type=float, default=None, help="Target rate of the emotion analysis (default: sensing.emotion_hz of config/app_config.yaml)")
+parser.add_argument("-max_width", type=int, default=None, help="Frames wider than this are downscaled before the analysis (default: sensing.max_width of config/app_config.yaml)")
+parser.add_argument("-headless", action='store_true', help="Run the engagement estimation without any window")
+parser.add_argument("-preview", action='store_true', help="Show the engagement estimation in a separate debug-preview process (implies -headless)")
+parser.add_argument("-sensing", type=str, default='thread', help="'thread' (engagement estimation inside the server process), 'process' (separate camera and analysis processes) or 'off' (no camera, constant score, for the benchmarks)")
+parser.add_argument("-tts", type=str, default='gtts', help="'gtts' (Google text to speech) or 'offline' (silent audio of the estimated length, for the benchmarks)")
+parser.add_argument("-multi_session", action='store_true', help="One chat id per browser session, for the load benchmarks: the sessions share the engagement sensing (the exit of one stops it for all and takes its scores) and the robot client follows only the 'test' one")
+parser.add_argument("-session_token_budget", type=int, default=None, help="Tokens of a session after which its LLM requests use the cheaper models (0: no budget) (default: server.session_token_budget of config/app_config.yaml)")
+parser.add_argument("-session_cost_budget", type=float, default=None, help="Estimated USD of a session after which its LLM requests use the cheaper models (0: no budget) (default: server.session_cost_budget of config/app_config.yaml)")
+parser.add_argument("-reload", action='store_true', help="Restart the server when the code changes (Flask reloader: the modules are loaded twice at startup)")
+parser.add_argument("-jobs_db", type=str, default=None, help="File of the queue of the post-session jobs (conversation export and database update) (default: server.jobs_db of config/app_config.yaml)")
+parser.add_argument("-set", action='append', default=[], metavar="SECTION.KEY=VALUE", help="Override a setting of config/app_config.yaml or config/db_config.yaml (repeatable), e.g. -set models.therapist=llama-3.1-8b-instant -set database.graph_backend=memory")
+
+def parse_arguments(argv=None):
+    args = parser.parse_args(argv)
+    settings.override(args.set)
+    # the options not given take the value of the settings
+    for option, setting in {"gaze_hz": "sensing.gaze_hz", "emotion_hz": "sensing.emotion_hz", "max_width": "sensing.max_width",
+                            "session_token_budget": "server.session_token_budget", "session_cost_budget": "server.session_cost_budget",
+                            "jobs_db": "server.jobs_db"}.items():
+        if getattr(args, option) is None:
+            section, key = setting.split(".")
+            setattr(args, option, getattr(getattr(settings, section), key))
+    return args
+
+# The sensing and preview processes are started with 'spawn': they import this module again (as '__mp_main__'), so
+# only the server process parses the arguments and starts the subsystems (graph, post-session jobs, sensing), see main()
+args = None
+full = True
+if __name__ == '__main__':
+    # Parse the arguments (before the modules of the project are imported, so that they see the overrides)
+    args = parse_arguments()
+    experiment_type = args.experiment.lower()
+    if experiment_type == 'minimal':
+        full = False
+    else:
+        full = True
+
 
 # Check the operating system, it is used for the import modules
 if os.name == 'nt':  # 'nt' stands for Windows
-    from neo4j_db.database import KnowledgeGraph
+    from neo4j_db.database import make_knowledge_graph
     from audio.audio import record_audio
     from audio.audio_api import audio_groq_api
-    from llm.TherapistLLM import TherapistLLM
+    from llm.TherapistLLM import TherapistLLM, write_conversation
     from llm.DatabaseLLM import DatabaseLLM
-    from gtts import gTTS
-
-
-    from face.face_main import face_thread
-    with open("../llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
+    from server.job_queue import JobQueue
+    from server.latency import LatencyRecorder
+    from llm.llm_api import groq_api_key, usage, usage_session
 
 elif os.name == 'posix':  # 'posix' stands for Unix/Linux/MacOS
-    from database import KnowledgeGraph
+    from database import make_knowledge_graph
     from audio_api import audio_groq_api
-    from TherapistLLM import TherapistLLM
+    from TherapistLLM import TherapistLLM, write_conversation
     from DatabaseLLM import DatabaseLLM
-    from face_main import face_thread
-    from gtts import gTTS
-    with open("./llm/api_key.txt", "r") as file:
-        groq_api_key = file.read()
-
-# Argument Terminal Parser, you need to execute the code using "python server.py -experiment {full/minimal}"
-# Minimal: only text chat (no audio, no gestures)
-# Full: audio chat with robot that can talk and gestures
-parser = argparse.ArgumentParser(description="Robot IP and Port")
-parser.add_argument("-experiment", type=str, default='full', help="'minimal' or 'full' experiment")
-
-# Parse the arguments
-args = parser.parse_args()
-experiment_type = args.experiment.lower()
-if experiment_type == 'minimal':
-    full = False
-else:
-    full = True
+    from job_queue import JobQueue
+    from latency import LatencyRecorder
+    from llm_api import groq_api_key, usage, usage_session
 
 # _____ VARIABLES AND UTILS _____
-therapist_model = 'llama-3.3-70b-versatile'
-db_model = 'gemma2-9b-it' # from 8 October 2025 SHOULD CHANGE TO 'llama-3.1-8b-instant'
-whisper_model_name = 'whisper-large-v3'
+therapist_model = settings.models.therapist
+db_model = settings.models.database
+whisper_model_name = settings.models.whisper
 stop = ''
 
 active_chats = {} # gestisce le chat attive sul server per vari utenti
 app.secret_key = "super_secret_key_change_me" # gestisce sessioni flask
 
-# Create a stop event object for the face thread
-stop_event = threading.Event()
-# Create a queue for the results of the thread execution
-q = queue.Queue()
-# Create the face thread
-thread_face = threading.Thread(target=face_thread, args=(q,stop_event))
+def sensing_off(q, stop_event, hz=1):
+    # stand-in of the engagement estimation without a camera (benchmarks): a constant score
+    while not stop_event.wait(1 / hz):
+        q.put(0.5)
+    q.put(0.5)  # score of the session, put last like the average of face_thread
+
+def load_sensing_service():
+    if os.name == 'nt':
+        from face.sensing import SensingService
+    else:
+        from sensing import SensingService
+    return SensingService
+
+def make_sensing_channels():
+    # queue of the engagement scores and stop event of the sensing (set by main())
+    global q, stop_event
+    if args.sensing == 'process':
+        # Camera and analysis run in their own processes connected by a shared memory ring, only the scores come back
+        # to the server (so the vision workload does not compete with the requests for the GIL)
+        q, stop_event = load_sensing_service().make_channels()
+    else:
+        # Create a stop event object for the face thread
+        stop_event = threading.Event()
+        # Create a queue for the results of the thread execution
+        q = queue.Queue()
+
+q = None
+stop_event = None
+# Optional debug-preview process fed over shared memory (the sensing itself never opens a window), started by
+# main(): the preview process ('spawn') imports this module again and cannot start another process
+preview_channel = None
+preview_proc = None
+
+def start_preview_process():
+    global preview_channel, preview_proc
+    if os.name == 'nt':
+        from face.preview import start_preview
+    else:
+        from preview import start_preview
+    preview_channel, preview_proc = start_preview()
+
+def stop_preview_process():
+    # the sensing (that publishes the frames) is stopped first, then the preview process and its shared memory
+    stop_event.set()
+    if thread_face is not None:
+        thread_face.join(timeout=5)
+    preview_channel.close()
+    preview_proc.join(timeout=5)
+    if preview_proc.is_alive():
+        preview_proc.terminate()
+
+@functools.lru_cache(maxsize=None)
+def load_face_thread():
+    # the vision stack (DeepFace/TensorFlow, MediaPipe, OpenCV) is imported only by the 'thread' sensing, the first
+    # time it is needed (or by the warm-up at startup), not when the server module is loaded
+    if os.name == 'nt':
+        from face.face_main import face_thread
+    else:
+        from face_main import face_thread
+    return face_thread
+
+def make_sensing():
+    # a thread/process can be started only once, a new one is made for every session
+    if args.sensing == 'process':
+        return load_sensing_service()(q, stop_event, gaze_hz=args.gaze_hz, emotion_hz=args.emotion_hz, max_width=args.max_width)
+    if args.sensing == 'off':
+        return threading.Thread(target=sensing_off, args=(q, stop_event, args.gaze_hz), daemon=True)
+    # Create the face thread
+    return threading.Thread(target=load_face_thread(), args=(q,stop_event),
+                            kwargs={"gaze_hz": args.gaze_hz, "emotion_hz": args.emotion_hz,
+                                    "max_width": args.max_width, "headless": args.headless or args.preview,
+                                    "preview": preview_channel})
+
+thread_face = None
+
+def start_sensing():
+    # starts the engagement estimation of a session. The sensing of the previous session may still be stopping (it is
+    # joined in the background by chat_exit): its average score is taken out of the queue before the new one starts
+    global thread_face
+    if last_session_score is not None:
+        last_session_score.result()
+    if thread_face is not None and thread_face.is_alive() and not stop_event.is_set():
+        return  # already running for another session (-multi_session)
+    stop_event.clear()
+    thread_face = make_sensing()
+    thread_face.start()
+
+# latencies of the stages of the requests (reported by /metrics)
+stages = LatencyRecorder()
 
 # flag for the robot client
 active_chats['llm_updated'] = True
 
 chat_id = "test"
 
-kg = KnowledgeGraph()
+kg = None  # Neo4j or in-memory, see GRAPH_BACKEND in config/db_config.yaml (made by main())
+db_llm = None
+jobs = None
 unknown_child = {
     "child_name": "",
     "child_surname": "",
@@ -86,21 +204,68 @@ unknown_child = {
     "child_dislikes": "",
     "previous_activity": "",
 }
-db_llm = DatabaseLLM(api_key=groq_api_key, model_name=db_model)
+
+# Post-session work (conversation export, DatabaseLLM extraction and graph writes) runs in the background, so that
+# /chat/exit answers immediately. The jobs are kept in a local SQLite file: they are retried on failure and resumed
+# after a restart of the server
+def save_session_job(payload):
+    # the score is None if the sensing gave none: the activities are saved without a LIKES/DISLIKES decision
+    with usage_session(payload.get("session_id")):
+        db_llm.save_info(conversation=payload["conversation"], verbose=True, score=payload["score"], raise_errors=True)
+    usage.drop(payload.get("session_id"))  # last job of the session
+
+# Future of the score of the last session that stopped the sensing (a new session waits for it before restarting)
+last_session_score = None
+
+def finish_sensing(sensing, score, payload=None):
+    # waits for the end of the sensing of a session and takes its average score (the last value in the queue), then
+    # queues the save_session job of the session with it, so the stored job has the real score (also after a restart)
+    if sensing is not None:
+        sensing.join()
+    s_list = []
+    while not q.empty():
+        s_list.append(q.get())
+    score.set_result(float(s_list[-1]) if s_list else None)  # None se non c'è niente in coda
+    if payload is not None:
+        jobs.enqueue("save_session", dict(payload, score=score.result()))
+
+def start_jobs():
+    global jobs
+    jobs = JobQueue(args.jobs_db)
+    jobs.register("export_conversation", lambda payload: write_conversation(
+        payload["session_history"], turns=payload.get("turns"), usage=payload.get("usage"),
+        start=datetime.fromisoformat(payload["start"]) if payload.get("start") else None))
+    jobs.register("save_session", save_session_job)
+    jobs.start()
+
 FORM_LINK = 'https://forms.gle/dZcZWoxQqcNBP9zE8'
 last_response_audio_length = 0
 
 
 def get_audio_response(robot_text, chat_id):
-    cleanup_all_audio()
+    if not full:
+        # minimal experiment: text only, no audio is synthesized. The robot still needs how long the sentence takes
+        # to say (it keeps it displayed and times the gesture on it): about 2.5 words per second
+        duration_seconds = round(len(robot_text.split()) / 2.5, 2)
+        active_chats[chat_id].last_response_audio_length = duration_seconds
+        return None, duration_seconds
+    from pydub import AudioSegment  # audio libraries loaded by the first response of a full experiment
+    cleanup_all_audio(chat_id)
     unique_id = uuid.uuid4().hex
     file_name = f"audio_{chat_id}_{unique_id}.mp3"
     file_path = os.path.join(app.root_path, "static", file_name)
 
-    tts = gTTS(robot_text, lang="it")
-    tts.save(file_path)
-
-    audio = AudioSegment.from_file(file_path)
+    if args.tts == 'offline':
+        # no network: silent audio as long as the sentence would take to say (about 2.5 words per second)
+        file_name = file_name.replace(".mp3", ".wav")
+        file_path = os.path.join(app.root_path, "static", file_name)
+        audio = AudioSegment.silent(duration=int(len(robot_text.split()) / 2.5 * 1000))
+        audio.export(file_path, format="wav")
+    else:
+        from gtts import gTTS
+        tts = gTTS(robot_text, lang="it")
+        tts.save(file_path)
+        audio = AudioSegment.from_file(file_path)
     duration_seconds =  round(len(audio) / 1000, 2)
     print(f"Audio duration: {duration_seconds} seconds")
 
@@ -110,13 +275,13 @@ def get_audio_response(robot_text, chat_id):
     return f"/static/{file_name}", duration_seconds
 
 
-def cleanup_all_audio():
-    """deletes all audios in the static"""
+def cleanup_all_audio(chat_id=None):
+    """deletes all audios in the static (only the robot audios of chat_id, if given)"""
     static_dir = os.path.join(app.root_path, "static")
     audio_extensions = ("*.mp3", "*.wav", "*.ogg", "*.m4a")
 
     for ext in audio_extensions:
-        pattern = os.path.join(static_dir, ext)
+        pattern = os.path.join(static_dir, f"audio_{chat_id}_{ext}" if chat_id else ext)
         for file_path in glob.glob(pattern):
             try:
                 os.remove(file_path)
@@ -136,7 +301,7 @@ def check_child():
     name = data.get('name')
     surname = data.get('surname')
 
-    all_children = kg.get_child(name=name, surname=surname)
+    all_children = kg.get_child(name=name, surname=surname, preferences=False)
 
     if len(all_children) == 0:
         # No child found → new child
@@ -158,25 +323,29 @@ def submit():
     birth = request.form.get('birth')
 
     if not sex:  # Existing child
-        if birth:
-            child = kg.get_child(name=name, surname=surname, birth_date=birth)
-        else:
-            child = kg.get_child(name=name, surname=surname)
-
-        app.logger.info(f"child={child}")
-        child = child[0]
+        with stages.time("profile"):
+            # profile only (name, birth, gender, nation, last activities): the preferences come from the bounded summary
+            if birth:
+                child = kg.get_child(name=name, surname=surname, birth_date=birth, preferences=False)
+            else:
+                child = kg.get_child(name=name, surname=surname, preferences=False)
+
+            app.logger.info(f"child={child}")
+            child = child[0]
+            # top activities per class instead of the whole history, so the prompt stays bounded
+            preferences = kg.get_preference_summary(name=child["Name"], surname=child["Surname"], birth_date=child.get("Birth"))
         data = {
             "child_name": child["Name"],
             "child_surname": child["Surname"],
             "child_birth": child["Birth"],
             "child_gender": child["Gender"],
             "child_nation": child.get("Nation"),
-            "child_likes": child["LIKES"],
-            "child_dislikes": child["DISLIKES"],
+            "child_likes": preferences["LIKES"],
+            "child_dislikes": preferences["DISLIKES"],
             "previous_activity": child.get("last_activity"),
         }
     else:  # New child
-        data = unknown_child
+        data = dict(unknown_child) # copy, the sessions may run at the same time
         data["child_name"] = name
         data["child_surname"] = surname
         data["child_gender"] = sex
@@ -184,7 +353,9 @@ def submit():
 
     # Save child info and chat session
     session["child_data"] = data
-    session["chat_id"] = chat_id #str(uuid.uuid4())
+    session["chat_id"] = str(uuid.uuid4()) if args.multi_session else chat_id
+    # id of this therapy session (score and LLM usage), the chat id of the robot is shared by the sessions without -multi_session
+    session["session_id"] = str(uuid.uuid4())
     therapist = TherapistLLM(model_name=therapist_model)
     therapist.load_data(data)
 
@@ -214,9 +385,11 @@ def get_therapist_response(chat_id = None, child_message = None):
     if child_message:
         therapist.add_child_response(child_message)
 
-    robot_response = therapist.speak()
+    with stages.time("llm"), usage_session(session.get("session_id")): # therapist and gesture LLMs (tokens accounted to the session)
+        robot_response = therapist.speak()
     # makes the mp3 audio and returns the path for javascript
-    audio_path, duration = get_audio_response(robot_response, chat_id)
+    with stages.time("tts"):
+        audio_path, duration = get_audio_response(robot_response, chat_id)
 
     active_chats['llm_updated'] = True # now we can get the new llm response in the robot client
 
@@ -229,7 +402,7 @@ def chat_start():
     chat_id = session.get("chat_id")
     message, audio_path, duration = get_therapist_response(chat_id)
 
-    thread_face.start()
+    start_sensing()
 
     if not full:
         audio_path = None
@@ -260,19 +433,9 @@ def chat_exit():
     data = session.get("child_data", {})
     therapist = active_chats.pop(chat_id, None)  # remove therapist instance
 
-    # Stop the face thread at the end of the conversation
-    stop_event.set()
-    thread_face.join()
-    try:
-        s_list = []
-    
-        while not q.empty():
-            s_list.append(q.get())
-        score = s_list[-1]
-    except Exception:
-        score = 0  # default se non c'è niente in coda
-
-    #score = 0
+    global last_session_score
+    session_id = session.get("session_id")
+    save_payload = None
 
     if therapist:
         data_db_llm = (
@@ -284,14 +447,23 @@ def chat_exit():
             f"[CONVERSATION]: {therapist.session_history}"
         )
 
-        therapist.export_conversation()
+        jobs.enqueue("export_conversation", {"session_history": therapist.session_history, "turns": therapist.turns,
+                                             "start": therapist.start.isoformat(), "usage": usage.session(session_id)})
 
         app.logger.info(f"exit from chat -> {data_db_llm}")
-        # save the info in the db
-        db_llm.save_info(conversation=data_db_llm, verbose=True, score=score)
+        # save the info in the db (background job, queued with the score of the session by finish_sensing)
+        save_payload = {"conversation": data_db_llm, "session_id": session_id}
+    else:
+        usage.drop(session_id)
+
+    # Stop the face thread at the end of the conversation: it is joined in the background and its average score is
+    # given to the save_session job, so the answer does not wait for the sensing to stop
+    stop_event.set()
+    last_session_score = Future()
+    threading.Thread(target=finish_sensing, args=(thread_face, last_session_score, save_payload), daemon=True).start()
 
     session.clear()  # clear session after exit
-    cleanup_all_audio() # clean all audio in static folder
+    cleanup_all_audio(chat_id if args.multi_session else None) # clean all audio in static folder (of this session with -multi_session)
 
     return jsonify({"link": FORM_LINK})
 
@@ -307,11 +479,12 @@ def chat_audio():
     audio_file.save(audio_path)  # save it
 
     # Transcribe with Whisper/Groq API
-    response_text = audio_groq_api(
-        api_key=groq_api_key,
-        model_name=whisper_model_name,
-        audio_path=audio_path
-    )
+    with stages.time("stt"):
+        response_text = audio_groq_api(
+            api_key=groq_api_key,
+            model_name=whisper_model_name,
+            audio_path=audio_path
+        )
 
     # retrieve therapist
     chat_id = session.get("chat_id")
@@ -319,7 +492,7 @@ def chat_audio():
 
 
     # ma al client conviene dare il path relativo (così il browser può scaricarlo da /static)
-    robot_audio_url = f"/static/{os.path.basename(audio_path)}"
+    robot_audio_url = f"/static/{os.path.basename(audio_path)}" if audio_path else None
 
     return jsonify({
         "child": response_text,
@@ -350,6 +523,42 @@ def send_data():
         print(f"Error in send_data: {e}")
         return jsonify({"sentence": "", "gesture": "", "t": 0})
 
+# Performance metrics of the server subsystems
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # '?reset=1' clears the stage latencies and the LLM usage after reading them (e.g. between the levels of a benchmark)
+    result = {"neo4j": kg.pool_metrics(), "profile_cache": kg.profile_cache.metrics(), "jobs": jobs.metrics(),
+              "stages": stages.summary(), "llm_usage": usage.summary()}
+    if request.args.get("reset"):
+        stages.reset()
+        usage.reset()
+    return jsonify(result)
+
+def main():
+    # startup of the server process: the graph, the post-session jobs, the engagement sensing and the debug preview
+    global kg, db_llm
+    # with -reload the first process only watches the files and restarts the one that serves the requests
+    serving = not args.reload or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    if serving:
+        os.makedirs(os.path.join(app.root_path, "static"), exist_ok=True)  # robot and child audios (not in the repository)
+        kg = make_knowledge_graph()
+        db_llm = DatabaseLLM(api_key=groq_api_key, model_name=db_model, kg=kg)
+        usage.set_budget(tokens=args.session_token_budget, cost_usd=args.session_cost_budget)
+        start_jobs()
+        make_sensing_channels()
+        if args.sensing == 'thread':
+            # warm-up of the vision stack while the server is already answering, so the first session does not wait for it
+            threading.Thread(target=load_face_thread, daemon=True).start()
+        if args.preview and args.sensing != 'process':
+            start_preview_process()
+    try:
+        app.run(host='0.0.0.0', port=settings.server.port, debug=True, use_reloader=args.reload)
+    finally:
+        if preview_proc is not None:
+            stop_preview_process()
+        if jobs is not None:
+            jobs.stop(timeout=5)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    main()
 